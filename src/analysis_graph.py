@@ -0,0 +1,72 @@
+from collections import Counter
+
+import parselmouth
+
+import tracing
+from praat import Praat
+from analysis_profiles import DEFAULT_PROFILE, get_profile
+
+
+class AnalysisGraph:
+    """
+    sound 하나에서 만들어지는 Praat 객체(Pitch, Intensity, Formant, Spectrogram,
+    임계값, 무음 TextGrid)를 한 번만 만들고 공유하는 메모 계층입니다.
+    build_counts에 객체별 생성 횟수가 기록되고, 추적을 켜면 생성마다 'praat.{객체 이름}' span이 남습니다.
+    Praat 파라미터는 profile(AnalysisProfile)에서 가져오며, 기본 'standard'는 parselmouth 기본값입니다.
+    """
+    def __init__(self, sound: parselmouth.Sound, profile=None):
+        self.sound = sound
+        self.profile = get_profile(profile or DEFAULT_PROFILE)
+        self.nodes = {}
+        self.build_counts = Counter()
+
+    def get(self, key, builder):
+        """
+        key에 해당하는 객체가 없을 때만 builder로 만든다.
+        :param key: (객체 이름, 파라미터...) 튜플
+        :param builder: 인자 없는 생성 함수
+        """
+        if key not in self.nodes:
+            with tracing.span(f'praat.{key[0]}', audio_seconds=self.sound.duration):
+                self.nodes[key] = builder()
+            self.build_counts[key[0]] += 1
+        return self.nodes[key]
+
+    def get_minimum_pitch(self, minimum_pitch=None):
+        """
+        intensity의 최소 피치, None이면 profile.intensity_minimum_pitch
+        """
+        return self.profile.intensity_minimum_pitch if minimum_pitch is None else minimum_pitch
+
+    def pitch(self) -> parselmouth.Pitch:
+        params = self.profile.pitch_params()
+        return self.get(('pitch', *params.values()), lambda: self.sound.to_pitch(**params))
+
+    def intensity(self, minimum_pitch=None) -> parselmouth.Intensity:
+        minimum_pitch = self.get_minimum_pitch(minimum_pitch)
+        time_step = self.profile.intensity_time_step
+        return self.get(('intensity', minimum_pitch, time_step),
+                        lambda: self.sound.to_intensity(minimum_pitch, time_step=time_step))
+
+    def formant(self) -> parselmouth.Formant:
+        params = self.profile.formant_params()
+        return self.get(('formant', *params.values()), lambda: self.sound.to_formant_burg(**params))
+
+    def spectrogram(self) -> parselmouth.Spectrogram:
+        return self.get(('spectrogram',), self.sound.to_spectrogram)
+
+    def threshold(self, silence_db=-25, minimum_pitch=None):
+        """
+        :return: Praat.get_threshold와 같은 (threshold, threshold2, threshold3)
+        """
+        minimum_pitch = self.get_minimum_pitch(minimum_pitch)
+        return self.get(('threshold', silence_db, minimum_pitch),
+                        lambda: Praat.get_threshold(self.intensity(minimum_pitch), silence_db=silence_db))
+
+    def textgrid(self, silence_db=-25, min_pause=0.3, minimum_pitch=None) -> parselmouth.TextGrid:
+        minimum_pitch = self.get_minimum_pitch(minimum_pitch)
+
+        def build():
+            _, _, threshold3 = self.threshold(silence_db, minimum_pitch)
+            return Praat.get_textgrid(self.intensity(minimum_pitch), threshold3=threshold3, min_pause=min_pause)
+        return self.get(('textgrid', silence_db, min_pause, minimum_pitch), build)
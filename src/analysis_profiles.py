@@ -0,0 +1,115 @@
+from collections import namedtuple
+
+_FIELDS = ['name', 'pitch_time_step', 'pitch_floor', 'pitch_ceiling', 'formant_time_step', 'max_number_of_formants',
+           'maximum_formant', 'formant_window_length', 'intensity_minimum_pitch', 'intensity_time_step', 'adaptive',
+           'speaker', 'adaptation']
+
+
+class AnalysisProfile(namedtuple('AnalysisProfile', _FIELDS, defaults=('',))):
+    """
+    Praat 분석 파라미터 묶음입니다. (time_step이 None이면 Praat 기본값)
+    AnalysisGraph가 이 값으로 Pitch, Formant, Intensity를 만들고, 값이 같은 프로필끼리는 객체를 공유합니다.
+    adaptive이면 파일 메타데이터의 성별, 나이로 피치 범위와 최대 포먼트 주파수를 화자에 맞춘다. (for_speaker)
+    speaker는 맞춘 화자 구분 ('m', 'f', 'child', 여러 화자이면 'f+m'), 맞추지 않았으면 ''입니다.
+    adaptation은 화자에 맞춘 방식입니다.
+      'speaker': 한 화자(또는 모두 같은 구분)의 범위
+      'union': 구분이 다른 여러 화자의 범위를 모두 포함하는 범위 (가장 낮은 floor, 가장 높은 ceiling, 최대 포먼트)
+      'skipped': 성별, 나이를 모르는 화자가 있어 맞추지 않음
+      '': adaptive가 아니거나 메타데이터가 없음
+    """
+    __slots__ = ()
+
+    # (pitch_floor, pitch_ceiling, maximum_formant), Praat 매뉴얼의 화자별 권장 범위
+    SPEAKER_RANGES = {
+        'm': (75.0, 300.0, 5000.0),
+        'f': (100.0, 500.0, 5500.0),
+        'child': (150.0, 600.0, 8000.0),
+    }
+    CHILD_MAX_AGE = 12
+    ELDERLY_MALE_AGE = 60 # 나이 든 남성의 낮은 목소리(creak)를 놓치지 않도록 floor를 낮춘다.
+    ELDERLY_MALE_FLOOR = 65.0
+
+    def pitch_params(self):
+        """
+        :return: Sound.to_pitch 인자
+        """
+        return dict(time_step=self.pitch_time_step, pitch_floor=self.pitch_floor, pitch_ceiling=self.pitch_ceiling)
+
+    def formant_params(self):
+        """
+        :return: Sound.to_formant_burg 인자
+        """
+        return dict(time_step=self.formant_time_step, max_number_of_formants=self.max_number_of_formants,
+                    maximum_formant=self.maximum_formant, window_length=self.formant_window_length)
+
+    @classmethod
+    def get_speaker_range(cls, gender, age):
+        """
+        :return: (speaker, pitch_floor, pitch_ceiling, maximum_formant), 성별, 나이를 모르면 None
+        """
+        gender = str(gender or '').lower()[:1]
+        age = int(age) if age not in (None, '') else None
+        if age is not None and age <= cls.CHILD_MAX_AGE:
+            speaker = 'child'
+        elif gender in ('m', 'f'):
+            speaker = gender
+        else:
+            return None
+        pitch_floor, pitch_ceiling, maximum_formant = cls.SPEAKER_RANGES[speaker]
+        if speaker == 'm' and age is not None and age >= cls.ELDERLY_MALE_AGE:
+            pitch_floor = cls.ELDERLY_MALE_FLOOR
+        return speaker, pitch_floor, pitch_ceiling, maximum_formant
+
+    def for_speaker(self, meta_data):
+        """
+        CorpusAnalyzer.get_metadata의 화자 정보로 화자에 맞춘 프로필을 만든다.
+        speakers([{gender, age}, ...])가 있으면 녹음의 모든 화자를, 없으면 gender, age를 사용한다.
+        화자마다 범위가 다르면 모두를 포함하는 범위를 쓰고, 성별, 나이를 모르는 화자가 있으면 맞추지 않는다.
+        adaptive가 아니면 그대로 돌려준다.
+        """
+        if not self.adaptive or not meta_data:
+            return self
+        speakers = meta_data.get('speakers') or [meta_data]
+        ranges = [self.get_speaker_range(speaker.get('gender'), speaker.get('age')) for speaker in speakers]
+        if any(speaker_range is None for speaker_range in ranges):
+            return self._replace(adaptation='skipped')
+        ranges = sorted(set(ranges))
+        return self._replace(pitch_floor=min(floor for _, floor, _, _ in ranges),
+                             pitch_ceiling=max(ceiling for _, _, ceiling, _ in ranges),
+                             maximum_formant=max(formant for _, _, _, formant in ranges),
+                             speaker='+'.join(sorted({speaker for speaker, _, _, _ in ranges})),
+                             adaptation='union' if len(ranges) > 1 else 'speaker')
+
+    def to_dict(self):
+        return self._asdict()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data) # adaptation이 없는 이전 기록은 ''
+
+
+# 프로필끼리 다른 것은 피치 범위(adaptive이면 화자별 범위와 최대 포먼트 주파수)와 피치, 포먼트 프레임 간격뿐이다.
+# 포먼트 개수(5)와 발화속도의 intensity 설정은 모든 프로필이 같아서, 프로필이 달라도 발화속도는 그대로이다.
+PROFILES = {
+    # 빠른 분석: 피치, 포먼트 프레임 간격을 20ms로 늘린다. 포먼트는 피치 시간 ±pitch_time_range 평균이므로
+    # 간격을 늘려도 평균에 들어가는 프레임 수만 줄어든다. 발화속도의 intensity는 standard와 같다.
+    'fast': AnalysisProfile('fast', 0.02, 75.0, 500.0, 0.02, 5.0, 5500.0, 0.025, 50.0, None, True, ''),
+    # parselmouth 기본값, 이전 버전과 같은 결과
+    'standard': AnalysisProfile('standard', None, 75.0, 600.0, None, 5.0, 5500.0, 0.025, 50.0, None, False, ''),
+    # 정밀 분석: 5ms 간격, 화자별 범위
+    'precise': AnalysisProfile('precise', 0.005, 75.0, 600.0, 0.005, 5.0, 5500.0, 0.025, 50.0, None, True, ''),
+}
+DEFAULT_PROFILE = 'standard'
+
+
+def get_profile(profile=DEFAULT_PROFILE, meta_data=None):
+    """
+    :param profile: 프로필 이름('fast', 'standard', 'precise') 또는 AnalysisProfile
+    :param meta_data: 주어지면 adaptive 프로필을 화자에 맞춘다.
+    :return: AnalysisProfile
+    """
+    if not isinstance(profile, AnalysisProfile):
+        if profile not in PROFILES:
+            raise ValueError(f'Unknown analysis profile: {profile}')
+        profile = PROFILES[profile]
+    return profile.for_speaker(meta_data)
@@ -0,0 +1,441 @@
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib import request as urllib_request, error as urllib_error
+
+import tracing
+from analysis_profiles import PROFILES, DEFAULT_PROFILE
+
+# 클라이언트는 표준 라이브러리만 사용한다. parselmouth, torch, whisper 등은 서버(AnalysisService)에서만 불러온다.
+# (tracing, analysis_profiles도 표준 라이브러리만 사용한다)
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class ServiceJob:
+    """
+    서비스에 제출된 작업 하나. 파일별 결과와 오류를 모은다.
+    """
+    def __init__(self, kind, files, options):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.files = list(files)
+        self.options = dict(options or {})
+        self.state = 'queued' # queued -> running -> done | failed
+        self.results = []
+        self.errors = []
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self, with_results=True):
+        data = {
+            "job_id": self.job_id, "kind": self.kind, "state": self.state, "files": len(self.files),
+            "completed": len(self.results), "errors": self.errors, "error": self.error,
+            "submitted": self.submitted, "started": self.started, "finished": self.finished
+        }
+        if with_results:
+            data["results"] = self.results
+        return data
+
+
+class AnalysisService:
+    """
+    모델과 parselmouth를 한 번만 불러 두고 분석 작업을 처리하는 상주 서비스입니다.
+    작업 종류:
+      analysis: SpeechAnalysis 피쳐 추출 (FeatureRecord.to_dict 모양의 결과)
+      diarization: 화자 분리 ({화자 ID: [[시작, 종료], ...]})
+      transcription: STT (whisper_timestamped 형식 결과)
+      recognition: SpeechRecognition.process_files 배치 (CSV/컬럼형 출력)
+    화자 분리, STT 모델은 처음 필요할 때(또는 preload) 불러오고, 모델을 쓰는 작업은 한 번에 하나씩 실행한다.
+    analysis 작업은 모델 작업과 겹쳐서 실행될 수 있다. (workers가 2 이상일 때)
+    """
+    KINDS = ('analysis', 'diarization', 'transcription', 'recognition')
+    MODEL_KINDS = ('diarization', 'transcription', 'recognition')
+
+    def __init__(self, access_token=None, model_name='base', stub_backends=False, gate_silence='none', cache_dir=None,
+                 cache_max_bytes=1024 * 1024 * 1024, workers=1, max_jobs=1000):
+        """
+        :param access_token: Huggingface access token (pyannote)
+        :param model_name: Whisper 모델 이름
+        :param stub_backends: True이면 모델 대신 StubDiarization, StubTranscription을 사용한다. (시험용)
+        :param gate_silence: 'none', 'textgrid', 'diarization', 발화 구간만 인식한다. (SilenceGatedTranscription)
+        :param cache_dir: 피쳐 캐시 디렉토리, None이면 캐시를 사용하지 않는다.
+        :param cache_max_bytes: 피쳐 캐시 최대 크기
+        :param workers: 동시에 실행할 작업 수
+        :param max_jobs: 결과를 보관할 끝난 작업 수, 넘으면 오래된 작업부터 지운다.
+        """
+        # 분석 모듈(parselmouth, numpy)은 서비스 시작 때 한 번 불러온다.
+        from speech_analysis import SpeechAnalysis
+        from feature_cache import FeatureCache
+        from feature_record import FeatureRecord
+
+        self.SpeechAnalysis = SpeechAnalysis
+        self.FeatureRecord = FeatureRecord
+        self.cache = FeatureCache(cache_dir, max_bytes=cache_max_bytes) if cache_dir else None
+        self.access_token = access_token
+        self.model_name = model_name
+        self.stub_backends = stub_backends
+        self.gate_silence = gate_silence
+        self.recognition = None
+        self.model_lock = threading.Lock()
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self.jobs_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.started = time.time()
+
+    def get_recognition(self):
+        """
+        SpeechRecognition(화자 분리, STT 모델)을 처음 한 번만 만든다. (model_lock 안에서 호출)
+        """
+        if self.recognition is None:
+            from speech_recognition import SpeechRecognition
+            from recognition_backends import (PyannoteDiarization, WhisperTranscription, SilenceGatedTranscription,
+                                              StubDiarization, StubTranscription)
+            with tracing.span('service.load_models', stub=self.stub_backends):
+                if self.stub_backends:
+                    diarization_backend, transcription_backend = StubDiarization(), StubTranscription()
+                else:
+                    diarization_backend = PyannoteDiarization(self.access_token)
+                    transcription_backend = WhisperTranscription(self.model_name)
+                if self.gate_silence != 'none':
+                    transcription_backend = SilenceGatedTranscription(transcription_backend, region_source=self.gate_silence)
+                self.recognition = SpeechRecognition(diarization_backend=diarization_backend,
+                                                     transcription_backend=transcription_backend)
+        return self.recognition
+
+    def preload(self):
+        with self.model_lock:
+            self.get_recognition()
+
+    def submit(self, kind, files, options=None):
+        """
+        :param kind: 작업 종류 (KINDS)
+        :param files: 오디오 파일 경로 리스트 (서버 기준 경로)
+        :param options: 작업별 옵션 (run_* 참고)
+        :return: ServiceJob
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f'Unknown job kind: {kind}')
+        if not files:
+            raise ValueError('No files')
+        job = ServiceJob(kind, files, options)
+        with self.jobs_lock:
+            self.jobs[job.job_id] = job
+            self.trim_jobs()
+        self.executor.submit(self.run_job, job)
+        return job
+
+    def trim_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - self.max_jobs)]:
+            del self.jobs[job_id]
+
+    def get_job(self, job_id, wait=None):
+        """
+        :param wait: 주어지면 작업이 끝날 때까지 최대 wait초 기다린다.
+        :return: ServiceJob 또는 None
+        """
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+        if job is not None and wait:
+            job.done.wait(wait)
+        return job
+
+    def run_job(self, job):
+        job.state, job.started = 'running', time.time()
+        try:
+            with tracing.span('service.job', kind=job.kind, files=len(job.files)):
+                if job.kind in self.MODEL_KINDS:
+                    with self.model_lock:
+                        getattr(self, f'run_{job.kind}')(job, self.get_recognition())
+                else:
+                    self.run_analysis(job)
+            job.state = 'done'
+        except Exception as e:
+            job.state, job.error = 'failed', str(e)
+        finally:
+            job.finished = time.time()
+            job.done.set()
+
+    def for_each_file(self, job, handler):
+        """
+        파일마다 handler를 실행하고, 실패한 파일은 errors에 남기고 다음 파일로 넘어간다.
+        """
+        for audio_path in job.files:
+            try:
+                job.results.append(dict(audio_path=audio_path, **handler(audio_path)))
+            except Exception as e:
+                job.errors.append({"audio_path": audio_path, "error": str(e)})
+
+    def run_analysis(self, job):
+        """
+        options: features, profile, meta_data(모든 파일에 적용할 gender, age 등), json_dir(주어지면 피쳐 JSON도 저장),
+                 return_features(False이면 프레임 값 없이 요약만 돌려준다)
+        """
+        options = job.options
+        features = tuple(options.get('features') or self.SpeechAnalysis.FEATURES)
+        meta_data = options.get('meta_data') or {}
+
+        def analyze(audio_path):
+            analyzer = self.SpeechAnalysis(audio_path, cache=self.cache, features=features,
+                                           profile=options.get('profile', DEFAULT_PROFILE), meta_data=meta_data)
+            if options.get('json_dir'):
+                analyzer.save_features_to_json(options['json_dir'])
+            record = self.FeatureRecord.from_analyzer(analyzer, dict(meta_data, file_name=analyzer.base_name))
+            if not options.get('return_features', True):
+                return {"duration": analyzer.sound.duration, "cache_hit": analyzer.cache_hit,
+                        "frames": len(record.pitch_times) if record.pitch_times is not None else 0,
+                        "speech_rate": record.speech_rate}
+            return dict(duration=analyzer.sound.duration, cache_hit=analyzer.cache_hit, **record.to_dict())
+        self.for_each_file(job, analyze)
+
+    def run_diarization(self, job, recognition):
+        self.for_each_file(job, lambda audio_path: {"speakers": recognition.separate_speakers(audio_path)})
+
+    def run_transcription(self, job, recognition):
+        """
+        options: diarize(True이면 화자 분리 결과를 함께 돌려주고, 발화 구간만 인식하는 백엔드에 넘긴다)
+        """
+        def transcribe(audio_path):
+            from audio_io import load_waveform
+            waveform = load_waveform(audio_path)
+            speakers_dict = recognition.separate_speakers(audio_path, waveform=waveform) \
+                if job.options.get('diarize') else None
+            result = {"result": recognition.transcribe_speech(audio_path, waveform=waveform, speakers_dict=speakers_dict)}
+            if speakers_dict is not None:
+                result["speakers"] = speakers_dict
+            return result
+        self.for_each_file(job, transcribe)
+
+    def run_recognition(self, job, recognition):
+        """
+        options: output_dir, output_format, save_wav, resume, part, split_dir (SpeechRecognition.process_files 인자)
+        """
+        options = job.options
+        output_dir = options.get('output_dir', 'out/csv')
+        recognition.process_files(job.files, output_dir=output_dir, save_wav=options.get('save_wav', True),
+                                  output_format=options.get('output_format', 'csv'),
+                                  part=options.get('part', 'part-0'), resume=options.get('resume', False),
+                                  split_dir=options.get('split_dir', 'out/split-wav'))
+        job.results.append({"output_dir": os.path.abspath(output_dir)})
+
+    def status(self):
+        with self.jobs_lock:
+            states = [job.state for job in self.jobs.values()]
+        return {
+            "pid": os.getpid(), "uptime": time.time() - self.started,
+            "models_loaded": self.recognition is not None, "stub_backends": self.stub_backends,
+            "jobs": {state: states.count(state) for state in ('queued', 'running', 'done', 'failed')},
+            "cache": self.cache.stats() if self.cache is not None else None
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health                  서비스 상태
+    POST /jobs                    {"kind", "files", "options", "wait"} 작업 제출, wait(초)가 있으면 끝날 때까지 기다린다.
+    GET  /jobs/<job_id>?wait=초   작업 상태와 결과
+    POST /shutdown                실행 중인 작업을 마치고 서비스 종료
+    """
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        if path == '/health':
+            self.send_json(200, self.server.service.status())
+        elif path.startswith('/jobs/'):
+            params = dict(item.partition('=')[::2] for item in query.split('&') if item)
+            try:
+                wait = float(params.get('wait') or 0)
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            job = self.server.service.get_job(path[len('/jobs/'):], wait=wait)
+            if job is None:
+                self.send_json(404, {"error": "Unknown job"})
+            else:
+                self.send_json(200, job.to_dict())
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path == '/jobs':
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                wait = float(body.get('wait') or 0) # 작업을 제출하기 전에 확인한다.
+                job = self.server.service.submit(body.get('kind'), body.get('files'), body.get('options'))
+            except (ValueError, TypeError) as e: # JSON 오류, 숫자가 아닌 wait 포함
+                self.send_json(400, {"error": str(e)})
+                return
+            if wait:
+                job.done.wait(wait)
+            self.send_json(200 if job.done.is_set() else 202, job.to_dict(with_results=job.done.is_set()))
+        elif self.path == '/shutdown':
+            self.send_json(200, {"state": "shutting down"})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    localhost HTTP로 서비스를 실행한다. /shutdown 요청이나 Ctrl+C로 끝난다.
+    """
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    print(f'analysis service: http://{host}:{server.server_address[1]} (pid {os.getpid()})')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+class AnalysisClient:
+    """
+    AnalysisService에 파일을 제출하는 가벼운 클라이언트 (표준 라이브러리만 사용)
+    """
+    def __init__(self, url=f'http://{DEFAULT_HOST}:{DEFAULT_PORT}', timeout=None):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, data=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else None
+        req = urllib_request.Request(self.url + path, data=body, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib_request.urlopen(req, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib_error.HTTPError as e:
+            raise RuntimeError(json.loads(e.read() or b'{}').get('error') or str(e)) from None
+
+    def health(self):
+        return self.request('GET', '/health')
+
+    def submit(self, kind, files, options=None, wait=None):
+        """
+        :param files: 오디오 파일 경로, 서버의 작업 디렉토리와 상관없도록 절대 경로로 보낸다.
+        :param wait: 주어지면 작업이 끝날 때까지 최대 wait초 기다린다.
+        :return: 작업 상태 사전 (끝났으면 results 포함)
+        """
+        return self.request('POST', '/jobs', {"kind": kind, "files": [os.path.abspath(path) for path in files],
+                                              "options": options or {}, "wait": wait})
+
+    def get_job(self, job_id, wait=None):
+        return self.request('GET', f'/jobs/{job_id}' + (f'?wait={wait}' if wait else ''))
+
+    def wait(self, job_id, poll=30.0):
+        """
+        작업이 끝날 때까지 기다린다. (서버에서 최대 poll초씩 기다리며 다시 묻는다)
+        """
+        while True:
+            job = self.get_job(job_id, wait=poll)
+            if job['state'] in ('done', 'failed'):
+                return job
+
+    def shutdown(self):
+        return self.request('POST', '/shutdown', {})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default=f'http://{DEFAULT_HOST}:{DEFAULT_PORT}', help='서비스 주소 (클라이언트)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='서비스를 실행합니다.')
+    serve_parser.add_argument('--host', default=DEFAULT_HOST)
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--preload', action='store_true', help='화자 분리, STT 모델을 시작할 때 불러옵니다.')
+    serve_parser.add_argument('--stub-backends', action='store_true', help='모델 대신 시험용 백엔드를 사용합니다.')
+    serve_parser.add_argument('--model', default='base', help='Whisper 모델 이름')
+    serve_parser.add_argument('--gate-silence', choices=['none', 'textgrid', 'diarization'], default='none',
+                              help='무음을 건너뛰고 발화 구간만 인식합니다.')
+    serve_parser.add_argument('--cache-dir', default='out/cache/features', help='피쳐 캐시 디렉토리')
+    serve_parser.add_argument('--no-cache', action='store_true', help='피쳐 캐시를 사용하지 않습니다.')
+    serve_parser.add_argument('--workers', type=int, default=1, help='동시에 실행할 작업 수')
+    serve_parser.add_argument('--trace', default=None, help='단계별 span을 기록할 JSONL 경로')
+    serve_parser.add_argument('--metrics', default=None, help='단계별 합계를 저장할 Prometheus 텍스트 파일 경로')
+
+    submit_parser = commands.add_parser('submit', help='파일을 제출합니다.')
+    submit_parser.add_argument('kind', choices=AnalysisService.KINDS)
+    submit_parser.add_argument('files', nargs='+')
+    submit_parser.add_argument('--features', nargs='+', default=None, help='analysis: 계산할 피쳐')
+    submit_parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=list(PROFILES), help='analysis: 분석 프로필')
+    submit_parser.add_argument('--gender', default=None, help='analysis: 화자 성별 (f, m)')
+    submit_parser.add_argument('--age', type=int, default=None, help='analysis: 화자 나이')
+    submit_parser.add_argument('--json-dir', default=None, help='analysis: 피쳐 JSON 저장 디렉토리')
+    submit_parser.add_argument('--diarize', action='store_true', help='transcription: 화자 분리도 함께 수행합니다.')
+    submit_parser.add_argument('--output-dir', default='out/csv', help='recognition: 출력 디렉토리')
+    submit_parser.add_argument('--split-dir', default='out/split-wav', help='recognition: 화자별 wav 저장 디렉토리')
+    submit_parser.add_argument('--output-format', choices=['csv', 'parquet', 'arrow'], default='csv')
+    submit_parser.add_argument('--no-wait', action='store_true', help='작업 ID만 출력하고 기다리지 않습니다.')
+
+    job_parser = commands.add_parser('job', help='작업 상태를 확인합니다.')
+    job_parser.add_argument('job_id')
+    job_parser.add_argument('--wait', action='store_true', help='작업이 끝날 때까지 기다립니다.')
+    commands.add_parser('health', help='서비스 상태를 확인합니다.')
+    commands.add_parser('shutdown', help='서비스를 종료합니다.')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        if args.trace or args.metrics:
+            tracing.enable(args.trace, args.metrics)
+        access_token = None
+        if not args.stub_backends and os.path.exists('config.json'):
+            with open('config.json', 'r') as f:
+                access_token = json.load(f)['hf_access_key']
+        service = AnalysisService(access_token=access_token, model_name=args.model, stub_backends=args.stub_backends,
+                                  gate_silence=args.gate_silence, cache_dir=None if args.no_cache else args.cache_dir,
+                                  workers=args.workers)
+        if args.preload:
+            service.preload()
+        serve(service, args.host, args.port)
+        tracer = tracing.disable()
+        if tracer is not None:
+            tracer.print_summary()
+    else:
+        client = AnalysisClient(args.url)
+        if args.command == 'submit':
+            options = {"features": args.features, "profile": args.profile,
+                       "json_dir": os.path.abspath(args.json_dir) if args.json_dir else None,
+                       "meta_data": {key: value for key, value in (('gender', args.gender), ('age', args.age))
+                                     if value is not None},
+                       "diarize": args.diarize, "output_dir": os.path.abspath(args.output_dir),
+                       "split_dir": os.path.abspath(args.split_dir),
+                       "output_format": args.output_format}
+            job = client.submit(args.kind, args.files, options)
+            if not args.no_wait:
+                job = client.wait(job['job_id'])
+            output = job
+        elif args.command == 'job':
+            output = client.wait(args.job_id) if args.wait else client.get_job(args.job_id)
+        elif args.command == 'health':
+            output = client.health()
+        else:
+            output = client.shutdown()
+        print(json.dumps(output, ensure_ascii=False, indent=4))
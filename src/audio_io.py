@@ -0,0 +1,200 @@
+import mmap
+import wave
+import struct
+import functools
+
+import numpy as np
+import parselmouth
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def get_frame_index(time, num_frames, sample_rate):
+    """
+    초 단위 시간을 샘플 위치로 바꾼다. pydub AudioSegment의 ms 슬라이싱과 같은 규칙(밀리초, 내림)을 따른다.
+    :param num_frames: 전체 프레임 수
+    """
+    duration_ms = round(1000 * num_frames / sample_rate)
+    return int(min(time * 1000, duration_ms) * sample_rate / 1000)
+
+
+class Waveform:
+    """
+    한 번 디코딩한 모노 float32 음성 버퍼입니다.
+    화자 분리, 화자별 wav 저장, STT가 같은 버퍼를 메모리에서 공유합니다.
+    """
+    def __init__(self, samples, sample_rate):
+        self.samples = np.ascontiguousarray(samples, dtype=np.float32)
+        self.sample_rate = sample_rate
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def get_frame_index(self, time):
+        return get_frame_index(time, len(self.samples), self.sample_rate)
+
+    def slice(self, start, end):
+        """
+        :param start: 시작 시간 (초)
+        :param end: 종료 시간 (초)
+        :return: 복사하지 않은 구간 view
+        """
+        return self.samples[self.get_frame_index(start):self.get_frame_index(end)]
+
+    def save_wav(self, path, start=0, end=None):
+        """
+        구간을 16bit PCM wav로 저장한다.
+        """
+        end = self.duration if end is None else end
+        samples = self.slice(start, end)
+        # ms 반올림으로 끝 위치가 버퍼를 조금 넘으면 pydub처럼 무음으로 채운다.
+        missing = self.get_frame_index(end) - self.get_frame_index(start) - len(samples)
+        if missing > 0:
+            samples = np.concatenate([samples, np.zeros(missing, dtype=np.float32)])
+        pcm = np.clip(np.round(samples * 32768), -32768, 32767).astype('<i2')
+        with wave.open(path, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.sample_rate)
+            f.writeframes(pcm.tobytes())
+
+    def to_sound(self):
+        return parselmouth.Sound(self.samples.astype(np.float64), sampling_frequency=self.sample_rate)
+
+
+def load_waveform(audio_path, sample_rate=16000):
+    """
+    오디오 파일을 한 번만 디코딩해서 sample_rate의 모노 float32 버퍼로 만든다.
+    Praat으로 읽으므로 wav/flac/mp3에 ffmpeg 프로세스가 필요하지 않다.
+    :param audio_path: 오디오 파일 경로
+    :param sample_rate: 목표 샘플링 레이트 (Whisper, pyannote 모두 16kHz를 사용한다)
+    :return: Waveform
+    """
+    sound = parselmouth.Sound(audio_path)
+    if sound.n_channels > 1:
+        sound = sound.convert_to_mono()
+    if sound.sampling_frequency != sample_rate:
+        sound = sound.resample(sample_rate)
+    return Waveform(sound.values[0], sample_rate)
+
+
+@functools.lru_cache(maxsize=2)
+def load_sound(audio_path):
+    """
+    원본 Sound를 디코딩해서 잠시 보관한다. 같은 원본의 구간들을 이어서 분석할 때 한 번만 디코딩한다.
+    추출한 구간은 복사본이므로 보관된 Sound는 바뀌지 않는다.
+    """
+    return parselmouth.Sound(audio_path)
+
+
+def extract_segment(sound, start, end):
+    """
+    Sound에서 [start, end) 구간을 꺼낸다. 시간은 0부터 다시 시작한다.
+    split-wav 파일과 같은 샘플 범위(get_frame_index)와 끝 무음 채우기를 사용하므로
+    구간을 분석한 결과는 잘라 저장한 wav를 분석한 결과와 같다.
+    :return: parselmouth.Sound
+    """
+    num_frames, sample_rate = sound.n_samples, sound.sampling_frequency
+    start_frame, end_frame = get_frame_index(start, num_frames, sample_rate), get_frame_index(end, num_frames, sample_rate)
+    values = sound.values[:, start_frame:min(end_frame, num_frames)]
+    missing = end_frame - max(start_frame, min(end_frame, num_frames))
+    if missing > 0:
+        values = np.concatenate([values, np.zeros((values.shape[0], missing))], axis=1)
+    return parselmouth.Sound(values, sampling_frequency=sample_rate)
+
+
+class PcmWavFile:
+    """
+    PCM wav 파일을 메모리 맵으로 열어 구간을 디코딩 없이 바이트 그대로 잘라 저장합니다.
+    전체 녹음을 메모리에 올리지 않으므로 긴 대화 파일에서 짧은 구간 수백 개를 저장할 때 사용합니다.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def read_header(self):
+        """
+        RIFF 청크를 훑어서 fmt 정보와 data 청크 위치를 읽는다.
+        PCM(정수) 형식이 아니면 ValueError를 낸다.
+        """
+        if len(self.map) < 12 or self.map[:4] != b'RIFF' or self.map[8:12] != b'WAVE':
+            raise ValueError(f'Not a RIFF/WAVE file: {self.path}')
+        offset = 12
+        fmt = None
+        while offset + 8 <= len(self.map):
+            chunk_id, chunk_size = struct.unpack_from('<4sI', self.map, offset)
+            body = offset + 8
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack_from('<HHIIHH', self.map, body)
+                if fmt[0] == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                    fmt = (struct.unpack_from('<H', self.map, body + 24)[0],) + fmt[1:]
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f'data chunk before fmt chunk: {self.path}')
+                format_tag, self.channels, self.sample_rate, _, self.block_align, bits = fmt
+                if format_tag != WAVE_FORMAT_PCM:
+                    raise ValueError(f'Not a PCM wav file (format {format_tag:#x}): {self.path}')
+                self.sample_width = (bits + 7) // 8
+                self.data_offset = body
+                # 녹음 중 끊긴 파일은 헤더의 크기보다 짧을 수 있다.
+                self.num_frames = min(chunk_size, len(self.map) - body) // self.block_align
+                return
+            offset = body + chunk_size + (chunk_size & 1)
+        raise ValueError(f'No data chunk: {self.path}')
+
+    @property
+    def duration(self):
+        return self.num_frames / self.sample_rate
+
+    def get_frame_index(self, time):
+        return get_frame_index(time, self.num_frames, self.sample_rate)
+
+    def save_wav(self, path, start=0, end=None):
+        """
+        구간의 샘플 바이트를 복사 없이 새 헤더 뒤에 그대로 쓴다.
+        """
+        end = self.duration if end is None else end
+        start_frame, end_frame = self.get_frame_index(start), self.get_frame_index(end)
+        stop_frame = max(start_frame, min(end_frame, self.num_frames))
+        with memoryview(self.map) as view, wave.open(path, 'wb') as f:
+            f.setnchannels(self.channels)
+            f.setsampwidth(self.sample_width)
+            f.setframerate(self.sample_rate)
+            f.writeframesraw(view[self.data_offset + start_frame * self.block_align:
+                                  self.data_offset + stop_frame * self.block_align])
+            # ms 반올림으로 끝 위치가 파일을 조금 넘으면 pydub처럼 무음으로 채운다.
+            missing = end_frame - stop_frame
+            if missing > 0:
+                f.writeframesraw(bytes(missing * self.block_align))
+
+    def close(self):
+        if getattr(self, 'map', None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_pcm_wav(audio_path):
+    """
+    PCM wav 파일이면 PcmWavFile을, 아니면(압축 형식, 다른 포맷) None을 돌려준다.
+    """
+    if not audio_path.lower().endswith('.wav'):
+        return None
+    try:
+        return PcmWavFile(audio_path)
+    except (ValueError, struct.error):
+        return None
@@ -0,0 +1,338 @@
+import os
+import sys
+import glob
+import json
+import time
+import wave
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from datetime import datetime
+
+import numpy as np
+import parselmouth
+
+from praat import Praat
+from speech_analysis import SpeechAnalysis
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DURATIONS = (1, 10, 60, 600, 3600)
+
+
+def make_synthetic_wav(path, duration, sampling_frequency=16000, block_length=60.0, seed=0):
+    """
+    음성과 비슷한 합성 신호(피치가 천천히 움직이는 배음, 초당 4음절 진폭 변화, 6초마다 1초 쉼, 약한 잡음)를
+    16bit mono wav로 저장한다. 긴 신호도 block_length초씩 만들어 쓰므로 메모리를 적게 쓴다.
+    :param duration: 길이(초)
+    """
+    rng = np.random.default_rng(seed)
+    total = int(round(duration * sampling_frequency))
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sampling_frequency)
+        for start in range(0, total, int(block_length * sampling_frequency)):
+            t = np.arange(start, min(total, start + int(block_length * sampling_frequency))) / sampling_frequency
+            # f0(t) = 150 + 30 sin(2 pi 0.5 t)의 적분으로 위상을 구해서 블록 경계에서도 이어지게 한다.
+            phase = 2 * np.pi * (150 * t - 30 / np.pi * np.cos(np.pi * t))
+            signal = sum(np.sin(k * phase) / k for k in range(1, 11))
+            envelope = np.maximum(np.sin(2 * np.pi * 4 * t), 0) * ((t % 6) < 5)
+            samples = 0.3 * envelope * signal + 0.005 * rng.standard_normal(len(t))
+            f.writeframes(np.clip(np.round(samples * 32767), -32768, 32767).astype('<i2').tobytes())
+
+
+class PeakMemory:
+    """
+    측정 구간의 최대 RSS를 구한다. 리눅스에서는 /proc/self/clear_refs로 최대값(VmHWM)을 초기화하고,
+    그렇지 않으면 프로세스 전체의 최대 RSS(ru_maxrss)를 사용한다.
+    """
+    @staticmethod
+    def read_status(key):
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith(key):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    def reset(self):
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+        self.start_rss = self.read_status('VmRSS')
+
+    def peak(self):
+        """
+        :return: (최대 RSS, 측정 시작 시점 대비 증가량) 바이트
+        """
+        peak = self.read_status('VmHWM')
+        if peak is None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+        return peak, peak - (self.start_rss or 0)
+
+
+def _run_case(setup, func, connection):
+    """
+    (fork된) 자식 프로세스에서 준비(setup)를 마친 뒤 func만 측정해서 돌려준다.
+    """
+    try:
+        state = setup()
+        memory = PeakMemory()
+        memory.reset()
+        start = time.perf_counter()
+        func(state)
+        seconds = time.perf_counter() - start
+        peak_rss, peak_delta = memory.peak()
+        connection.send({"seconds": seconds, "peak_rss_mb": peak_rss / 2 ** 20, "peak_delta_mb": peak_delta / 2 ** 20})
+    except Exception as e:
+        connection.send({"error": f'{type(e).__name__}: {e}'})
+    finally:
+        connection.close()
+
+
+class BenchmarkSuite:
+    """
+    분석/인식 경로의 단계별 시간과 최대 메모리를 측정합니다.
+    각 측정은 새로 fork한 프로세스에서 repeat번 실행하고 가장 짧은 시간과 가장 큰 메모리를 기록하므로,
+    이전 측정의 캐시나 메모리 사용이 다음 측정에 섞이지 않습니다.
+    """
+    WAV_STAGES = ('load', 'calculate_pitch', 'calculate_formants', 'calculate_speech_rate', 'calculate_speech_rate_praat',
+                  'praat_get_peaks', 'praat_get_syllable_nuclei', 'praat_reference_peaks')
+
+    def __init__(self, repeat=3, work_dir=None, durations=DEFAULT_DURATIONS, only=None):
+        """
+        :param repeat: 측정 반복 횟수
+        :param work_dir: 합성 wav와 출력 파일을 둘 디렉토리, None이면 임시 디렉토리
+        :param durations: 합성 신호 길이(초) 목록
+        :param only: 이름에 이 문자열이 들어간 측정만 실행한다.
+        """
+        self.repeat = repeat
+        self.durations = durations
+        self.only = only
+        self.work_dir = os.path.abspath(work_dir or tempfile.mkdtemp(prefix='speech-benchmark-'))
+        if not os.path.exists(self.work_dir):
+            os.makedirs(self.work_dir)
+        self.results = {}
+        try:
+            self.context = multiprocessing.get_context('fork')
+        except ValueError: # fork가 없는 플랫폼에서는 현재 프로세스에서 측정한다.
+            self.context = None
+
+    def is_selected(self, name):
+        return not self.only or self.only in name
+
+    def measure(self, name, setup, func):
+        if not self.is_selected(name):
+            return
+        runs = []
+        for _ in range(self.repeat):
+            if self.context is None:
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                _run_case(setup, func, sender)
+                runs.append(receiver.recv())
+                continue
+            receiver, sender = self.context.Pipe(duplex=False)
+            process = self.context.Process(target=_run_case, args=(setup, func, sender))
+            process.start()
+            sender.close()
+            try:
+                runs.append(receiver.recv())
+            except EOFError:
+                runs.append({"error": f'process exited with code {process.exitcode}'})
+            process.join()
+        errors = [run['error'] for run in runs if 'error' in run]
+        if errors:
+            self.results[name] = {"error": errors[0]}
+            print(f'{name:45s} error: {errors[0]}')
+            return
+        result = {
+            "seconds": min(run['seconds'] for run in runs),
+            "runs": [run['seconds'] for run in runs],
+            "peak_rss_mb": max(run['peak_rss_mb'] for run in runs),
+            "peak_delta_mb": max(run['peak_delta_mb'] for run in runs)
+        }
+        self.results[name] = result
+        print(f"{name:45s} {result['seconds']:9.3f}s  peak {result['peak_rss_mb']:8.1f}MB (+{result['peak_delta_mb']:.1f}MB)")
+
+    def measure_wavs(self, prefix, wav_paths):
+        """
+        SpeechAnalysis의 피쳐 계산과 Praat 피크 함수를 wav 묶음에 대해 측정한다. 준비 단계(파일 읽기,
+        앞 단계 피쳐 계산)는 측정에서 뺀다. 발화속도와 음절핵은 numpy 경로와 피크마다 Praat을 호출하는
+        참조 경로(get_num_peaks, get_time_peaks, get_valid_peak_count)를 함께 측정한다.
+        """
+        def load():
+            return [SpeechAnalysis(wav_path, features=()) for wav_path in wav_paths]
+
+        def with_pitch():
+            analyzers = load()
+            for analyzer in analyzers:
+                analyzer.get_feature('pitch')
+            return analyzers
+
+        def with_intensity():
+            analyzers = load()
+            return [(analyzer.intensity, analyzer.graph.threshold(silence_db=analyzer.silence_db)[0])
+                    for analyzer in analyzers]
+
+        def run_all(method_name, **kwargs):
+            return lambda analyzers: [getattr(analyzer, method_name)(**kwargs) for analyzer in analyzers]
+
+        def reference_peaks(intensity, threshold):
+            num_peaks, time, sound_from_intensity_matrix = Praat.get_num_peaks(intensity)
+            time_peaks, peak_count, intensities = Praat.get_time_peaks(num_peaks, time, sound_from_intensity_matrix,
+                                                                       threshold)
+            return Praat.get_valid_peak_count(time_peaks, peak_count, intensity, intensities, min_dip=2)
+
+        self.measure(f'{prefix}/load', lambda: None, lambda _: load())
+        self.measure(f'{prefix}/calculate_pitch', load, run_all('calculate_pitch'))
+        self.measure(f'{prefix}/calculate_formants', with_pitch, run_all('calculate_formants'))
+        self.measure(f'{prefix}/calculate_speech_rate', load, run_all('calculate_speech_rate'))
+        self.measure(f'{prefix}/calculate_speech_rate_praat', load, run_all('calculate_speech_rate', method='praat'))
+        self.measure(f'{prefix}/praat_get_peaks', with_intensity,
+                     lambda items: [Praat.get_peaks(intensity) for intensity, _ in items])
+        self.measure(f'{prefix}/praat_get_syllable_nuclei', with_intensity,
+                     lambda items: [Praat.get_syllable_nuclei(intensity, threshold, min_dip=2) for intensity, threshold in items])
+        self.measure(f'{prefix}/praat_reference_peaks', with_intensity,
+                     lambda items: [reference_peaks(intensity, threshold) for intensity, threshold in items])
+
+    def measure_corpus(self):
+        from corpus_analyzer import CorpusAnalyzer
+
+        corpus_dir = os.path.join(PACKAGE_DIR, 'data', 'corpus')
+
+        def setup():
+            os.chdir(self.make_run_dir('corpus'))
+
+        def run(_):
+            CorpusAnalyzer([corpus_dir], out_name='benchmark').run()
+
+        self.measure('corpus/CorpusAnalyzer.run', setup, run)
+
+    def measure_recognition(self):
+        from speech_recognition import SpeechRecognition
+        from recognition_backends import StubDiarization, StubTranscription
+
+        wav_paths = sorted(glob.glob(os.path.join(PACKAGE_DIR, 'data', 'wav-files', '**', '*.wav'), recursive=True))
+
+        def setup():
+            os.chdir(self.make_run_dir('recognition'))
+            return SpeechRecognition(diarization_backend=StubDiarization(), transcription_backend=StubTranscription())
+
+        self.measure('recognition/process_files_stub', setup,
+                     lambda recognition: recognition.process_files(wav_paths, output_dir='out/csv'))
+
+    def make_run_dir(self, name):
+        run_dir = os.path.join(self.work_dir, 'runs', name)
+        shutil.rmtree(run_dir, ignore_errors=True)
+        os.makedirs(run_dir)
+        return run_dir
+
+    def run(self):
+        bundled = sorted(glob.glob(os.path.join(PACKAGE_DIR, 'data', '**', '*.wav'), recursive=True))
+        self.measure_wavs('bundled', bundled)
+        for duration in self.durations:
+            name = f'synthetic_{duration:g}s'
+            if not any(self.is_selected(f'{name}/{stage}') for stage in self.WAV_STAGES):
+                continue # 측정하지 않을 긴 합성 신호는 만들지 않는다.
+            wav_path = os.path.join(self.work_dir, f'{name}.wav')
+            if not os.path.exists(wav_path):
+                make_synthetic_wav(wav_path, duration)
+            self.measure_wavs(name, [wav_path])
+        self.measure_corpus()
+        self.measure_recognition()
+        return self.results
+
+    @staticmethod
+    def get_environment():
+        return {
+            "date": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "parselmouth": parselmouth.__version__,
+            "praat": parselmouth.PRAAT_VERSION
+        }
+
+    def save(self, out_path):
+        out_dir = os.path.dirname(out_path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump({"environment": self.get_environment(), "repeat": self.repeat, "results": self.results},
+                      f, ensure_ascii=False, indent=4)
+
+
+def compare_results(baseline, current, threshold=0.2, min_seconds=0.01):
+    """
+    두 측정 결과를 비교해서 시간이나 최대 메모리 증가량이 threshold 비율을 넘은 항목을 찾는다.
+    min_seconds보다 짧은 측정은 잡음이 커서 시간 비교에서 뺀다.
+    기준에서는 성공한 측정이 현재 결과에 없거나 오류가 나면 회귀로 본다.
+    :return: (비교 행 리스트, 회귀 항목 이름 리스트)
+    """
+    rows, regressions = [], []
+    for name, base in baseline['results'].items():
+        new = current['results'].get(name)
+        if 'error' in base:
+            rows.append((name, None, new.get('seconds') if new else None, None, None, 'baseline error'))
+            continue
+        if new is None or 'error' in new:
+            regressions.append(name)
+            rows.append((name, base['seconds'], None, None, None, 'MISSING' if new is None else 'ERROR'))
+            continue
+        time_ratio = new['seconds'] / base['seconds'] if base['seconds'] > 0 else None
+        memory_ratio = (new['peak_rss_mb'] / base['peak_rss_mb']) if base['peak_rss_mb'] > 0 else None
+        flags = []
+        if time_ratio is not None and base['seconds'] >= min_seconds and time_ratio > 1 + threshold:
+            flags.append('TIME')
+        if memory_ratio is not None and memory_ratio > 1 + threshold:
+            flags.append('MEMORY')
+        if flags:
+            regressions.append(name)
+        rows.append((name, base['seconds'], new['seconds'], time_ratio, memory_ratio, ' '.join(flags)))
+    return rows, regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='벤치마크를 실행하고 JSON으로 저장합니다.')
+    run_parser.add_argument('--output', default='out/benchmark/current.json', help='결과 JSON 경로')
+    run_parser.add_argument('--repeat', type=int, default=3, help='측정 반복 횟수')
+    run_parser.add_argument('--durations', type=float, nargs='+', default=list(DEFAULT_DURATIONS), help='합성 신호 길이(초)')
+    run_parser.add_argument('--work-dir', default=None, help='합성 wav와 출력 파일을 둘 디렉토리')
+    run_parser.add_argument('--only', default=None, help='이름에 이 문자열이 들어간 측정만 실행합니다.')
+    compare_parser = subparsers.add_parser('compare', help='기준 결과와 비교해서 회귀를 찾습니다.')
+    compare_parser.add_argument('baseline', help='기준 결과 JSON')
+    compare_parser.add_argument('current', help='비교할 결과 JSON')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help='회귀로 볼 증가 비율 (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        output = os.path.abspath(args.output) # 측정 중에 작업 디렉토리가 바뀌어도 같은 곳에 저장한다.
+        suite = BenchmarkSuite(repeat=args.repeat, work_dir=args.work_dir, durations=args.durations, only=args.only)
+        suite.run()
+        suite.save(output)
+        print(f'save results {output}')
+    else:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.current, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        rows, regressions = compare_results(baseline, current, threshold=args.threshold)
+        print(f"{'name':45s} {'base(s)':>9s} {'new(s)':>9s} {'time':>7s} {'memory':>7s}")
+        for name, base_seconds, new_seconds, time_ratio, memory_ratio, flag in rows:
+            ratio = lambda value: f'{value:6.2f}x' if value is not None else '      -'
+            seconds = lambda value: f'{value:9.3f}' if value is not None else '        -'
+            print(f'{name:45s} {seconds(base_seconds)} {seconds(new_seconds)} {ratio(time_ratio)} {ratio(memory_ratio)} {flag}')
+        if regressions:
+            print(f'{len(regressions)} regression(s) (over {args.threshold:.0%}, missing or error): {", ".join(regressions)}')
+            sys.exit(1)
+        print('no regressions')
@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+
+
+def parse_time(value):
+    """
+    라벨의 'HH:MM:SS.mmm' 시간을 초로 바꾼다.
+    """
+    hours, minutes, seconds = value.split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def get_label_boundaries(label_path):
+    """
+    라벨 json의 stt.segments에서 발화 사이 쉼의 가운데 시간을 구한다. 청크를 나눌 후보 지점으로 사용한다.
+    :param label_path: 코퍼스 라벨 json 경로
+    :return: 오름차순 시간 리스트 (초)
+    """
+    with open(label_path, 'r') as f:
+        data = json.load(f)
+    segments = (data.get('stt') or {}).get('segments') or []
+    spans = sorted((parse_time(segment['startTime']), parse_time(segment['endTime'])) for segment in segments)
+    return [(end + next_start) / 2 for (_, end), (next_start, _) in zip(spans, spans[1:]) if next_start > end]
+
+
+def plan_chunks(duration, chunk_length=60.0, boundaries=None):
+    """
+    duration 길이의 음성을 약 chunk_length 길이의 구간(core)으로 나눈다.
+    boundaries가 주어지면 각 목표 지점에서 chunk_length/4 안에 있는 가장 가까운 후보(발화 사이 쉼)에서 자른다.
+    :return: [(core_start, core_end), ...], 빈틈 없이 0부터 duration까지 이어진다.
+    """
+    boundaries = np.sort(np.asarray(boundaries if boundaries is not None else [], dtype=float))
+    cuts = [0.0]
+    while duration - cuts[-1] > 1.5 * chunk_length:
+        target = cuts[-1] + chunk_length
+        cut = target
+        if len(boundaries):
+            nearest = boundaries[np.argmin(np.abs(boundaries - target))]
+            if abs(nearest - target) <= chunk_length / 4:
+                cut = float(nearest)
+        cuts.append(cut)
+    cuts.append(duration)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def get_chunk_range(core_start, core_end, duration, overlap=1.0):
+    """
+    core 양쪽에 overlap만큼 여유를 붙인 분석 구간. 여유 구간의 프레임은 이어 붙일 때 버린다.
+    """
+    return max(0.0, core_start - overlap), min(duration, core_end + overlap)
+
+
+def select_core(times, core_start, core_end, is_last=False):
+    """
+    core 구간 [core_start, core_end)에 속하는 프레임의 마스크. 마지막 청크는 끝 시간을 포함한다.
+    """
+    times = np.asarray(times, dtype=float)
+    return (times >= core_start) & ((times <= core_end) if is_last else (times < core_end))
+
+
+def stitch_series(parts):
+    """
+    청크별로 core만 남긴 (times, values...) 튜플들을 시간 순서대로 이어 붙인다.
+    :param parts: 청크 순서대로 정렬된 튜플 리스트, 각 원소는 같은 개수의 1차원 배열
+    :return: 배열 튜플
+    """
+    return tuple(np.concatenate([np.asarray(part[i], dtype=float) for part in parts]) for i in range(len(parts[0])))
@@ -2,33 +2,87 @@ import os
 
 import json
 import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 from tqdm import tqdm
 
+import tracing
 from speech_analysis import SpeechAnalysis
+from analysis_profiles import PROFILES, DEFAULT_PROFILE
+from feature_cache import FeatureCache
+from result_writer import JsonlResultWriter
+from feature_stats import GroupedFeatureStats
+from feature_record import FeatureRecord
+from corpus_index import CorpusIndex
+from chunked_analysis import get_label_boundaries
 
 class CorpusAnalyzer(SpeechAnalysis):
     """
     각 코퍼스에서의 발화를 분석하여 기초 자료를 추출합니다.
     나이, 성별, 학력, 질환, 음성피쳐 등등
     """
-    def __init__(self, corpus_list, out_name):
+    def __init__(self, corpus_list, out_name, workers=1, chunksize=1, cache_dir=None, cache_max_bytes=1024 * 1024 * 1024,
+                 stream=False, group_by=('gender', 'age_band'), features=SpeechAnalysis.FEATURES, index_path=None,
+                 label_filter=None, chunk_length=None, profile=DEFAULT_PROFILE, chunk_workers=None):
         """
         wav file 경로를 미리 생성해놓고, 각 json을 돌면서 wav를 찾아서 분석합니다.
+        :param workers: 분석 프로세스 수, 1이면 현재 프로세스에서 순서대로 분석한다.
+        :param chunksize: 한 번에 각 프로세스로 보내는 파일 수
+        :param cache_dir: 피쳐 캐시 디렉토리, None이면 캐시를 사용하지 않는다.
+        :param cache_max_bytes: 피쳐 캐시 최대 크기
+        :param stream: True이면 결과를 메모리에 모으지 않고 파일마다 바로 JSONL로 기록하며,
+                       다시 실행하면 이미 기록된 파일은 건너뛴다.
+        :param group_by: 통계를 묶을 메타데이터 (gender, age_band, speaker_id, corpus)
+        :param features: 계산할 피쳐 ('pitch', 'formants', 'speech_rate' 중 일부)
+        :param index_path: 코퍼스 색인(SQLite) 경로, 주어지면 glob과 라벨 json 읽기 대신 색인을 사용하고
+                           바뀐 파일만 다시 색인한다.
+        :param label_filter: 색인에서 고를 라벨 조건 (CorpusIndex.select_labels 인자, 예: {'gender': 'f', 'min_age': 60})
+        :param chunk_length: 주어지면 긴 녹음을 라벨의 발화 사이 쉼에서 약 chunk_length초 청크로 나눠 병렬로 분석한다.
+        :param profile: 분석 프로필 이름('fast', 'standard', 'precise'), adaptive 프로필은 파일마다 메타데이터의
+                        성별, 나이로 피치 범위와 최대 포먼트 주파수를 맞춘다.
+        :param chunk_workers: 파일 하나의 청크를 분석하는 프로세스 수, None이면 CPU 수를 workers로 나눈 수
+                              (파일 단위 프로세스마다 청크 프로세스 풀을 따로 만들기 때문)
         """
         self.corpus_list = corpus_list
         self.out_name = out_name
+        self.workers = workers
+        self.chunksize = chunksize
+        self.cache_config = (cache_dir, cache_max_bytes) if cache_dir else None
+        self.cache = FeatureCache(cache_dir, max_bytes=cache_max_bytes) if cache_dir else None
+        self.stream = stream
+        self.writer = None
+        self.group_by = group_by
+        self.features = tuple(features)
+        self.chunk_length = chunk_length
+        self.chunk_workers = chunk_workers if chunk_workers else max(1, (os.cpu_count() or 1) // max(1, workers))
+        self.profile = profile
+        self.stats = GroupedFeatureStats(group_by)
+        self.corpus_id = 0
         self.corpus_json_dict = {}
         self.corpus_wav_dict = {}
+        self.index = CorpusIndex(index_path) if index_path else None
+        if label_filter and self.index is None:
+            raise ValueError('label_filter requires index_path')
 
         # 디렉토리에서 모든 WAV 파일과 JSON 파일 찾기
         for idx, corpus in enumerate(corpus_list):
-            wavs = glob.glob(os.path.join(corpus, '**/*.wav'), recursive=True) # file 이름 규칙은 변경될 수 있다.
-            json_files = glob.glob(os.path.join(corpus, '**/*.json'), recursive=True)
+            if self.index is not None:
+                self.index.update(corpus, idx)
+                if label_filter:
+                    self.corpus_json_dict[f'{str(idx)}_json'] = self.index.select_labels(idx, **label_filter)
+                else:
+                    self.corpus_json_dict[f'{str(idx)}_json'] = self.index.get_label_paths(idx)
+                self.corpus_wav_dict[f'{str(idx)}_wavs'] = self.index.get_wav_dict(idx)
+                continue
+            # 색인과 같은 경로 순서로 분석해서 결과와 통계가 색인 사용 여부와 관계없이 같게 한다.
+            wavs = sorted(glob.glob(os.path.join(corpus, '**/*.wav'), recursive=True)) # file 이름 규칙은 변경될 수 있다.
+            json_files = sorted(glob.glob(os.path.join(corpus, '**/*.json'), recursive=True))
             self.corpus_json_dict[f'{str(idx)}_json'] = json_files # 요청된 corpus 리스트 순서대로 번호를 부여한다.
             self.corpus_wav_dict[f'{str(idx)}_wavs'] = self.mapping_name(wavs)
 
         self.results = []
+        self.errors = []
 
     def mapping_name(self, target_dir_files):
         wav_id_dict = {}
@@ -43,30 +97,57 @@ class CorpusAnalyzer(SpeechAnalysis):
             data = json.load(file)
             return data
 
+    def save_stats_to_json(self, out_name):
+        """
+        그룹별 피쳐 통계 요약과, 다른 실행 결과와 합칠 수 있는 상태를 함께 저장한다.
+        """
+        if not os.path.isdir('out/json/corpus'):
+            os.makedirs('out/json/corpus')
+        with tracing.span('write', format='stats'), \
+             open(f'out/json/corpus/{out_name}_stats.json', 'w', encoding='utf-8') as file:
+            json.dump({"summary": self.stats.summary(), "state": self.stats.get_state()}, file, ensure_ascii=False)
+
     def save_analysis_to_json(self, out_name):
         if not os.path.isdir('out/json/corpus'):
-            os.mkdir('out/json/corpus')
-        with open(f'out/json/corpus/{out_name}.json', 'w', encoding='utf-8') as file:
-            json.dump(self.results, file, ensure_ascii=False, indent=4)
+            os.makedirs('out/json/corpus')
+        with tracing.span('write', format='json'), \
+             open(f'out/json/corpus/{out_name}.json', 'w', encoding='utf-8') as file:
+            # 전체를 사전 리스트로 바꾸지 않고 파일 하나씩 바꿔서 json.dump(indent=4)와 같은 모양으로 쓴다.
+            file.write('[')
+            for index, record in enumerate(self.results):
+                text = json.dumps(record.to_dict(), ensure_ascii=False, indent=4)
+                file.write((',\n    ' if index else '\n    ') + text.replace('\n', '\n    '))
+            file.write('\n]' if self.results else ']')
+
+    @staticmethod
+    def get_file_name(meta_file:str):
+        return os.path.basename(meta_file).split('.')[0]
 
     def get_metadata(self, meta_file:str, corpus_id:int):
-        base_name = os.path.basename(meta_file).split('.')[0]
+        base_name = self.get_file_name(meta_file)
 
         # 한국어방언데이터(충청,전라,제주)
         if corpus_id == 0:
-            with open(meta_file, 'r') as f:
-                data = json.load(f)
+            data = self.index.get_label(meta_file) if self.index is not None else None
+            if data is None: # 색인되지 않은 라벨은 json을 직접 읽는다.
+                with open(meta_file, 'r') as f:
+                    data = json.load(f)
             if len(data['speaker']) > 1:
                 pass
                 # print(f'speaker가 2명 이상입니다. {data['filename']}')
             gender = data['speaker'][0]['gender']
             age = 2023 - int(data['speaker'][0]['birthYear'])
+            # 분석 프로필은 녹음의 모든 화자(2인 발화 등)의 범위를 사용한다.
+            speakers = [{"gender": speaker.get('gender', ''),
+                         "age": 2023 - int(speaker['birthYear']) if speaker.get('birthYear') else None}
+                        for speaker in data['speaker']]
             meta_dict = {
                 "speaker_id" : data['speaker'],
                 "file_path" : meta_file,
                 "file_name" : base_name,
                 "gender" : gender,
                 "age" : age,
+                "speakers" : speakers,
                 "segment_id": '',
                 "disease" : ''
             }
@@ -87,28 +168,123 @@ class CorpusAnalyzer(SpeechAnalysis):
         """
         # 낭송 데이터의 경우 json 파일 하나에
         # 모든 정보가 다 들어있으므로 따로 처리해야 한다.
+        if self.writer is not None: # 이전 실행에서 이미 기록된 파일은 건너뛴다.
+            json_files = [json_file for json_file in json_files if not self.writer.is_completed(self.get_file_name(json_file))]
+
+        if self.workers > 1:
+            self.analyze_speech_parallel(json_files, corpus_id=corpus_id)
+            return
+
         for json_file in tqdm(json_files):
             try:
                 user_meta = self.get_metadata(json_file, corpus_id)
                 self.extract_features(user_meta=user_meta, corpus_id=corpus_id)
             except Exception as e:
-                print(f'Error Analyze Speech for {json_file}: {e}')
+                self.report_error(json_file, e)
                 continue
 
+    def analyze_speech_parallel(self, json_files, corpus_id=0):
+        """
+        프로세스 풀에서 파일별 음성 특성을 추출한다.
+        워커에는 wav 경로와 메타데이터만 전달하며, 결과는 json_files 순서대로 모은다.
+        :param json_files: corpus json 파일
+        :param corpus_id: 코퍼스 인덱스
+        """
+        tracer = tracing.get_tracer()
+        jobs = []
+        for json_file in json_files:
+            try:
+                user_meta = self.get_metadata(json_file, corpus_id)
+                jobs.append((json_file, self.get_wav_path(user_meta, corpus_id), user_meta, self.cache_config,
+                             self.group_by, corpus_id, self.features, self.chunk_length, self.chunk_workers, self.profile,
+                             tracer is not None))
+            except Exception as e:
+                self.report_error(json_file, e)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            outputs = executor.map(_extract_features_job, jobs, chunksize=self.chunksize)
+            for job, (analysis_results, error, cache_hit, stats_state, records) in tqdm(zip(jobs, outputs), total=len(jobs)):
+                if records: # 워커에서 기록한 span
+                    tracer.add_records(records)
+                if error is not None:
+                    self.report_error(job[0], error)
+                    continue
+                if self.cache is not None: # 워커 프로세스의 캐시 적중 여부를 모은다.
+                    if cache_hit:
+                        self.cache.hits += 1
+                    else:
+                        self.cache.misses += 1
+                self.add_result(analysis_results, GroupedFeatureStats.from_state(stats_state))
+
+    def add_result(self, analysis_results, partial_stats=None):
+        """
+        스트리밍 모드에서는 결과를 바로 기록하고, 아니면 self.results에 모은다.
+        :param analysis_results: FeatureRecord
+        그룹 통계는 워커가 계산한 부분 상태(partial_stats)가 있으면 합치고, 없으면 직접 더한다.
+        """
+        if partial_stats is not None:
+            self.stats.merge(partial_stats)
+        else:
+            self.stats.add_record(analysis_results, self.corpus_id)
+
+        if self.writer is not None:
+            with tracing.span('write', format='jsonl'):
+                self.writer.write(analysis_results.to_dict(), analysis_results.meta_data['file_name'])
+        else:
+            self.results.append(analysis_results)
+
+    def report_error(self, json_file, error):
+        print(f'Error Analyze Speech for {json_file}: {error}')
+        self.errors.append((json_file, str(error)))
+
+    def get_wav_path(self, user_meta, corpus_id=0):
+        return self.corpus_wav_dict[f'{str(corpus_id)}_wavs'][user_meta['file_name']]
+
     def extract_features(self, user_meta, corpus_id=0):
         """
         음성 특성 추출 함수
         :param user_meta: user meta data
         :return analysis_results: 분석 결과 저장
         """
-        analyzer = SpeechAnalysis(self.corpus_wav_dict[f'{str(corpus_id)}_wavs'][user_meta['file_name']])
-        analysis_results = {
-            "meta_data": user_meta,
-            "pitch": list(zip(*analyzer.pitch)),
-            "formants": list(zip(*analyzer.formants)),
-            "speech_rate": analyzer.speech_rate
-        }
-        self.results.append(analysis_results)
+        analysis_results = self.analyze_wav(self.get_wav_path(user_meta, corpus_id), user_meta, cache=self.cache,
+                                            features=self.features, chunk_length=self.chunk_length,
+                                            chunk_workers=self.chunk_workers, profile=self.profile)
+        self.add_result(analysis_results)
+
+    @staticmethod
+    def analyze_wav(wav_path, user_meta, cache=None, features=SpeechAnalysis.FEATURES, chunk_length=None,
+                    chunk_workers=None, profile=DEFAULT_PROFILE):
+        """
+        wav 파일 하나를 분석하여 메타데이터와 함께 결과 레코드를 만든다.
+        :param wav_path: 분석할 wav 경로
+        :param user_meta: user meta data
+        :param cache: FeatureCache
+        :param features: 계산할 피쳐
+        :param chunk_length: 긴 녹음을 나눌 청크 길이(초), None이면 나누지 않는다.
+        :param chunk_workers: 청크 분석 프로세스 수
+        :param profile: 분석 프로필, user_meta의 성별, 나이로 화자에 맞춘다.
+        :return: analysis_results (FeatureRecord, to_dict로 예전 결과 사전을 얻는다)
+        """
+        return CorpusAnalyzer.make_results(CorpusAnalyzer.make_analyzer(wav_path, user_meta, cache, features, chunk_length,
+                                                                        chunk_workers, profile), user_meta)
+
+    @staticmethod
+    def make_analyzer(wav_path, user_meta, cache=None, features=SpeechAnalysis.FEATURES, chunk_length=None,
+                      chunk_workers=None, profile=DEFAULT_PROFILE):
+        with tracing.span('analyze_file', file_name=user_meta['file_name']) as span:
+            chunk_boundaries = None
+            if chunk_length:
+                chunk_boundaries = get_label_boundaries(user_meta['file_path'])
+            analyzer = SpeechAnalysis(wav_path, cache=cache, features=features, chunk_length=chunk_length,
+                                      chunk_boundaries=chunk_boundaries, chunk_workers=chunk_workers, profile=profile,
+                                      meta_data=user_meta)
+            span.set(audio_seconds=analyzer.sound.duration, cache_hit=analyzer.cache_hit, profile=analyzer.profile.name,
+                     speaker=analyzer.profile.speaker)
+        return analyzer
+
+    @staticmethod
+    def make_results(analyzer, user_meta):
+        return FeatureRecord.from_analyzer(analyzer, user_meta)
 
     def run(self):
         """
@@ -117,16 +293,101 @@ class CorpusAnalyzer(SpeechAnalysis):
         for idx, (corpus, k) in tqdm(enumerate(zip(self.corpus_list, self.corpus_json_dict.keys()))):
             print(f'\nStart Analysis index {idx}')
             print(f'target_corpus_directory: {corpus}\nindex: {k}')
+            self.corpus_id = idx
+            self.stats = GroupedFeatureStats(self.group_by)
+            if self.stream:
+                out_path = f'out/json/corpus/{self.out_name}_{idx}.jsonl'
+                with JsonlResultWriter(out_path) as self.writer:
+                    self.analyze_speech(self.corpus_json_dict[k], corpus_id=idx)
+                self.writer = None
+                # 이전 실행에서 기록된 파일까지 포함하도록 JSONL 전체로 통계를 다시 만든다.
+                self.stats = GroupedFeatureStats.from_jsonl(out_path, corpus_id=idx, group_by=self.group_by)
+                self.save_stats_to_json(f'{self.out_name}_{idx}')
+                print(f'Finish')
+                print(f'---------------------------------------------')
+                print(f'save results {out_path}')
+                continue
             self.analyze_speech(self.corpus_json_dict[k], corpus_id=idx)
             print(f'Finish')
             print(f'---------------------------------------------')
             self.save_analysis_to_json(f'{self.out_name}_{idx}')
+            self.save_stats_to_json(f'{self.out_name}_{idx}')
             print(f'save results out/json/corpus/{self.out_name}_{idx}')
             self.results = [] # 변수 초기화
+        if self.cache is not None:
+            print(f'feature cache: {self.cache.stats()}')
+
+
+_worker_caches = {} # 워커 프로세스마다 캐시 객체를 한 번만 만든다.
+
+
+def _extract_features_job(job):
+    """
+    프로세스 풀 워커에서 실행되는 파일 단위 분석 함수
+    :param job: (json_file, wav_path, user_meta, cache_config, group_by, corpus_id, features, chunk_length,
+                 chunk_workers, profile, trace)
+    :return: (analysis_results, error, cache_hit, stats_state, trace가 True이면 워커에서 기록한 span 리스트)
+    """
+    _, wav_path, user_meta, cache_config, group_by, corpus_id, features, chunk_length, chunk_workers, profile, trace = job
+    tracer = tracing.start_worker() if trace else None
+    cache = None
+    if cache_config is not None:
+        if cache_config not in _worker_caches:
+            cache_dir, cache_max_bytes = cache_config
+            _worker_caches[cache_config] = FeatureCache(cache_dir, max_bytes=cache_max_bytes)
+        cache = _worker_caches[cache_config]
+    try:
+        analyzer = CorpusAnalyzer.make_analyzer(wav_path, user_meta, cache, features, chunk_length, chunk_workers, profile)
+        analysis_results = CorpusAnalyzer.make_results(analyzer, user_meta)
+        # 그룹 통계의 부분 상태를 워커에서 만들어 부모 프로세스에서 합친다. (직렬 실행과 같은 float32 값으로)
+        partial_stats = GroupedFeatureStats(group_by)
+        partial_stats.add_record(analysis_results, corpus_id)
+        records = tracer.pop_records() if tracer is not None else None
+        return analysis_results, None, analyzer.cache_hit, partial_stats.get_state(), records
+    except Exception as e:
+        return None, str(e), False, None, tracer.pop_records() if tracer is not None else None
+
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=1, help='분석 프로세스 수')
+    parser.add_argument('--chunksize', type=int, default=1, help='프로세스마다 한 번에 보내는 파일 수')
+    parser.add_argument('--cache-dir', default='out/cache/features', help='피쳐 캐시 디렉토리')
+    parser.add_argument('--cache-size-mb', type=int, default=1024, help='피쳐 캐시 최대 크기(MB)')
+    parser.add_argument('--no-cache', action='store_true', help='피쳐 캐시를 사용하지 않습니다.')
+    parser.add_argument('--stream', action='store_true', help='결과를 파일마다 JSONL로 바로 기록하고 중단된 실행을 이어갑니다.')
+    parser.add_argument('--features', nargs='+', default=list(SpeechAnalysis.FEATURES), choices=SpeechAnalysis.FEATURES,
+                        help='계산할 피쳐')
+    parser.add_argument('--group-by', nargs='+', default=['gender', 'age_band'], choices=GroupedFeatureStats.GROUP_KEYS,
+                        help='통계를 묶을 메타데이터')
+    parser.add_argument('--index-path', default=None, help='코퍼스 색인(SQLite) 경로, 주어지면 바뀐 파일만 다시 색인합니다.')
+    parser.add_argument('--gender', default=None, help='색인에서 고를 화자 성별 (f, m)')
+    parser.add_argument('--min-age', type=int, default=None, help='색인에서 고를 최소 나이')
+    parser.add_argument('--max-age', type=int, default=None, help='색인에서 고를 최대 나이')
+    parser.add_argument('--province', default=None, help='색인에서 고를 거주 지역 코드 (예: cc 충청도)')
+    parser.add_argument('--chunk-length', type=float, default=None,
+                        help='긴 녹음을 이 길이(초)의 청크로 나눠 병렬로 분석합니다.')
+    parser.add_argument('--chunk-workers', type=int, default=None,
+                        help='파일 하나의 청크를 분석하는 프로세스 수 (기본값: CPU 수 / workers)')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=list(PROFILES),
+                        help='분석 프로필 (fast, precise는 화자 성별, 나이로 피치 범위와 최대 포먼트 주파수를 맞춥니다.)')
+    parser.add_argument('--trace', default=None, help='단계별 span을 기록할 JSONL 경로 (예: out/trace/corpus.jsonl)')
+    parser.add_argument('--metrics', default=None, help='단계별 합계를 저장할 Prometheus 텍스트 파일 경로')
+    args = parser.parse_args()
+    if args.trace or args.metrics:
+        tracing.enable(args.trace, args.metrics)
+    label_filter = {key: value for key, value in (('gender', args.gender), ('min_age', args.min_age),
+                                                  ('max_age', args.max_age), ('province', args.province))
+                    if value is not None}
+
     # 0: 중.노년층 한국어 방언 데이터
     corpus_list = ['./data/corpus']
-    analyzer = CorpusAnalyzer(corpus_list, out_name='speech_analysis')
+    analyzer = CorpusAnalyzer(corpus_list, out_name='speech_analysis', workers=args.workers, chunksize=args.chunksize,
+                              cache_dir=None if args.no_cache else args.cache_dir,
+                              cache_max_bytes=args.cache_size_mb * 1024 * 1024, stream=args.stream, group_by=args.group_by,
+                              features=args.features, index_path=args.index_path, label_filter=label_filter,
+                              chunk_length=args.chunk_length, profile=args.profile, chunk_workers=args.chunk_workers)
     analyzer.run()
-
+    tracer = tracing.disable()
+    if tracer is not None:
+        tracer.print_summary()
@@ -0,0 +1,188 @@
+import os
+import json
+import sqlite3
+import argparse
+
+
+class CorpusIndex:
+    """
+    코퍼스의 라벨 json, wav 경로와 파싱한 메타데이터를 SQLite 파일에 저장해두는 색인입니다.
+    다시 훑을 때는 크기나 수정 시간이 바뀐 파일만 다시 읽고, 메타데이터 조건으로 라벨을 고를 때는
+    json 파일을 열지 않습니다.
+    """
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            corpus_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            base_name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_corpus ON files (corpus_id, kind, base_name);
+        CREATE TABLE IF NOT EXISTS labels (
+            label_path TEXT PRIMARY KEY REFERENCES files (path) ON DELETE CASCADE,
+            corpus_id INTEGER NOT NULL,
+            base_name TEXT NOT NULL,
+            speaker TEXT,
+            audio TEXT,
+            speaker_id TEXT,
+            gender TEXT,
+            birth_year INTEGER,
+            province TEXT,
+            record_duration REAL
+        );
+        CREATE INDEX IF NOT EXISTS labels_query ON labels (corpus_id, gender, province, birth_year);
+    '''
+    EXTENSIONS = {'.json': 'json', '.wav': 'wav'}
+
+    def __init__(self, index_path='out/index/corpus.sqlite'):
+        self.index_path = index_path
+        index_dir = os.path.dirname(index_path)
+        if index_dir and not os.path.exists(index_dir):
+            os.makedirs(index_dir, exist_ok=True)
+        self.connection = sqlite3.connect(index_path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(self.SCHEMA)
+
+    @staticmethod
+    def get_base_name(path):
+        return os.path.basename(path).split('.')[0]
+
+    @classmethod
+    def walk(cls, corpus_dir):
+        """
+        glob('**/*.json'), glob('**/*.wav')와 같은 파일을 한 번의 순회로 찾는다. (숨김 파일, 숨김 디렉토리 제외)
+        :return: (경로, 종류, stat) generator
+        """
+        for root, dirs, files in os.walk(corpus_dir):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            for name in files:
+                kind = cls.EXTENSIONS.get(os.path.splitext(name)[1])
+                if kind is None or name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                yield path, kind, os.stat(path)
+
+    @staticmethod
+    def parse_label(label_path):
+        """
+        라벨 json에서 색인할 필드를 읽는다. 첫 번째 화자를 대표 화자로 사용한다.
+        :return: (speaker, audio, speaker_id, gender, birth_year, province, record_duration)
+        """
+        with open(label_path, 'r') as f:
+            data = json.load(f)
+        speakers = data.get('speaker') or []
+        first = speakers[0] if speakers else {}
+        audio = data.get('audio') or {}
+        birth_year = first.get('birthYear')
+        return (json.dumps(speakers, ensure_ascii=False), json.dumps(audio, ensure_ascii=False),
+                first.get('speakerId'), first.get('gender'),
+                int(birth_year) if birth_year not in (None, '') else None,
+                first.get('residenceProvince'), audio.get('recordDuration'))
+
+    def update(self, corpus_dir, corpus_id=0):
+        """
+        코퍼스 디렉토리를 훑어서 색인을 갱신한다. 새로 생기거나 크기, 수정 시간이 바뀐 파일만 다시 읽고
+        사라진 파일은 지운다.
+        :return: {"added": 새로 색인한 파일 수, "updated": 다시 읽은 파일 수, "removed": 지운 파일 수}
+        """
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in self.connection.execute(
+            'SELECT path, size, mtime_ns FROM files WHERE corpus_id = ?', (corpus_id,))}
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        seen = set()
+        with self.connection:
+            for path, kind, stat in self.walk(corpus_dir):
+                seen.add(path)
+                previous = known.get(path)
+                if previous == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                counts["added" if previous is None else "updated"] += 1
+                base_name = self.get_base_name(path)
+                self.connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                                        (path, corpus_id, kind, base_name, stat.st_size, stat.st_mtime_ns))
+                if kind != 'json':
+                    continue
+                try:
+                    label = self.parse_label(path)
+                except (OSError, ValueError, TypeError, AttributeError):
+                    # 읽을 수 없는 라벨은 색인하지 않고, 분석할 때 원래처럼 json을 열어서 오류를 보고한다.
+                    self.connection.execute('DELETE FROM labels WHERE label_path = ?', (path,))
+                    continue
+                self.connection.execute('INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                        (path, corpus_id, base_name) + label)
+            removed = [(path,) for path in known if path not in seen]
+            self.connection.executemany('DELETE FROM files WHERE path = ?', removed)
+            counts["removed"] = len(removed)
+        return counts
+
+    def get_label_paths(self, corpus_id=0):
+        return [path for path, in self.connection.execute(
+            "SELECT path FROM files WHERE corpus_id = ? AND kind = 'json' ORDER BY path", (corpus_id,))]
+
+    def get_wav_dict(self, corpus_id=0):
+        """
+        :return: {파일 이름: wav 경로}, CorpusAnalyzer.mapping_name과 같은 형식
+        """
+        return dict(self.connection.execute(
+            "SELECT base_name, path FROM files WHERE corpus_id = ? AND kind = 'wav' ORDER BY path", (corpus_id,)))
+
+    def get_label(self, label_path):
+        """
+        색인된 라벨 정보를 json을 열지 않고 돌려준다.
+        :return: {'speaker': [...], 'audio': {...}} 또는 색인되지 않았으면 None
+        """
+        row = self.connection.execute('SELECT speaker, audio FROM labels WHERE label_path = ?', (label_path,)).fetchone()
+        if row is None:
+            return None
+        return {"speaker": json.loads(row[0]), "audio": json.loads(row[1])}
+
+    def select_labels(self, corpus_id=0, gender=None, min_age=None, max_age=None, province=None, reference_year=2023):
+        """
+        메타데이터 조건에 맞는 라벨 json 경로를 고른다. 예) 충청도(cc)의 60세 이상 여성 화자:
+        select_labels(gender='f', min_age=60, province='cc')
+        :param reference_year: 나이 계산 기준 연도 (CorpusAnalyzer.get_metadata와 같다)
+        :return: 라벨 json 경로 리스트
+        """
+        query = 'SELECT label_path FROM labels WHERE corpus_id = ?'
+        params = [corpus_id]
+        if gender is not None:
+            query += ' AND gender = ?'
+            params.append(gender)
+        if province is not None:
+            query += ' AND province = ?'
+            params.append(province)
+        if min_age is not None:
+            query += ' AND birth_year <= ?'
+            params.append(reference_year - min_age)
+        if max_age is not None:
+            query += ' AND birth_year >= ?'
+            params.append(reference_year - max_age)
+        return [path for path, in self.connection.execute(query + ' ORDER BY label_path', params)]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--index-path', default='out/index/corpus.sqlite', help='색인 파일 경로')
+    parser.add_argument('--corpus', nargs='+', default=['./data/corpus'], help='코퍼스 디렉토리 (순서대로 corpus_id 부여)')
+    parser.add_argument('--gender', default=None, help='화자 성별 (f, m)')
+    parser.add_argument('--min-age', type=int, default=None, help='최소 나이')
+    parser.add_argument('--max-age', type=int, default=None, help='최대 나이')
+    parser.add_argument('--province', default=None, help='거주 지역 코드 (예: cc 충청도)')
+    args = parser.parse_args()
+
+    with CorpusIndex(args.index_path) as index:
+        for corpus_id, corpus in enumerate(args.corpus):
+            print(f'{corpus}: {index.update(corpus, corpus_id)}')
+            for label_path in index.select_labels(corpus_id, gender=args.gender, min_age=args.min_age,
+                                                  max_age=args.max_age, province=args.province):
+                print(label_path)
@@ -0,0 +1,149 @@
+import os
+import json
+import hashlib
+import threading
+
+import numpy as np
+import parselmouth
+
+
+class FeatureCache:
+    """
+    음성 파일 내용(sha256)과 분석 파라미터를 키로 하는 디스크 피쳐 캐시입니다.
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 지웁니다. (LRU)
+    한 객체를 여러 스레드에서 함께 사용할 수 있습니다. (AnalysisService의 작업 스레드)
+    """
+    def __init__(self, cache_dir='out/cache/features', max_bytes=1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = None # 첫 저장 시에 디렉토리를 훑어서 계산한다.
+        self.file_hashes = {} # (경로, 수정 시간, 크기) -> sha256, 한 원본의 여러 구간을 분석할 때 다시 읽지 않는다.
+        self.lock = threading.Lock() # hits/misses, total_bytes와 교체, 삭제를 보호한다.
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def hash_file(path, block_size=1024 * 1024):
+        """
+        파일 내용의 sha256 값을 구한다.
+        :param path: 파일 경로
+        :return: hex digest
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def make_key(self, wav_path, **params):
+        """
+        오디오 내용, 분석 파라미터, Praat/parselmouth 버전으로 캐시 키를 만든다.
+        :param wav_path: 오디오 파일 경로
+        :param params: pitch_time_range, silence_db, min_pause, min_dip, segment 등 분석 파라미터
+        :return: cache key
+        """
+        stat = os.stat(wav_path)
+        file_id = (os.path.abspath(wav_path), stat.st_mtime_ns, stat.st_size)
+        if file_id not in self.file_hashes:
+            self.file_hashes[file_id] = self.hash_file(wav_path)
+        key_data = {
+            "audio": self.file_hashes[file_id],
+            "params": params,
+            "parselmouth": parselmouth.__version__,
+            "praat": parselmouth.PRAAT_VERSION
+        }
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npz')
+
+    def get(self, key, features=('pitch', 'formants', 'speech_rate')):
+        """
+        캐시된 피쳐를 읽는다. 읽은 항목은 최근 사용으로 표시한다.
+        :param key: cache key
+        :param features: 필요한 피쳐, 하나라도 없으면 miss로 센다.
+        :return: 저장된 피쳐(pitch, formants, speech_rate 중 일부) 사전 또는 None
+        """
+        path = self.get_path(key)
+        cached = {}
+        try:
+            with np.load(path) as data:
+                if 'pitch_times' in data:
+                    cached["pitch"] = (data['pitch_times'], data['pitch_values'])
+                if 'formant_times' in data:
+                    cached["formants"] = (data['formant_times'], data['f1'], data['f2'], data['f3'])
+                if 'speech_rate' in data:
+                    cached["speech_rate"] = float(data['speech_rate'])
+            os.utime(path) # LRU 순서를 위해 수정 시간을 갱신한다.
+        except (OSError, KeyError, ValueError):
+            self.count(hit=False)
+            return None
+        self.count(hit=all(feature in cached for feature in features))
+        return cached
+
+    def count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key, features):
+        """
+        피쳐를 캐시에 저장하고, 크기 제한을 넘으면 오래된 항목을 지운다.
+        :param features: pitch, formants, speech_rate 중 일부를 담은 사전
+        """
+        path = self.get_path(key)
+        # 같은 키를 여러 프로세스, 스레드가 함께 쓸 수 있으므로 임시 파일 이름을 따로 쓴다.
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        arrays = {}
+        if 'pitch' in features:
+            arrays['pitch_times'], arrays['pitch_values'] = features['pitch']
+        if 'formants' in features:
+            arrays['formant_times'], arrays['f1'], arrays['f2'], arrays['f3'] = features['formants']
+        if 'speech_rate' in features:
+            arrays['speech_rate'] = features['speech_rate']
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **{name: np.asarray(value, dtype=float) for name, value in arrays.items()})
+        with self.lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path) # 다른 프로세스가 반쯤 쓰인 파일을 읽지 않도록 한 번에 교체한다.
+
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self.list_entries())
+            else:
+                self.total_bytes += os.path.getsize(path) - old_size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def list_entries(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError: # 다른 프로세스가 먼저 지운 경우
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        """
+        가장 오래 사용하지 않은 항목부터 지워서 전체 크기를 max_bytes 이하로 맞춘다. (self.lock 안에서 호출)
+        """
+        entries = sorted(self.list_entries(), key=lambda entry: entry[2])
+        self.total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
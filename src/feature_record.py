@@ -0,0 +1,100 @@
+import numpy as np
+
+from analysis_profiles import AnalysisProfile
+
+
+def to_json_floats(array):
+    """
+    float32 배열을 JSON에 쓸 파이썬 float 리스트로 바꾼다. float32 값을 그대로 float64로 넓히면
+    123.45600128173828처럼 길어지므로 float32의 가장 짧은 10진 표현(123.456)을 사용한다.
+    """
+    return array.astype(str).astype(float).tolist()
+
+
+class FeatureRecord:
+    """
+    파일 하나의 메타데이터와 피쳐를 연속된 float32 배열로 들고 있는 결과 레코드입니다.
+    프레임마다 (time, value) 튜플을 만드는 대신 컬럼별 배열 하나씩만 두므로, 코퍼스 전체 결과를 메모리에 모아도
+    파이썬 float 객체의 오버헤드가 없습니다. JSON으로 저장할 때만 to_dict로 예전 모양
+    ({"meta_data", "pitch": [[time, value], ...], "formants": [[time, f1, f2, f3], ...], "speech_rate"})으로 바꿉니다.
+    계산하지 않은 피쳐는 None입니다. profile은 분석에 사용한 AnalysisProfile(기록되지 않았으면 None)입니다.
+    """
+    __slots__ = ('meta_data', 'pitch_times', 'pitch_values', 'formant_times', 'f1', 'f2', 'f3', 'speech_rate',
+                 'profile')
+    DTYPE = np.float32
+
+    def __init__(self, meta_data, pitch=None, formants=None, speech_rate=None, profile=None):
+        """
+        :param meta_data: 메타데이터 사전
+        :param pitch: (times, values) 또는 None
+        :param formants: (times, f1, f2, f3) 또는 None
+        :param speech_rate: 발화속도 또는 None
+        :param profile: AnalysisProfile 또는 None
+        """
+        self.meta_data = meta_data
+        self.pitch_times, self.pitch_values = self.to_arrays(pitch, 2)
+        self.formant_times, self.f1, self.f2, self.f3 = self.to_arrays(formants, 4)
+        self.speech_rate = float(speech_rate) if speech_rate is not None else None
+        self.profile = profile
+
+    @classmethod
+    def to_arrays(cls, series, count):
+        if series is None:
+            return (None,) * count
+        return tuple(np.ascontiguousarray(values, dtype=cls.DTYPE) for values in series)
+
+    @classmethod
+    def from_analyzer(cls, analyzer, meta_data):
+        """
+        SpeechAnalysis에서 선택된 피쳐(analyzer.features)만 담은 레코드를 만든다.
+        """
+        return cls(meta_data,
+                   analyzer.pitch if 'pitch' in analyzer.features else None,
+                   analyzer.formants if 'formants' in analyzer.features else None,
+                   analyzer.speech_rate if 'speech_rate' in analyzer.features else None,
+                   analyzer.profile)
+
+    @classmethod
+    def from_dict(cls, analysis_results):
+        """
+        to_dict(또는 예전 CorpusAnalyzer 결과 사전)에서 레코드를 다시 만든다.
+        """
+        pitch = formants = None
+        if 'pitch' in analysis_results:
+            pitch = np.asarray(analysis_results['pitch'], dtype=cls.DTYPE).reshape(-1, 2).T
+        if 'formants' in analysis_results:
+            formants = np.asarray(analysis_results['formants'], dtype=cls.DTYPE).reshape(-1, 4).T
+        profile = analysis_results.get('profile')
+        return cls(analysis_results['meta_data'], pitch, formants, analysis_results.get('speech_rate'),
+                   AnalysisProfile.from_dict(profile) if profile is not None else None)
+
+    @property
+    def pitch(self):
+        return None if self.pitch_times is None else (self.pitch_times, self.pitch_values)
+
+    @property
+    def formants(self):
+        return None if self.formant_times is None else (self.formant_times, self.f1, self.f2, self.f3)
+
+    @property
+    def nbytes(self):
+        """
+        피쳐 배열이 차지하는 바이트 수
+        """
+        return sum(values.nbytes for values in (self.pitch_times, self.pitch_values, self.formant_times,
+                                                self.f1, self.f2, self.f3) if values is not None)
+
+    def to_dict(self):
+        """
+        JSON으로 저장할 예전 모양의 사전을 만든다.
+        """
+        data = {"meta_data": self.meta_data}
+        if self.profile is not None:
+            data["profile"] = self.profile.to_dict()
+        if self.pitch is not None:
+            data["pitch"] = [list(frame) for frame in zip(*(to_json_floats(values) for values in self.pitch))]
+        if self.formants is not None:
+            data["formants"] = [list(frame) for frame in zip(*(to_json_floats(values) for values in self.formants))]
+        if self.speech_rate is not None:
+            data["speech_rate"] = self.speech_rate
+        return data
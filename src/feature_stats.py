@@ -0,0 +1,244 @@
+import json
+
+import numpy as np
+
+from feature_record import FeatureRecord
+
+
+class QuantileSketch:
+    """
+    로그 간격 고정 구간의 히스토그램으로 분위수를 근사합니다.
+    같은 설정의 스케치끼리는 구간별 개수를 더해서 그대로 합칠 수 있습니다.
+    기본 설정(1Hz~20kHz, 2048구간)에서 상대 오차는 약 0.5% 이내입니다.
+    """
+    def __init__(self, low=1.0, high=20000.0, num_bins=2048):
+        self.low = low
+        self.high = high
+        self.num_bins = num_bins
+        self.log_low = np.log(low)
+        self.log_width = (np.log(high) - self.log_low) / num_bins
+        self.counts = np.zeros(num_bins + 2, dtype=np.int64) # 0: low 미만, 마지막: high 이상
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        with np.errstate(divide='ignore', invalid='ignore'): # 0 이하의 값은 첫 구간으로 간다.
+            index = np.floor((np.log(np.maximum(values, 0)) - self.log_low) / self.log_width).astype(np.int64) + 1
+        index = np.clip(index, 0, self.num_bins + 1)
+        self.counts += np.bincount(index, minlength=self.num_bins + 2)
+
+    def merge(self, other):
+        if (self.low, self.high, self.num_bins) != (other.low, other.high, other.num_bins):
+            raise ValueError('QuantileSketch settings do not match')
+        self.counts += other.counts
+
+    def quantile(self, q):
+        """
+        q 분위수의 근사값을 구한다. 구간 안에서는 로그 스케일로 보간한다.
+        """
+        total = self.counts.sum()
+        if total == 0:
+            return None
+        rank = q * total
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, rank, side='left'))
+        index = min(index, self.num_bins + 1)
+        if index == 0:
+            return self.low
+        if index == self.num_bins + 1:
+            return self.high
+        before = cumulative[index - 1]
+        fraction = (rank - before) / self.counts[index] if self.counts[index] else 0.5
+        return float(np.exp(self.log_low + (index - 1 + fraction) * self.log_width))
+
+    def get_state(self):
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            "low": self.low, "high": self.high, "num_bins": self.num_bins,
+            "index": nonzero.tolist(), "counts": self.counts[nonzero].tolist()
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['low'], state['high'], state['num_bins'])
+        sketch.counts[np.asarray(state['index'], dtype=np.int64)] = state['counts']
+        return sketch
+
+
+class RunningStats:
+    """
+    개수, 평균, 분산(Welford/Chan), 최솟값, 최댓값, 근사 분위수를 한 번의 순회로 구합니다.
+    값 배열을 묶음 단위로 받아도 되고, 다른 프로세스에서 만든 상태와 합칠 수도 있습니다.
+    """
+    def __init__(self, sketch=None):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = sketch if sketch is not None else QuantileSketch()
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        batch_mean = float(np.mean(values))
+        batch_m2 = float(np.sum((values - batch_mean) ** 2))
+        self.combine(len(values), batch_mean, batch_m2, float(values.min()), float(values.max()))
+        self.sketch.update(values)
+
+    def combine(self, count, mean, m2, min_value, max_value):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, min_value)
+        self.max = max(self.max, max_value)
+
+    def merge(self, other):
+        self.combine(other.count, other.mean, other.m2, other.min, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    def summary(self, quantiles=(0.05, 0.5, 0.95)):
+        if self.count == 0:
+            return {"count": 0}
+        variance = self.variance
+        result = {
+            "count": self.count,
+            "mean": self.mean,
+            "variance": variance,
+            "std": float(np.sqrt(variance)) if variance is not None else None,
+            "min": self.min,
+            "max": self.max
+        }
+        for q in quantiles:
+            result[f"q{int(round(q * 100)):02d}"] = self.sketch.quantile(q)
+        return result
+
+    def get_state(self):
+        return {
+            "count": self.count, "mean": self.mean, "m2": self.m2,
+            "min": self.min if self.count else None, "max": self.max if self.count else None,
+            "sketch": self.sketch.get_state()
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls(QuantileSketch.from_state(state['sketch']))
+        if state['count']:
+            stats.combine(state['count'], state['mean'], state['m2'], state['min'], state['max'])
+        return stats
+
+
+class GroupedFeatureStats:
+    """
+    CorpusAnalyzer.get_metadata의 메타데이터(성별, 연령대, 화자, 코퍼스)로 묶은 피쳐 통계입니다.
+    프레임 수와 관계없이 그룹 x 피쳐 수만큼의 메모리만 사용합니다.
+    """
+    FEATURES = ('pitch', 'f1', 'f2', 'f3', 'speech_rate')
+    # 피쳐별 분위수 스케치 범위 (low, high), 없으면 QuantileSketch 기본값(1Hz~20kHz)
+    # 발화속도(음절/초)는 1 미만일 수 있으므로 따로 범위를 둔다.
+    SKETCH_RANGES = {'speech_rate': (0.01, 50.0)}
+    GROUP_KEYS = ('gender', 'age_band', 'speaker_id', 'corpus')
+
+    def __init__(self, group_by=('gender', 'age_band')):
+        for key in group_by:
+            if key not in self.GROUP_KEYS:
+                raise ValueError(f'Unknown group key: {key}')
+        self.group_by = tuple(group_by)
+        self.groups = {}
+
+    @staticmethod
+    def get_age_band(age):
+        return f'{int(age) // 10 * 10}s' if age not in (None, '') else ''
+
+    def get_group(self, meta_data, corpus_id=0):
+        speakers = meta_data.get('speaker_id')
+        speaker_id = speakers[0].get('speakerId', '') if isinstance(speakers, list) and speakers else str(speakers or '')
+        values = {
+            "gender": meta_data.get('gender', ''),
+            "age_band": self.get_age_band(meta_data.get('age')),
+            "speaker_id": speaker_id,
+            "corpus": str(corpus_id)
+        }
+        return tuple(values[key] for key in self.group_by)
+
+    def get_feature_stats(self, group):
+        if group not in self.groups:
+            self.groups[group] = {feature: RunningStats(QuantileSketch(*self.SKETCH_RANGES.get(feature, ())))
+                                  for feature in self.FEATURES}
+        return self.groups[group]
+
+    def add(self, meta_data, pitch, formants, speech_rate, corpus_id=0):
+        """
+        파일 하나의 피쳐를 해당 그룹 통계에 더한다.
+        :param pitch: (times, values), 계산하지 않았으면 None
+        :param formants: (times, f1, f2, f3), 계산하지 않았으면 None
+        """
+        stats = self.get_feature_stats(self.get_group(meta_data, corpus_id))
+        if pitch is not None:
+            stats['pitch'].update(pitch[1])
+        if formants is not None:
+            for feature, values in zip(('f1', 'f2', 'f3'), formants[1:]):
+                stats[feature].update(values)
+        if speech_rate is not None:
+            stats['speech_rate'].update([speech_rate])
+
+    def add_record(self, analysis_results, corpus_id=0):
+        """
+        CorpusAnalyzer 결과(FeatureRecord) 또는 결과 사전(meta_data, pitch/formants 프레임 리스트)을 더한다.
+        JSONL에서 읽은 사전도 FeatureRecord로 바꿔서 메모리에 모은 결과와 같은 float32 값으로 더한다.
+        """
+        if not isinstance(analysis_results, FeatureRecord):
+            analysis_results = FeatureRecord.from_dict(analysis_results)
+        self.add(analysis_results.meta_data, analysis_results.pitch, analysis_results.formants,
+                 analysis_results.speech_rate, corpus_id)
+
+    def merge(self, other):
+        if self.group_by != other.group_by:
+            raise ValueError('group_by does not match')
+        for group, stats in other.groups.items():
+            own = self.get_feature_stats(group)
+            for feature in self.FEATURES:
+                own[feature].merge(stats[feature])
+
+    def summary(self):
+        return [
+            {"group": dict(zip(self.group_by, group)),
+             "features": {feature: stats[feature].summary() for feature in self.FEATURES}}
+            for group, stats in sorted(self.groups.items())
+        ]
+
+    def get_state(self):
+        return {
+            "group_by": list(self.group_by),
+            "groups": [[list(group), {feature: stats[feature].get_state() for feature in self.FEATURES}]
+                       for group, stats in self.groups.items()]
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        grouped = cls(state['group_by'])
+        for group, stats in state['groups']:
+            grouped.groups[tuple(group)] = {feature: RunningStats.from_state(stats[feature]) for feature in cls.FEATURES}
+        return grouped
+
+    @classmethod
+    def from_jsonl(cls, jsonl_path, corpus_id=0, group_by=('gender', 'age_band')):
+        """
+        CorpusAnalyzer 스트리밍 결과(JSONL)를 한 줄씩 읽어 통계를 만든다.
+        """
+        grouped = cls(group_by)
+        with open(jsonl_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    grouped.add_record(json.loads(line), corpus_id)
+        return grouped
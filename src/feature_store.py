@@ -0,0 +1,147 @@
+import os
+import json
+
+import numpy as np
+
+
+class FeatureStore:
+    """
+    파일별 피치, 포먼트 값을 float32 컬럼 파일에 이어 붙여 저장하는 컬럼형 저장소입니다.
+    base_name별 offset 인덱스(index.jsonl, 추가 전용)로 한 파일의 구간을 찾고, 컬럼은 memmap으로 읽습니다.
+    컬럼을 모두 쓴 뒤에 인덱스를 기록하므로, 쓰기 위해 열 때 인덱스가 가리키는 끝 뒤의 값(기록 중 중단된 값)은 잘라낸다.
+    읽기 전용(mode='r')으로 열면 파일을 고치지 않으므로, 다른 프로세스가 기록하는 중에도 인덱스에 있는 구간만 읽는다.
+    """
+    PITCH_COLUMNS = ('pitch_times', 'pitch_values')
+    FORMANT_COLUMNS = ('formant_times', 'f1', 'f2', 'f3')
+    DTYPE = np.dtype('<f4')
+
+    def __init__(self, store_dir='out/store/features', mode='a'):
+        """
+        :param store_dir: 저장소 디렉토리
+        :param mode: 'a'이면 이어 쓰기 (열 때 인덱스와 컬럼을 맞춘다), 'r'이면 읽기 전용
+        """
+        if mode not in ('a', 'r'):
+            raise ValueError(f'Unknown mode: {mode}')
+        self.store_dir = store_dir
+        self.mode = mode
+        if mode == 'a' and not os.path.exists(self.store_dir):
+            os.makedirs(self.store_dir)
+        self.index_path = os.path.join(self.store_dir, 'index.jsonl')
+        self.index = {}
+        if os.path.exists(self.index_path):
+            index_size = 0
+            with open(self.index_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'): # 기록되다 만 마지막 줄
+                        break
+                    entry = json.loads(line)
+                    self.index[entry.pop('base_name')] = entry # 같은 이름은 마지막 기록이 우선한다.
+                    index_size += len(line)
+            if mode == 'a' and os.path.getsize(self.index_path) != index_size:
+                os.truncate(self.index_path, index_size)
+        self._columns = {}
+        if mode == 'a':
+            self.truncate_columns()
+
+    def truncate_columns(self):
+        """
+        각 컬럼 파일을 인덱스의 마지막 구간 끝까지 잘라서 같은 종류의 컬럼 길이를 맞춘다.
+        새 구간은 항상 끝에 붙으므로 마지막 구간은 인덱스에 남아 있는 항목 중 끝이 가장 큰 구간이다.
+        """
+        for kind, columns in (('pitch', self.PITCH_COLUMNS), ('formants', self.FORMANT_COLUMNS)):
+            end = max((offset + length for offset, length in (entry[kind] for entry in self.index.values())), default=0)
+            for column in columns:
+                if self.get_column_size(column) > end:
+                    os.truncate(self.get_column_path(column), end * self.DTYPE.itemsize)
+                elif self.get_column_size(column) < end:
+                    raise ValueError(f'Column {column} is shorter than the index ({self.store_dir})')
+
+    def get_column_path(self, column):
+        return os.path.join(self.store_dir, f'{column}.f32')
+
+    def get_column_size(self, column):
+        path = self.get_column_path(column)
+        return os.path.getsize(path) // self.DTYPE.itemsize if os.path.exists(path) else 0
+
+    def append_columns(self, columns, arrays):
+        """
+        같은 길이의 배열들을 각 컬럼 파일 끝에 붙인다.
+        :return: offset, length
+        """
+        if self.mode == 'r':
+            raise ValueError(f'FeatureStore is opened read-only ({self.store_dir})')
+        offset = self.get_column_size(columns[0])
+        length = len(arrays[0])
+        for column in columns: # 하나라도 어긋나 있으면 아무것도 쓰지 않는다.
+            if self.get_column_size(column) != offset:
+                raise ValueError(f'Column {column} is out of sync with {columns[0]}')
+        for column, array in zip(columns, arrays):
+            with open(self.get_column_path(column), 'ab') as f:
+                f.write(np.asarray(array, dtype=self.DTYPE).tobytes())
+            self._columns.pop(column, None) # 크기가 바뀌었으므로 memmap을 다시 연다.
+        return offset, length
+
+    def append(self, base_name, pitch, formants, speech_rate, profile=None):
+        """
+        한 파일의 피쳐를 저장한다. 같은 base_name을 다시 저장하면 인덱스가 새 구간을 가리킨다.
+        :param base_name: 파일 이름
+        :param pitch: (times, values)
+        :param formants: (times, f1, f2, f3)
+        :param speech_rate: 발화 속도
+        :param profile: 분석에 사용한 프로필 (AnalysisProfile.to_dict), 인덱스에 함께 기록한다.
+        """
+        pitch_offset, pitch_length = self.append_columns(self.PITCH_COLUMNS, pitch)
+        formant_offset, formant_length = self.append_columns(self.FORMANT_COLUMNS, formants)
+        entry = {
+            "pitch": [pitch_offset, pitch_length],
+            "formants": [formant_offset, formant_length],
+            "speech_rate": float(speech_rate) if speech_rate is not None else None
+        }
+        if profile is not None:
+            entry["profile"] = profile
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(dict(base_name=base_name, **entry), ensure_ascii=False) + '\n')
+        self.index[base_name] = entry
+
+    def column(self, column):
+        """
+        컬럼 전체를 memmap으로 연다. (코퍼스 전체 스캔용)
+        """
+        if column not in self._columns:
+            if self.get_column_size(column) == 0:
+                self._columns[column] = np.empty(0, dtype=self.DTYPE)
+            else:
+                # 다른 프로세스가 기록 중인 마지막 값은 4바이트가 다 채워지지 않았을 수 있으므로 온전한 값까지만 연다.
+                self._columns[column] = np.memmap(self.get_column_path(column), dtype=self.DTYPE, mode='r',
+                                                  shape=(self.get_column_size(column),))
+        return self._columns[column]
+
+    def names(self):
+        return list(self.index.keys())
+
+    def get(self, base_name):
+        """
+        한 파일의 피쳐 구간을 복사 없이 잘라서 돌려준다.
+        :return: pitch, formants, speech_rate, profile(기록되지 않았으면 None) 사전
+        """
+        entry = self.index[base_name]
+        pitch_offset, pitch_length = entry['pitch']
+        formant_offset, formant_length = entry['formants']
+        return {
+            "pitch": tuple(self.column(c)[pitch_offset:pitch_offset + pitch_length] for c in self.PITCH_COLUMNS),
+            "formants": tuple(self.column(c)[formant_offset:formant_offset + formant_length] for c in self.FORMANT_COLUMNS),
+            "speech_rate": entry['speech_rate'],
+            "profile": entry.get('profile')
+        }
+
+    def scan(self, column):
+        """
+        인덱스가 가리키는 모든 파일의 값을 한 컬럼으로 돌려준다.
+        다시 저장되어 버려진 구간이 없으면 memmap 전체를 그대로 쓴다.
+        """
+        kind = 'pitch' if column in self.PITCH_COLUMNS else 'formants'
+        ranges = sorted(entry[kind] for entry in self.index.values())
+        data = self.column(column)
+        if sum(length for _, length in ranges) == len(data):
+            return data
+        return np.concatenate([data[offset:offset + length] for offset, length in ranges] + [np.empty(0, dtype=self.DTYPE)])
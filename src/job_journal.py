@@ -0,0 +1,116 @@
+import os
+import json
+import threading
+
+from feature_cache import FeatureCache
+
+
+class JobJournal:
+    """
+    SpeechRecognition.process_files의 파일별 진행 상황을 추가 전용 JSONL에 기록하는 작업 일지입니다.
+    단계가 끝날 때마다 (입력 경로, 내용 해시, 단계, 걸린 시간, 음성 길이, 출력 위치)를 한 줄씩 fsync해서 남기므로,
+    중단된 뒤 다시 실행하면 끝난 단계는 건너뛰고 남은 단계만 처리할 수 있습니다.
+    입력 파일 내용이 바뀌면(해시가 다르면) 그 파일의 이전 기록은 무시됩니다.
+    """
+    STAGES = ('diarization', 'split', 'transcription', 'writer')
+
+    def __init__(self, journal_path, resume=True):
+        """
+        :param journal_path: 일지 JSONL 경로
+        :param resume: False이면 이전 기록을 지우고 새로 시작한다.
+        """
+        self.journal_path = journal_path
+        journal_dir = os.path.dirname(journal_path)
+        if journal_dir and not os.path.exists(journal_dir):
+            os.makedirs(journal_dir, exist_ok=True)
+        self.entries = {} # audio_path -> {"hash", "size", "mtime_ns", "stages": {stage: record}}
+        self.history = [] # 단계별 처리 속도를 구하기 위한 (stage, elapsed, audio_seconds)
+        self.last_outputs = None # 마지막 writer 기록의 출력 파일 크기
+        if resume:
+            self.load()
+        self.file = open(journal_path, 'a' if resume else 'w', encoding='utf-8')
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+        일지를 읽는다. 기록되다 만 마지막 줄은 잘라내서 이어 쓰는 기록이 그 뒤에 붙지 않게 한다.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        valid_size = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'): # 기록되다 만 마지막 줄
+                    break
+                self.apply(json.loads(line))
+                valid_size += len(line)
+        if os.path.getsize(self.journal_path) != valid_size:
+            os.truncate(self.journal_path, valid_size)
+
+    def apply(self, record):
+        entry = self.entries.get(record['audio_path'])
+        if entry is None or entry['hash'] != record['hash']:
+            entry = self.entries[record['audio_path']] = {"hash": record['hash'], "stages": {}}
+        entry['size'], entry['mtime_ns'] = record['size'], record['mtime_ns']
+        entry['stages'][record['stage']] = record
+        if record.get('elapsed') is not None and record.get('audio_seconds'):
+            self.history.append((record['stage'], record['elapsed'], record['audio_seconds']))
+        if record['stage'] == 'writer': # 컬럼형 출력(outputs 없음) 뒤에는 CSV를 이어 쓸 수 없다.
+            self.last_outputs = record.get('outputs')
+
+    def get_hash(self, audio_path):
+        """
+        입력 파일의 sha256. 크기와 수정 시간이 일지의 기록과 같으면 파일을 다시 읽지 않는다.
+        :return: (hash, size, mtime_ns)
+        """
+        stat = os.stat(audio_path)
+        entry = self.entries.get(audio_path)
+        if entry is not None and (entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            return entry['hash'], stat.st_size, stat.st_mtime_ns
+        return FeatureCache.hash_file(audio_path), stat.st_size, stat.st_mtime_ns
+
+    def get_stages(self, audio_path, file_hash):
+        """
+        :return: {끝난 단계: 기록}, 해시가 다르면 빈 사전
+        """
+        entry = self.entries.get(audio_path)
+        if entry is None or entry['hash'] != file_hash:
+            return {}
+        return dict(entry['stages'])
+
+    def record(self, audio_path, file_id, stage, elapsed=None, audio_seconds=None, **data):
+        """
+        단계 하나가 끝났음을 기록한다. (여러 단계 스레드에서 호출된다)
+        :param file_id: get_hash가 돌려준 (hash, size, mtime_ns)
+        :param data: 단계 결과 (speaker_dict, 출력 위치 등)
+        """
+        file_hash, size, mtime_ns = file_id
+        record = dict(audio_path=audio_path, hash=file_hash, size=size, mtime_ns=mtime_ns, stage=stage,
+                      elapsed=elapsed, audio_seconds=audio_seconds, **data)
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.apply(record)
+
+    def get_rates(self):
+        """
+        이전 기록에서 단계별 처리 속도(음성 1초당 걸린 시간)를 구한다.
+        :return: {stage: seconds per audio second}
+        """
+        totals = {}
+        for stage, elapsed, audio_seconds in self.history:
+            total = totals.setdefault(stage, [0.0, 0.0])
+            total[0] += elapsed
+            total[1] += audio_seconds
+        return {stage: elapsed / audio_seconds for stage, (elapsed, audio_seconds) in totals.items() if audio_seconds}
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,104 @@
+import queue
+import threading
+import traceback
+
+
+class Stage:
+    """
+    파이프라인의 한 단계입니다.
+    func(item)은 item(dict)을 받아 필요한 값을 채워 넣습니다. 예외가 나면 item['error']에 기록되고,
+    이후 단계 중 skip_failed=True인 단계는 그 item을 처리하지 않고 넘깁니다.
+    ordered=True인 단계는 워커 1개로 입력 순서대로 item을 처리합니다. (CSV 기록 등)
+    """
+    def __init__(self, name, func, workers=1, skip_failed=True, ordered=False):
+        if ordered and workers != 1:
+            raise ValueError('ordered stage must have exactly one worker')
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.skip_failed = skip_failed
+        self.ordered = ordered
+
+
+class StagedPipeline:
+    """
+    단계마다 스레드 워커와 크기가 제한된 큐를 두는 파이프라인 실행기입니다.
+    앞 단계는 다음 큐가 가득 차면 기다리므로(backpressure) 메모리에 쌓이는 item 수가 제한되고,
+    전체 시간은 단계 시간의 합이 아니라 가장 느린 단계에 가까워집니다.
+    """
+    _DONE = object()
+
+    def __init__(self, stages, queue_size=2):
+        self.stages = stages
+        self.queue_size = queue_size
+
+    def run(self, items):
+        """
+        items를 순서대로 파이프라인에 넣고 모든 단계가 끝날 때까지 기다린다.
+        끝난 item은 보관하지 않으므로 결과는 마지막 단계에서 기록해야 한다.
+        :param items: 처리할 dict들의 iterable
+        :return: 실패한 item의 (index, 단계 이름, 예외) 리스트
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers] # 마지막으로 끝나는 워커가 다음 단계에 종료를 알린다.
+            lock = threading.Lock()
+            for _ in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(stage, queues[index], queues[index + 1], remaining, lock),
+                                          name=f'{stage.name}-worker', daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        feeder = threading.Thread(target=self._feed, args=(items, queues[0]), daemon=True)
+        feeder.start()
+
+        failures = []
+        while True:
+            item = queues[-1].get()
+            if item is self._DONE:
+                break
+            if item['error'] is not None:
+                stage_name, error = item['error']
+                failures.append((item['index'], stage_name, error))
+        feeder.join()
+        for thread in threads:
+            thread.join()
+        return failures
+
+    def _feed(self, items, out_queue):
+        for index, item in enumerate(items):
+            item.setdefault('index', index)
+            item.setdefault('error', None)
+            out_queue.put(item)
+        out_queue.put(self._DONE)
+
+    def _work(self, stage, in_queue, out_queue, remaining, lock):
+        pending = {} # ordered 단계에서 순서를 기다리는 item
+        next_index = 0
+        while True:
+            item = in_queue.get()
+            if item is self._DONE:
+                in_queue.put(self._DONE) # 같은 단계의 다른 워커도 끝나도록 되돌려 놓는다.
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        out_queue.put(self._DONE)
+                return
+            if not stage.ordered:
+                out_queue.put(self._process(stage, item))
+                continue
+            pending[item['index']] = item
+            while next_index in pending:
+                out_queue.put(self._process(stage, pending.pop(next_index)))
+                next_index += 1
+
+    @staticmethod
+    def _process(stage, item):
+        if not (stage.skip_failed and item['error'] is not None):
+            try:
+                stage.func(item)
+            except Exception as e:
+                item['error'] = (stage.name, e)
+                item['traceback'] = traceback.format_exc()
+        return item
@@ -0,0 +1,249 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import tracing
+
+# viridis 컬러맵의 기준색, fast 모드에서 matplotlib 없이 선형 보간해서 쓴다.
+_VIRIDIS = np.array([
+    [68, 1, 84], [72, 40, 120], [62, 74, 137], [49, 104, 142], [38, 130, 142],
+    [31, 158, 137], [53, 183, 121], [109, 205, 89], [180, 222, 44], [253, 231, 37]
+], dtype=float)
+
+_worker_figures = {} # 워커 프로세스마다 (width, height, dpi) 별 Figure를 한 번만 만들어 재사용한다.
+
+
+def decimate_spectrogram(values, max_columns, max_rows):
+    """
+    스펙트로그램 파워 값을 출력 픽셀 해상도 이하로 줄인다. 이웃한 칸의 파워를 평균한다.
+    :param values: (주파수 bin, 프레임) 파워 배열
+    :param max_columns: 최대 프레임 수 (가로 픽셀)
+    :param max_rows: 최대 주파수 bin 수 (세로 픽셀)
+    :return: 줄인 파워 배열
+    """
+    values = np.asarray(values, dtype=float)
+    row_step = -(-values.shape[0] // max_rows)
+    column_step = -(-values.shape[1] // max_columns)
+    if row_step == 1 and column_step == 1:
+        return values
+    # 나누어 떨어지지 않는 끝부분은 마지막 값으로 채워서 같은 크기의 블록으로 평균한다.
+    rows = -(-values.shape[0] // row_step) * row_step
+    columns = -(-values.shape[1] // column_step) * column_step
+    padded = np.pad(values, ((0, rows - values.shape[0]), (0, columns - values.shape[1])), mode='edge')
+    return padded.reshape(rows // row_step, row_step, columns // column_step, column_step).mean(axis=(1, 3))
+
+
+def to_decibel(values):
+    """
+    파워를 dB로 바꾼다. 파워가 0인 칸은 NaN이 되어 (pcolormesh의 -inf 칸처럼) 그려지지 않는다.
+    """
+    with np.errstate(divide='ignore'):
+        sg_db = 10 * np.log10(values)
+    sg_db[np.isinf(sg_db)] = np.nan
+    return sg_db
+
+
+def get_decibel_limits(values):
+    """
+    줄이기 전 스펙트로그램의 dB 최솟값, 최댓값. 평균으로 줄이면 낮은 값이 올라가므로 색 범위는 원본에서 정한다.
+    """
+    positive = values[values > 0]
+    if not len(positive):
+        return 0.0, 0.0
+    return 10 * np.log10(float(positive.min())), 10 * np.log10(float(positive.max()))
+
+
+def colorize(sg_db, limits):
+    """
+    dB 배열을 viridis RGB uint8 이미지로 바꾼다. NaN 칸은 흰색이고, 낮은 주파수가 아래에 오도록 위아래를 뒤집는다.
+    """
+    low, high = limits
+    with np.errstate(invalid='ignore'):
+        scaled = np.clip((sg_db - low) / (high - low), 0.0, 1.0) if high > low else np.zeros_like(sg_db)
+    anchors = np.linspace(0.0, 1.0, len(_VIRIDIS))
+    rgb = np.stack([np.interp(scaled, anchors, _VIRIDIS[:, channel]) for channel in range(3)], axis=-1)
+    rgb[np.isnan(sg_db)] = 255
+    return np.ascontiguousarray(rgb[::-1]).astype(np.uint8)
+
+
+def get_figure(width, height, dpi):
+    """
+    pyplot 전역 상태를 쓰지 않는 Agg Figure를 (크기별로 하나) 만들어 재사용한다.
+    """
+    key = (width, height, dpi)
+    if key not in _worker_figures:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        FigureCanvasAgg(figure)
+        figure.add_subplot()
+        _worker_figures[key] = figure
+    return _worker_figures[key]
+
+
+def draw_spectrogram(ax, data):
+    xmin, xmax, ymin, ymax = data['extent']
+    vmin, vmax = data['limits']
+    ax.imshow(to_decibel(data['values']), extent=(xmin, xmax, ymin, ymax), origin='lower', aspect='auto',
+              interpolation='nearest', vmin=vmin, vmax=vmax)
+    ax.set_ylim([ymin, ymax])
+    ax.set_xlabel("Time [s]")
+    ax.set_ylabel("Frequency [Hz]")
+    ax.set_title('Spectrogram')
+
+
+def draw_formants(ax, data):
+    times, f1, f2, f3 = data['formants']
+    ax.scatter(times, f1, color='r', label='F1', s=8)
+    ax.scatter(times, f2, color='g', label='F2', s=8)
+    ax.scatter(times, f3, color='b', label='F3', s=8)
+    ax.legend(loc='upper right')
+    ax.set_xlabel("Time [s]")
+    ax.set_ylabel("Frequency [Hz]")
+    ax.set_title('Formants')
+
+
+def draw_pitch(ax, data):
+    pitch_times, pitch_values = data['pitch']
+    ax.scatter(pitch_times, pitch_values, s=8)
+    ax.set_xlabel("Time [s]")
+    ax.set_ylabel("Pitch [Hz]")
+    ax.set_title("Pitch Curve")
+    ax.set_ylim(0, data['ceiling'])
+
+
+_DRAW = {'spectrogram': draw_spectrogram, 'formants': draw_formants, 'pitch': draw_pitch}
+
+
+def render_plot(kind, data, figure_path, width=1000, height=400, dpi=100, fast_spectrogram=False):
+    """
+    그림 하나를 figure_path(jpg)로 저장한다.
+    :param kind: 'spectrogram', 'formants', 'pitch'
+    :param data: BatchPlotRenderer.get_plot_data가 만든 그림별 데이터
+    :param fast_spectrogram: True이면 스펙트로그램을 matplotlib 없이 축, 제목 없는 이미지로 바로 저장한다.
+    """
+    if kind == 'spectrogram' and fast_spectrogram:
+        from PIL import Image
+        image = Image.fromarray(colorize(to_decibel(data['values']), data['limits']))
+        image.resize((width, height), Image.BILINEAR).save(figure_path)
+        return
+    figure = get_figure(width, height, dpi)
+    ax = figure.axes[0]
+    ax.clear()
+    _DRAW[kind](ax, data)
+    figure.tight_layout()
+    figure.savefig(figure_path)
+
+
+def _render_job(job):
+    """
+    프로세스 풀 워커에서 실행되는 파일 단위 그림 저장 함수
+    :param job: (base_name, [(kind, data, figure_path), ...], width, height, dpi, fast_spectrogram, trace)
+    :return: (base_name, error, trace가 True이면 워커에서 기록한 span 리스트)
+    """
+    base_name, plots, width, height, dpi, fast_spectrogram, trace = job
+    tracer = tracing.start_worker() if trace else None
+    error = None
+    try:
+        for kind, data, figure_path in plots:
+            with tracing.span('plot', audio_seconds=data['duration'], kind=kind, fast=fast_spectrogram):
+                render_plot(kind, data, figure_path, width, height, dpi, fast_spectrogram)
+    except Exception as e:
+        error = str(e)
+    return base_name, error, tracer.pop_records() if tracer is not None else None
+
+
+class BatchPlotRenderer:
+    """
+    여러 파일의 스펙트로그램, 포먼트, 피치 그림을 프로세스 풀에서 저장합니다.
+    부모 프로세스에서는 그릴 데이터만 꺼내고(스펙트로그램은 출력 픽셀 해상도로 줄여서), 워커는 pyplot 전역 상태 없이
+    Agg Figure를 재사용해서 그립니다. 저장되는 파일 이름은 SpeechAnalysis.plot_*와 같습니다.
+    """
+    KINDS = ('spectrogram', 'formants', 'pitch')
+
+    def __init__(self, jpg_dir='out/jpg', workers=None, width=1000, height=400, dpi=100, fast_spectrogram=False,
+                 max_pending=None):
+        """
+        :param jpg_dir: 그림 저장 디렉토리, 파일마다 하위 디렉토리를 만든다.
+        :param workers: 그림 프로세스 수, 0이면 현재 프로세스에서 그린다. None이면 CPU 수
+        :param width: 그림 가로 픽셀
+        :param height: 그림 세로 픽셀
+        :param dpi: 그림 해상도 (글자, 점 크기)
+        :param fast_spectrogram: True이면 스펙트로그램을 matplotlib 없이 이미지로 바로 저장한다. (축, 제목 없음)
+        :param max_pending: 아직 저장되지 않은 파일 수의 상한, 넘으면 가장 오래된 작업을 기다린다. (메모리 제한)
+        """
+        self.jpg_dir = jpg_dir
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.fast_spectrogram = fast_spectrogram
+        self.max_pending = max_pending or 2 * max(self.workers, 1)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 0 else None
+        self.pending = deque()
+        self.errors = []
+
+    def get_plot_data(self, analyzer, kind):
+        """
+        SpeechAnalysis에서 그림 하나에 필요한 데이터만 꺼낸다.
+        """
+        duration = analyzer.sound.duration
+        if kind == 'spectrogram':
+            spectrogram = analyzer.graph.spectrogram()
+            values = decimate_spectrogram(spectrogram.values, self.width, self.height)
+            return {"duration": duration, "values": values, "limits": get_decibel_limits(spectrogram.values),
+                    "extent": (spectrogram.xmin, spectrogram.xmax, spectrogram.ymin, spectrogram.ymax)}
+        if kind == 'formants':
+            return {"duration": duration, "formants": tuple(np.asarray(series) for series in analyzer.formants)}
+        if kind == 'pitch':
+            return {"duration": duration, "pitch": tuple(np.asarray(series) for series in analyzer.pitch),
+                    "ceiling": analyzer.graph.pitch().ceiling}
+        raise ValueError(f'Unknown plot: {kind}')
+
+    def submit(self, analyzer, kinds=KINDS):
+        """
+        파일 하나의 그림들을 저장하도록 보낸다.
+        :param analyzer: SpeechAnalysis
+        :param kinds: 그릴 그림 ('spectrogram', 'formants', 'pitch' 중 일부)
+        """
+        sub_dir = os.path.join(self.jpg_dir, analyzer.base_name)
+        os.makedirs(sub_dir, exist_ok=True)
+        plots = [(kind, self.get_plot_data(analyzer, kind), os.path.join(sub_dir, f"{analyzer.base_name}_{kind}.jpg"))
+                 for kind in kinds]
+        job = (analyzer.base_name, plots, self.width, self.height, self.dpi, self.fast_spectrogram,
+               tracing.get_tracer() is not None)
+        if self.executor is None:
+            self.collect(_render_job(job))
+            return
+        while len(self.pending) >= self.max_pending:
+            self.collect(self.pending.popleft().result())
+        self.pending.append(self.executor.submit(_render_job, job))
+
+    def collect(self, output):
+        base_name, error, records = output
+        tracer = tracing.get_tracer()
+        if records and tracer is not None:
+            tracer.add_records(records)
+        if error is not None:
+            print(f'Error plot for {base_name}: {error}')
+            self.errors.append((base_name, error))
+
+    def close(self):
+        """
+        남은 그림을 모두 저장하고 프로세스 풀을 닫는다.
+        :return: [(base_name, error), ...]
+        """
+        while self.pending:
+            self.collect(self.pending.popleft().result())
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        return self.errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
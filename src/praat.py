@@ -1,21 +1,93 @@
 from typing import List, Tuple
 
+import numpy as np
 import parselmouth
 from parselmouth.praat import call
 
+
+def _interpolate_sinc(y: np.ndarray, x: np.ndarray, max_depth: int) -> np.ndarray:
+    """
+    Praat NUM_interpolate_sinc를 배열 연산으로 옮긴 것이다. (x는 0부터 시작하는 실수 인덱스)
+    max_depth 1은 선형, 2는 "Cubic", 70은 "Sinc70" 보간과 같다.
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    n = len(y)
+    x_clipped = np.clip(x, 0, n - 1)
+    midleft = np.minimum(np.floor(x_clipped).astype(int), n - 1)
+    phase = x_clipped - midleft
+    # 양 끝에서는 Praat처럼 보간 깊이를 줄인다.
+    depth = np.minimum(np.minimum(max_depth, midleft + 1), n - 1 - midleft)
+
+    result = np.empty(len(x))
+    is_sample = (phase == 0) | (depth <= 0)
+    result[is_sample] = y[np.clip(np.rint(x_clipped[is_sample]).astype(int), 0, n - 1)]
+
+    linear = ~is_sample & (depth == 1)
+    l, f = midleft[linear], phase[linear]
+    result[linear] = y[l] + f * (y[l + 1] - y[l])
+
+    cubic = ~is_sample & (depth == 2)
+    l, fil = midleft[cubic], phase[cubic]
+    fir = 1.0 - fil
+    yl, yr = y[l], y[l + 1]
+    dyl = 0.5 * (yr - y[l - 1])
+    dyr = 0.5 * (y[l + 2] - yl)
+    result[cubic] = yl * fir + yr * fil - fil * fir * (0.5 * (dyr - dyl) + (fil - 0.5) * (dyl + dyr - 2 * (yr - yl)))
+
+    sinc = ~is_sample & (depth > 2)
+    if np.any(sinc):
+        l, f, d = midleft[sinc], phase[sinc], depth[sinc]
+        offsets = np.arange(1 - max_depth, max_depth + 1)
+        diff = f[:, None] - offsets[None, :]
+        # sin(pi * (f - o)) = sin(pi * f) * (-1)^o 이므로 삼각함수는 점마다 한 번만 계산한다.
+        sin_term = np.sin(np.pi * f)[:, None] * np.where(offsets % 2, -1.0, 1.0)[None, :]
+        window = np.where(offsets[None, :] <= 0, f[:, None] + d[:, None], d[:, None] + 1 - f[:, None])
+        weights = sin_term / (np.pi * diff) * 0.5 * (1 + np.cos(np.pi * diff / window))
+        if np.any(d < max_depth):
+            inside = (offsets[None, :] >= 1 - d[:, None]) & (offsets[None, :] <= d[:, None])
+            weights[~inside] = 0.0
+        ix = np.clip(l[:, None] + offsets[None, :], 0, n - 1)
+        result[sinc] = np.sum(weights * y[ix], axis=1)
+    return result
+
+
+def _improve_maxima(y: np.ndarray, peaks: np.ndarray, depth=70, iterations=30, block_size=4096) -> np.ndarray:
+    """
+    Praat NUMimproveMaximum(Sinc70)처럼 각 극대 표본 k 주변 [k-1, k+1]에서
+    sinc 보간 곡선의 최대 위치를 찾는다. (황금분할 탐색을 피크 블록 단위로 동시에 적용)
+    """
+    golden = (np.sqrt(5) - 1) / 2
+    improved = np.empty(len(peaks))
+    for start in range(0, len(peaks), block_size):
+        k = peaks[start:start + block_size]
+        a, b = k - 1.0, k + 1.0
+        c, d = b - golden * (b - a), a + golden * (b - a)
+        fc, fd = _interpolate_sinc(y, c, depth), _interpolate_sinc(y, d, depth)
+        for _ in range(iterations):
+            left = fc > fd
+            a, b = np.where(left, a, c), np.where(left, d, b)
+            c, d = np.where(left, b - golden * (b - a), d), np.where(left, c, a + golden * (b - a))
+            f_moved = _interpolate_sinc(y, np.where(left, c, d), depth)
+            fc, fd = np.where(left, f_moved, fd), np.where(left, fc, f_moved)
+        improved[start:start + block_size] = (a + b) / 2
+    return improved
+
+
 class Praat:
     def __init__(self) -> None:
         pass
     
     
-    def get_speaking_time(self) -> float:
+    def get_speaking_time(self, silence_db=-25, min_pause=0.3) -> float:
         """
         휴지를 제외한 발화 시간을 구한다
-        :param sound: parselmouth로 생성한 sound 객체
+        임계값과 TextGrid는 self.graph(AnalysisGraph)에서 공유된 것을 사용한다.
+        :param silence_db: 무음 감지를 위한 강도 기준
+        :param min_pause: 최소 휴지(초)
         :return: speaking_time
         """
-        threshold, threshold2, threshold3 = self.get_threshold(self.intensity, silence_db=-25)
-        textgrid = self.get_textgrid(self.intensity, threshold3=threshold3, min_pause=0.3)
+        textgrid = self.graph.textgrid(silence_db=silence_db, min_pause=min_pause)
         silence_tier = self.get_silence_tier(textgrid)
         silence_table = self.get_silence_table(silence_tier)
         n_pauses = self.get_n_pauses(silence_table)
@@ -29,13 +101,13 @@ class Praat:
             speaking_time += speaking_dur
         return speaking_time
     
-    def get_intensity(self, value=50) -> parselmouth.Intensity:
+    def get_intensity(self, value=None) -> parselmouth.Intensity:
         """
-        sound 객체로부터 intensity list를 계산한다.
-        :param sound: signal, salplerate로부터 얻은 sound 객체
+        sound 객체로부터 intensity list를 계산한다. (self.graph에서 한 번만 계산된다)
+        :param value: 최소 피치(Hz), None이면 분석 프로필의 값 (기본 50)
         :return: intensity
         """
-        return self.sound.to_intensity(value)
+        return self.graph.intensity(value)
     
     @staticmethod
     def get_threshold(intensity: parselmouth.Intensity, silence_db=-25) -> Tuple[float, float, float]:
@@ -49,7 +121,15 @@ class Praat:
         max_intensity = call(intensity, "Get maximum", 0, 0, "Parabolic")
         # 포만트 분위수를 가져온다. 0~1 사이의 값을 가지며 기본 분포의 중앙값 추정치를 얻으려면 0.5를 지정한다. 
         max_99_intensity = call(intensity, "Get quantile", 0, 0, 0.99)
+        return Praat.calculate_threshold(min_intensity, max_intensity, max_99_intensity, silence_db=silence_db)
 
+    @staticmethod
+    def calculate_threshold(min_intensity: float, max_intensity: float, max_99_intensity: float,
+                            silence_db=-25) -> Tuple[float, float, float]:
+        """
+        강도의 최솟값, 최댓값, 99% 분위수로 임계값을 구한다. (스트리밍 분석에서는 누적 통계로 호출한다)
+        :return: threshold, threshold2, threshold3
+        """
         threshold = max_99_intensity + silence_db
         threshold2 = max_intensity - max_99_intensity
         threshold3 = silence_db - threshold2
@@ -96,6 +176,40 @@ class Praat:
         """
         return call(silence_table, "Get number of rows")
 
+    @staticmethod
+    def get_formant_values(formant: parselmouth.Formant, times, num_formants=3) -> np.ndarray:
+        """
+        여러 시간에 대한 포먼트 값을 한 번에 구한다.
+        formant.get_value_at_time과 같은 선형 보간 규칙(가까운 프레임이 없으면 NaN,
+        먼 프레임이 없으면 가까운 프레임 값)을 배열 연산으로 적용한다.
+        :param formant: parselmouth Formant 객체
+        :param times: 값을 구할 시간 배열
+        :param num_formants: 구할 포먼트 개수(F1부터)
+        :return: (num_formants, len(times)) 배열
+        """
+        times = np.asarray(times, dtype=float)
+        # "To Matrix"는 포먼트가 없는 프레임을 0으로 채운다.
+        frames = np.array([call(formant, "To Matrix", n + 1).values[0] for n in range(num_formants)])
+        frames[frames == 0] = np.nan
+        nx = frames.shape[1]
+
+        index = (times - formant.x1) / formant.dx + 1
+        ileft = np.floor(index).astype(int)
+        phase = index - ileft
+        near_is_left = phase < 0.5
+        inear = np.where(near_is_left, ileft, ileft + 1)
+        ifar = np.where(near_is_left, ileft + 1, ileft)
+        phase = np.where(near_is_left, phase, 1.0 - phase)
+
+        in_range = (times >= formant.xmin) & (times <= formant.xmax) & (inear >= 1) & (inear <= nx)
+        far_in_range = (ifar >= 1) & (ifar <= nx)
+        f_near = frames[:, np.clip(inear, 1, nx) - 1]
+        f_far = frames[:, np.clip(ifar, 1, nx) - 1]
+
+        values = np.where(far_in_range & ~np.isnan(f_far), f_near + phase * (f_far - f_near), f_near)
+        values[:, ~in_range] = np.nan
+        return values
+
     @staticmethod
     def get_num_peaks(intensity: parselmouth.Intensity):
         """
@@ -150,13 +264,66 @@ class Praat:
         for p in range(peak_count - 1):
             following = p + 1
             dip = call(intensity, "Get minimum", current_time, time_peaks[p + 1], "None")
-            diff_int = abs(current_int - dip)
-            if diff_int > min_dip:
+            if Praat.is_valid_dip(current_int, dip, min_dip=min_dip):
                 valid_peak_count += 1
                 valid_time.append(time_peaks[p])  
             current_time = time_peaks[following]
             current_int = call(intensity, "Get value at time", time_peaks[following], "Cubic")
 
         return valid_peak_count, current_time, current_int, valid_time
-    
-    
+
+    @staticmethod
+    def is_valid_dip(peak_intensity, dip, min_dip=1.5):
+        """
+        피크 강도와 다음 피크까지의 최소 강도(dip) 차이가 min_dip보다 크면 유효한 음절핵이다. (배열도 받는다)
+        """
+        return np.abs(np.asarray(peak_intensity) - dip) > min_dip
+
+    @staticmethod
+    def get_peaks(intensity: parselmouth.Intensity) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        intensity 배열에서 극대점의 시간과 강도를 구한다.
+        get_num_peaks와 get_time_peaks의 Praat 호출("To PointProcess (extrema)", Sinc70 /
+        "Get value at time", Cubic)과 같은 규칙을 intensity.values에 직접 적용한다.
+        :param intensity: parselmouth sound 객체로부터 얻은 intensity
+        :return: peak_times, peak_values
+        """
+        values = intensity.values[0]
+        i = np.arange(1, len(values) - 1)
+        peaks = i[(values[i] > values[i - 1]) & (values[i] >= values[i + 1])]
+        peak_index = _improve_maxima(values, peaks)
+        peak_times = intensity.x1 + peak_index * intensity.dx
+        peak_values = _interpolate_sinc(values, peak_index, max_depth=2)
+        return peak_times, peak_values
+
+    @staticmethod
+    def get_syllable_nuclei(intensity: parselmouth.Intensity, threshold: float, min_dip=1.5) -> Tuple[int, np.ndarray]:
+        """
+        임계값과 최소 dip 조건을 만족하는 음절핵(유효 피크)을 배열 연산으로 구한다.
+        get_num_peaks -> get_time_peaks -> get_valid_peak_count 경로와 같은 결과를 낸다.
+        :param intensity: 강도
+        :param threshold: 강도 임계값
+        :param min_dip: 현재 intensity와 최소 intensity 차이 최소값
+        :return: valid_peak_count, valid_time
+        """
+        values = intensity.values[0]
+        peak_times, peak_values = Praat.get_peaks(intensity)
+        above = peak_values > threshold
+        time_peaks, intensities = peak_times[above], peak_values[above]
+        if len(time_peaks) < 2:
+            return 0, np.array([])
+
+        # 이웃한 피크 사이 프레임들의 최솟값("Get minimum", interpolation "None")
+        first = np.ceil((time_peaks[:-1] - intensity.x1) / intensity.dx).astype(int)
+        last = np.floor((time_peaks[1:] - intensity.x1) / intensity.dx).astype(int)
+        first = np.clip(first, 0, len(values) - 1)
+        last = np.clip(last, 0, len(values) - 1)
+        has_frames = last >= first
+        dips = np.minimum(values[first], values[last])
+        if np.any(has_frames):
+            bounds = np.stack([first[has_frames], last[has_frames] + 1], axis=1).ravel()
+            dips[has_frames] = np.minimum.reduceat(np.append(values, np.inf), bounds)[::2]
+
+        valid = Praat.is_valid_dip(intensities[:-1], dips, min_dip=min_dip)
+        valid_time = time_peaks[:-1][valid]
+        return len(valid_time), valid_time
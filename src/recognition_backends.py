@@ -0,0 +1,173 @@
+import tracing
+from audio_io import load_waveform, Waveform
+from speech_regions import (get_sounding_regions, get_diarization_regions, merge_regions, pack_regions,
+                            make_window_samples, map_result)
+
+
+class DiarizationBackend:
+    """
+    화자 분리 모델 인터페이스입니다.
+    diarize는 {화자 ID: [[시작, 종료], ...]} 형식의 사전을 돌려줍니다.
+    waveform(audio_io.Waveform)이 주어지면 파일을 다시 디코딩하지 않고 그 버퍼를 사용합니다.
+    """
+    def diarize(self, audio_path, waveform=None):
+        raise NotImplementedError
+
+
+class TranscriptionBackend:
+    """
+    음성 인식 모델 인터페이스입니다.
+    transcribe는 whisper_timestamped와 같은 형식({'segments': [{'text', 'words': [...]}]})을 돌려줍니다.
+    waveform(audio_io.Waveform)이 주어지면 파일을 다시 디코딩하지 않고 그 버퍼를 사용합니다.
+    speakers_dict(화자 분리 결과)는 발화 구간만 인식하는 SilenceGatedTranscription에서 사용합니다.
+    """
+    def transcribe(self, audio_path, waveform=None, speakers_dict=None):
+        raise NotImplementedError
+
+
+class PyannoteDiarization(DiarizationBackend):
+    """
+    pyannote speaker-diarization-3.1 파이프라인
+    """
+    def __init__(self, access_token, device='cuda'):
+        import torch
+        from pyannote.audio import Pipeline
+
+        self.torch = torch
+        self.pipeline = Pipeline.from_pretrained(
+            "pyannote/speaker-diarization-3.1",
+            use_auth_token=access_token)
+        self.pipeline.to(torch.device(device))
+
+    def diarize(self, audio_path, waveform=None):
+        if waveform is None:
+            waveform = load_waveform(audio_path)
+        # pyannote는 {'waveform': (channel, time) tensor, 'sample_rate'} 입력을 그대로 받는다.
+        audio = {"waveform": self.torch.from_numpy(waveform.samples).unsqueeze(0), "sample_rate": waveform.sample_rate}
+        return self.to_speakers_dict(self.pipeline(audio))
+
+    @staticmethod
+    def to_speakers_dict(diarization):
+        """
+        화자 분리된 객체에서 필요한 정보를 dict 형식으로 저장
+        :param diarization: pyannote.audio의 화자 분리 객체
+        :return speakers_dict: 화자 분리 정보가 들어있는 사전
+        """
+        speakers_dict = {}
+        for turn, _, speaker in diarization.itertracks(yield_label=True):
+            if speaker not in speakers_dict:
+                speakers_dict[speaker] = []
+            speakers_dict[speaker].append([turn.start, turn.end])
+        return speakers_dict
+
+
+class WhisperTranscription(TranscriptionBackend):
+    """
+    whisper_timestamped 음성 인식
+    """
+    def __init__(self, model_name='base', language='ko'):
+        import whisper_timestamped as whisper
+
+        self.whisper = whisper
+        self.model = whisper.load_model(model_name)
+        self.language = language
+
+    def transcribe(self, audio_path, waveform=None, speakers_dict=None):
+        if waveform is None:
+            waveform = load_waveform(audio_path, self.whisper.audio.SAMPLE_RATE)
+        elif waveform.sample_rate != self.whisper.audio.SAMPLE_RATE:
+            raise ValueError(f'Whisper needs {self.whisper.audio.SAMPLE_RATE}Hz audio, got {waveform.sample_rate}Hz')
+        # numpy 배열을 넘기면 whisper가 ffmpeg로 파일을 다시 디코딩하지 않는다.
+        return self.whisper.transcribe(self.model, waveform.samples, language=self.language)
+
+
+class SilenceGatedTranscription(TranscriptionBackend):
+    """
+    무음을 건너뛰고 발화 구간만 인식하는 래퍼입니다.
+    발화 구간은 Praat TextGrid(silences)의 "sounding" 구간 또는 화자 분리 구간에서 구하고, 짧은 구간은
+    max_window초 이하의 묶음으로 이어 붙여 한 번에 인식한 뒤 문장, 어절 시간을 원본 시간으로 되돌립니다.
+    인식 시간은 대략 발화 구간의 길이에 비례합니다.
+    """
+    REGION_SOURCES = ('textgrid', 'diarization')
+
+    def __init__(self, backend, region_source='textgrid', silence_db=-25, min_pause=0.3, padding=0.2, min_gap=0.5,
+                 max_window=30.0, separator=0.3):
+        """
+        :param backend: 구간 묶음을 인식할 TranscriptionBackend (예: WhisperTranscription)
+        :param region_source: 'textgrid'는 강도 기반 무음 검출, 'diarization'은 화자 분리 구간
+                              (speakers_dict가 없으면 textgrid를 쓴다)
+        :param silence_db: 무음 감지를 위한 강도 기준
+        :param min_pause: 최소 휴지(초)
+        :param padding: 구간 양쪽에 붙일 여유(초), 어절 앞뒤가 잘리지 않게 한다.
+        :param min_gap: 이보다 짧은 간격의 구간은 합친다.
+        :param max_window: 한 번에 인식할 묶음의 최대 길이(초), Whisper 입력 길이(30초)
+        :param separator: 묶음 안에서 구간 사이에 넣는 무음(초)
+        """
+        if region_source not in self.REGION_SOURCES:
+            raise ValueError(f'Unknown region source: {region_source}')
+        self.backend = backend
+        self.region_source = region_source
+        self.silence_db = silence_db
+        self.min_pause = min_pause
+        self.padding = padding
+        self.min_gap = min_gap
+        self.max_window = max_window
+        self.separator = separator
+
+    def get_regions(self, waveform, speakers_dict=None):
+        """
+        :return: 패딩을 붙이고 합친 발화 구간 [(start, end), ...]
+        """
+        if self.region_source == 'diarization' and speakers_dict is not None:
+            regions = get_diarization_regions(speakers_dict)
+        else:
+            regions = get_sounding_regions(waveform.to_sound(), silence_db=self.silence_db, min_pause=self.min_pause)
+        return merge_regions(regions, waveform.duration, padding=self.padding, min_gap=self.min_gap)
+
+    def transcribe(self, audio_path, waveform=None, speakers_dict=None):
+        if waveform is None:
+            waveform = load_waveform(audio_path)
+        result = {"text": '', "segments": []}
+        for pieces in pack_regions(self.get_regions(waveform, speakers_dict), self.max_window, self.separator):
+            samples = make_window_samples(waveform.samples, waveform.sample_rate, pieces, self.separator)
+            with tracing.span('transcription.window', audio_seconds=len(samples) / waveform.sample_rate,
+                              pieces=len(pieces)):
+                window_result = self.backend.transcribe(audio_path, waveform=Waveform(samples, waveform.sample_rate))
+            map_result(window_result, pieces)
+            result['segments'].extend(window_result.get('segments', []))
+            for key, value in window_result.items(): # language 등 나머지 값은 첫 묶음을 따른다.
+                result.setdefault(key, value)
+        result['text'] = ' '.join(segment['text'].strip() for segment in result['segments'])
+        return result
+
+
+class StubDiarization(DiarizationBackend):
+    """
+    테스트용 화자 분리 모델. 오디오 길이를 turn_length초 단위로 잘라 화자를 번갈아 붙인다.
+    """
+    def __init__(self, turn_length=2.0, num_speakers=2):
+        self.turn_length = turn_length
+        self.num_speakers = num_speakers
+
+    def diarize(self, audio_path, waveform=None):
+        duration = (waveform or load_waveform(audio_path)).duration
+        speakers_dict = {}
+        start, turn = 0.0, 0
+        while start < duration:
+            end = min(start + self.turn_length, duration)
+            speakers_dict.setdefault(f'SPEAKER_{turn % self.num_speakers:02d}', []).append([start, end])
+            start, turn = end, turn + 1
+        return speakers_dict
+
+
+class StubTranscription(TranscriptionBackend):
+    """
+    테스트용 음성 인식 모델. 1초마다 한 어절짜리 문장을 만든다.
+    """
+    def transcribe(self, audio_path, waveform=None, speakers_dict=None):
+        duration = (waveform or load_waveform(audio_path)).duration
+        segments = []
+        for second in range(int(duration)):
+            word = {"text": f"word{second}", "start": float(second), "end": float(second) + 0.5, "confidence": 1.0}
+            segments.append({"text": word['text'], "start": word['start'], "end": word['end'], "words": [word]})
+        return {"text": ' '.join(segment['text'] for segment in segments), "segments": segments}
@@ -0,0 +1,80 @@
+import os
+import json
+
+
+class JsonlResultWriter:
+    """
+    분석 결과를 파일 단위로 한 줄씩(JSONL) 바로 기록합니다.
+    체크포인트 파일에 완료된 file_name과 그 시점의 JSONL 크기를 함께 남겨서,
+    중단된 뒤 다시 실행하면 완료된 파일은 건너뛰고 기록되다 만 줄은 잘라냅니다.
+    JSONL이 없거나 체크포인트보다 짧으면 실제 JSONL에 남아 있는 기록까지만 완료된 것으로 보고 나머지는 다시 분석한다.
+    """
+    def __init__(self, out_path, checkpoint_path=None):
+        self.out_path = out_path
+        self.checkpoint_path = checkpoint_path or f'{os.path.splitext(out_path)[0]}.checkpoint'
+        out_dir = os.path.dirname(out_path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+
+        self.completed = set()
+        valid_size = self.load_checkpoint()
+
+        # 체크포인트 이후에 쓰인 (완료 기록이 없는) 내용은 버리고 이어서 쓴다.
+        self.out_file = open(self.out_path, 'a+b')
+        if os.path.getsize(self.out_path) > valid_size:
+            self.out_file.truncate(valid_size)
+        self.out_file.seek(valid_size)
+        self.checkpoint_file = open(self.checkpoint_path, 'a', encoding='utf-8')
+
+    def load_checkpoint(self):
+        """
+        체크포인트를 읽어 완료된 file_name을 모은다. 기록되다 만 마지막 줄과 실제 JSONL 끝을 넘어서는 기록은
+        체크포인트에서 잘라낸다.
+        :return: 마지막으로 완료된 기록까지의 JSONL 바이트 크기
+        """
+        valid_size = 0
+        if not os.path.exists(self.checkpoint_path):
+            return valid_size
+        out_size = os.path.getsize(self.out_path) if os.path.exists(self.out_path) else 0
+        checkpoint_size = 0
+        with open(self.checkpoint_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'): # 기록되다 만 마지막 줄
+                    break
+                file_name, size = line.decode('utf-8').rstrip('\n').rsplit('\t', 1)
+                if int(size) > out_size: # JSONL에 남아 있지 않은 기록
+                    break
+                self.completed.add(file_name)
+                valid_size = int(size)
+                checkpoint_size += len(line)
+        if os.path.getsize(self.checkpoint_path) != checkpoint_size:
+            os.truncate(self.checkpoint_path, checkpoint_size)
+        return valid_size
+
+    def is_completed(self, file_name):
+        return file_name in self.completed
+
+    def write(self, record, file_name):
+        """
+        결과 한 건을 압축된 JSON 한 줄로 기록하고 체크포인트를 남긴다.
+        :param record: 분석 결과 사전
+        :param file_name: 체크포인트에 남길 파일 이름
+        """
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        self.out_file.write(line.encode('utf-8'))
+        self.out_file.flush()
+        os.fsync(self.out_file.fileno())
+
+        self.checkpoint_file.write(f'{file_name}\t{self.out_file.tell()}\n')
+        self.checkpoint_file.flush()
+        self.completed.add(file_name)
+
+    def close(self):
+        self.out_file.close()
+        self.checkpoint_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
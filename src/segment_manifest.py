@@ -0,0 +1,79 @@
+import os
+import csv
+from collections import namedtuple
+
+# segment_id는 예전 split-wav 파일 이름(확장자 제외)과 같고, start/end는 그 이름에 쓰인 0.1초 반올림 값이다.
+Segment = namedtuple('Segment', ['segment_id', 'source_path', 'speaker', 'start', 'end'])
+
+
+class SegmentManifest:
+    """
+    화자 분리 구간을 wav 파일로 잘라 저장하는 대신 (원본 경로, 화자, 시작, 종료) 목록으로 기록합니다.
+    SpeechAnalysis는 Segment를 받아 원본에서 해당 구간만 꺼내 분석합니다.
+    """
+    HEADERS = ['segment_id', 'source_path', 'speaker', 'start', 'end']
+    MIN_SEGMENT_LENGTH = 0.13
+
+    def __init__(self, manifest_path='out/csv/segments.csv', append=False):
+        """
+        :param append: True이면 기존 목록 뒤에 이어 쓴다. (헤더는 빈 파일에만 쓴다)
+        """
+        self.manifest_path = manifest_path
+        self.append = append
+        self.file = None
+        self.writer = None
+
+    @classmethod
+    def make_segments(cls, audio_path, speakers_dict):
+        """
+        화자 분리 결과에서 MIN_SEGMENT_LENGTH(0.13초) 이상인 구간을 Segment로 만든다.
+        :param audio_path: 원본 오디오 파일 경로
+        :param speakers_dict: 화자별 타임스탬프가 저장된 사전
+        :return: Segment 리스트
+        """
+        basename = os.path.basename(audio_path).split('.')[0]
+        segments = []
+        for speaker in speakers_dict:
+            for i, (start, end) in enumerate(speakers_dict[speaker]):
+                if end - start < cls.MIN_SEGMENT_LENGTH:
+                    continue  # 세그먼트 길이가 0.13초보다 짧으면 건너뜁니다.
+
+                # 시간 정보를 초 단위로 반올림합니다.
+                start_s = round(start, 1)
+                end_s = round(end, 1)
+                segment_id = f"{basename}_{speaker}_segment_{str(i).zfill(3)}_{start_s}_{end_s}"
+                segments.append(Segment(segment_id, audio_path, speaker, start_s, end_s))
+        return segments
+
+    def open(self):
+        out_dir = os.path.dirname(self.manifest_path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir, exist_ok=True)
+        self.file = open(self.manifest_path, 'a' if self.append else 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:
+            self.writer.writerow(self.HEADERS)
+        return self
+
+    def write(self, segments):
+        for segment in segments:
+            self.writer.writerow(segment)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read(self):
+        """
+        :return: 기록된 Segment 리스트 (같은 원본의 구간이 이어지도록 기록 순서를 유지한다)
+        """
+        with open(self.manifest_path, 'r', newline='', encoding='utf-8') as f:
+            return [Segment(row['segment_id'], row['source_path'], row['speaker'], float(row['start']), float(row['end']))
+                    for row in csv.DictReader(f)]
@@ -2,34 +2,163 @@
 import glob
 import os
 import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
 import parselmouth
 import numpy as np
-import matplotlib.pyplot as plt
 from tqdm import tqdm
 
+import tracing
 from praat import Praat
+from analysis_graph import AnalysisGraph
+from analysis_profiles import PROFILES, DEFAULT_PROFILE, get_profile
+from feature_cache import FeatureCache
+from feature_store import FeatureStore
+from feature_stats import RunningStats
+from audio_io import load_sound, extract_segment
+from segment_manifest import Segment, SegmentManifest
+from plot_renderer import BatchPlotRenderer
+from chunked_analysis import plan_chunks, get_chunk_range, select_core, stitch_series
 from parselmouth.praat import call
 
 
 class SpeechAnalysis(Praat):
-    def __init__(self, wav_path):
-        self.wav_path = wav_path
-        self.sound = parselmouth.Sound(wav_path)
-        self.base_name = os.path.splitext(os.path.basename(self.wav_path))[0]
-        self.intensity = self.get_intensity()
-        # 'out/jpg' 디렉터리가 없으면 생성합니다.
+    FEATURES = ('pitch', 'formants', 'speech_rate')
+
+    def __init__(self, wav_path, cache=None, pitch_time_range=0.1, silence_db=-25, min_pause=0.3, min_dip=2,
+                 features=FEATURES, chunk_length=None, chunk_overlap=1.0, chunk_boundaries=None, chunk_workers=None,
+                 profile=DEFAULT_PROFILE, meta_data=None):
+        """
+        :param wav_path: 분석할 wav 경로, 또는 원본의 한 구간 (Segment 또는 (경로, 시작, 종료) 튜플)
+        :param cache: FeatureCache, 주어지면 같은 오디오와 파라미터의 결과를 다시 계산하지 않는다.
+        :param pitch_time_range: 피치 시간 주변 포먼트 평균 구간(초)
+        :param silence_db: 무음 감지를 위한 강도 기준
+        :param min_pause: 최소 휴지(초)
+        :param min_dip: 유효 피크를 위한 최소 강도 차이
+        :param features: 미리 계산하고 결과로 내보낼 피쳐 ('pitch', 'formants', 'speech_rate' 중 일부)
+                         나머지 피쳐도 처음 접근할 때 계산된다.
+        :param chunk_length: 주어지면 이보다 1.5배 이상 긴 음성의 피치와 포먼트를 약 chunk_length초 청크로 나눠
+                             프로세스 풀에서 병렬로 계산하고 이어 붙인다. (발화속도는 전체 음성의 강도 분위수를
+                             쓰므로 청크를 분석하는 동안 전체 음성에서 계산한다)
+        :param chunk_overlap: 청크 양쪽에 붙여 분석하고 버리는 여유 구간(초)
+        :param chunk_boundaries: 청크를 자를 후보 시간 (예: chunked_analysis.get_label_boundaries의 발화 사이 쉼)
+        :param chunk_workers: 청크 분석 프로세스 수, None이면 CPU 수
+        :param profile: 분석 프로필 이름('fast', 'standard', 'precise') 또는 AnalysisProfile
+        :param meta_data: 화자 메타데이터(gender, age), 주어지면 adaptive 프로필을 화자에 맞춘다.
+        """
+        for feature in features:
+            if feature not in self.FEATURES:
+                raise ValueError(f'Unknown feature: {feature}')
+        self.segment = None
+        if isinstance(wav_path, Segment):
+            self.segment = wav_path
+        elif isinstance(wav_path, (tuple, list)):
+            source_path, start, end = wav_path
+            basename = os.path.splitext(os.path.basename(source_path))[0]
+            self.segment = Segment(f'{basename}_{start}_{end}', source_path, '', start, end)
+        with tracing.span('decode') as span:
+            if self.segment is not None:
+                # 구간은 wav 파일로 잘라 저장하지 않고, 한 번 디코딩한 원본 Sound에서 꺼내 분석합니다.
+                self.wav_path = self.segment.source_path
+                self.sound = extract_segment(load_sound(self.wav_path), self.segment.start, self.segment.end)
+                self.base_name = self.segment.segment_id
+            else:
+                self.wav_path = wav_path
+                self.sound = parselmouth.Sound(wav_path)
+                self.base_name = os.path.splitext(os.path.basename(self.wav_path))[0]
+            span.set(audio_seconds=self.sound.duration)
+        # Pitch, Intensity, Formant 등 Praat 객체는 graph에서 한 번만 만들어 공유합니다.
+        self.profile = get_profile(profile, meta_data)
+        self.graph = AnalysisGraph(self.sound, self.profile)
+        self.pitch_time_range = pitch_time_range
+        self.silence_db = silence_db
+        self.min_pause = min_pause
+        self.min_dip = min_dip
+        self.features = tuple(features)
+        self.chunk_overlap = chunk_overlap
+        self.chunk_workers = chunk_workers
+        self.chunks = None
+        if chunk_length and self.sound.duration > 1.5 * chunk_length:
+            self.chunks = plan_chunks(self.sound.duration, chunk_length, chunk_boundaries)
+        # 그림을 저장할 때 'out/jpg' 디렉터리를 만듭니다.
         self.jpg_dir = 'out/jpg'
-        if not os.path.exists(self.jpg_dir):
-            os.makedirs(self.jpg_dir)
 
-        # 초기화 시에 피치, 포먼트, 말하기 속도를 계산합니다.
-        self.pitch = self.calculate_pitch()
-        self.formants = self.calculate_formants()
-        self.speech_rate = self.calculate_speech_rate()
+        # 계산된 피쳐는 _values에 저장해두고 다시 계산하지 않습니다.
+        self._values = {}
+        self._defer_cache = False
+        self.cache = cache
+        self.cache_key = None
+        if cache is not None:
+            params = dict(pitch_time_range=pitch_time_range, silence_db=silence_db, min_pause=min_pause, min_dip=min_dip)
+            if self.segment is not None:
+                params['segment'] = [self.segment.start, self.segment.end]
+            if self.profile != PROFILES[DEFAULT_PROFILE]: # 기본 프로필은 이전 캐시 키를 그대로 쓴다.
+                params['profile'] = list(self.profile)
+            if self.chunks is not None: # 청크로 나눈 결과는 경계 근처에서 전체 분석과 조금 다르다.
+                params['chunks'] = [chunk_overlap, [[round(start, 6), round(end, 6)] for start, end in self.chunks]]
+            self.cache_key = cache.make_key(self.wav_path, **params)
+            self._values.update(cache.get(self.cache_key, self.features) or {})
+        self.cache_hit = all(feature in self._values for feature in self.features)
+
+        # 요청된 피쳐만 계산하고, 캐시에는 한 번에 저장합니다.
+        self._defer_cache = True
+        for feature in self.features:
+            self.get_feature(feature)
+        self._defer_cache = False
+        if not self.cache_hit:
+            self.save_to_cache()
+
+    def get_feature(self, feature):
+        """
+        피쳐를 처음 요청할 때 계산하고, 캐시가 있으면 함께 저장한다.
+        :param feature: 'pitch', 'formants', 'speech_rate'
+        """
+        if feature not in self._values:
+            with tracing.span(feature, audio_seconds=self.sound.duration, chunks=len(self.chunks or ())):
+                if feature in ('pitch', 'formants') and self.chunks is not None:
+                    self._values.update(self.calculate_chunked(with_formants='formants' in self.features or feature == 'formants'))
+                elif feature == 'pitch':
+                    self._values[feature] = self.calculate_pitch()
+                elif feature == 'formants':
+                    self._values[feature] = self.calculate_formants(pitch_time_range=self.pitch_time_range)
+                elif feature == 'speech_rate':
+                    self._values[feature] = self.calculate_speech_rate()
+                else:
+                    raise ValueError(f'Unknown feature: {feature}')
+            if not self._defer_cache:
+                self.save_to_cache()
+        return self._values[feature]
+
+    def save_to_cache(self):
+        if self.cache is not None:
+            self.cache.put(self.cache_key, {name: self._values[name] for name in self.FEATURES if name in self._values})
+
+    @property
+    def intensity(self):
+        return self.get_intensity()
+
+    @property
+    def pitch(self):
+        return self.get_feature('pitch')
+
+    @property
+    def formants(self):
+        return self.get_feature('formants')
+
+    @property
+    def speech_rate(self):
+        return self.get_feature('speech_rate')
 
     def calculate_pitch(self):
         # 피치를 계산하고 저장합니다.
-        pitch = self.sound.to_pitch()
+        return self.get_voiced_pitch(self.graph.pitch())
+
+    @staticmethod
+    def get_voiced_pitch(pitch):
+        """
+        :return: 피치 값이 0이 아닌 프레임의 (times, values) 리스트
+        """
         pitch_values = pitch.selected_array['frequency']
         pitch_times = pitch.xs()
 
@@ -40,84 +169,170 @@ class SpeechAnalysis(Praat):
         return pitch_times, pitch_values
 
     def calculate_formants(self, pitch_time_range=0.1):
-        self.calculate_pitch()
         pitch_times, _ = self.pitch
+        return self.get_formants_at_pitch(self.graph.formant(), pitch_times, pitch_time_range)
 
-        formant = self.sound.to_formant_burg()
+    @classmethod
+    def get_formants_at_pitch(cls, formant, pitch_times, pitch_time_range=0.1):
+        """
+        피치 시간마다 주변(±pitch_time_range) F1~F3 평균을 구하고, 셋 다 값이 있는 시간만 남긴다.
+        :return: valid_times, valid_f1, valid_f2, valid_f3
+        """
+        pitch_times = np.asarray(pitch_times, dtype=float)
         times = formant.t_grid()
-        f1_values = [formant.get_value_at_time(1, time) for time in times]
-        f2_values = [formant.get_value_at_time(2, time) for time in times]
-        f3_values = [formant.get_value_at_time(3, time) for time in times]
+        # F1~F3 값을 전체 시간 격자에 대해 한 번에 가져옵니다.
+        formant_values = cls.get_formant_values(formant, times, num_formants=3)
 
-        valid_data = []
+        # 피치 시간 주변(±pitch_time_range)의 포먼트 평균을 NaN을 제외하고 계산합니다.
+        means, counts = cls.calculate_window_means(times, formant_values, pitch_times, pitch_time_range)
+        valid = np.all(counts > 0, axis=0)
 
-        for pitch_time in pitch_times:
-            # 피치 시간 주변의 포먼트 값을 추출합니다.
-            time_window = [time for time in times if pitch_time - pitch_time_range <= time <= pitch_time + pitch_time_range]
-            f1_window = [f1 for time, f1 in zip(times, f1_values) if time in time_window and not np.isnan(f1)]
-            f2_window = [f2 for time, f2 in zip(times, f2_values) if time in time_window and not np.isnan(f2)]
-            f3_window = [f3 for time, f3 in zip(times, f3_values) if time in time_window and not np.isnan(f3)]
+        valid_times = pitch_times[valid]
+        valid_f1, valid_f2, valid_f3 = means[:, valid]
 
-            if f1_window and f2_window and f3_window:
-                # 해당 시간대의 평균 포먼트 값을 계산합니다.
-                avg_f1 = np.mean(f1_window)
-                avg_f2 = np.mean(f2_window)
-                avg_f3 = np.mean(f3_window)
-                valid_data.append((pitch_time, avg_f1, avg_f2, avg_f3))
+        return valid_times, valid_f1, valid_f2, valid_f3
 
-        valid_times, valid_f1, valid_f2, valid_f3 = zip(*valid_data) if valid_data else ([], [], [], [])
+    def calculate_chunked(self, with_formants=True):
+        """
+        청크별 피치(와 포먼트)를 프로세스 풀에서 계산하고, 각 청크의 core 구간 프레임만 이어 붙인다.
+        포먼트 평균 구간(±pitch_time_range)은 chunk_overlap 안에 들어가므로 core의 결과는 전체 분석과 같은 방식으로 구해진다.
+        전체 분석과 같은 타입으로 돌려준다. (피치는 get_voiced_pitch처럼 리스트, 포먼트는 get_formants_at_pitch처럼 배열)
+        청크 경계(발화 사이 쉼) 근처의 유성음 판정이 달라져서 프레임 수가 전체 분석과 조금 다를 수 있다.
+        녹음 하나의 청크 수가 적고 청크가 짧을수록 차이가 커진다. 27~31초 talk_set 녹음을 8~15초 청크로 나누면
+        피치 프레임 수가 최대 약 2% 달라진다. (standard, 8초: 1603 -> 1613 (0.6%), 15초: 1603 -> 1629 (1.6%))
+        :return: {'pitch': (times, values)[, 'formants': (times, f1, f2, f3)]}
+        """
+        values = self.sound.values
+        sampling_frequency = self.sound.sampling_frequency
+        xmin = self.sound.xmin
+        # Praat 피치의 유성음 판정은 음성 전체의 최대 진폭을 기준으로 한다. 청크에도 같은 기준이 적용되도록
+        # 버리는 쪽 끝에 0.1초 무음과 전체 최대 진폭 샘플 하나를 붙인다.
+        peak = values.flat[np.argmax(np.abs(values))]
+        guard = np.zeros((values.shape[0], int(0.1 * sampling_frequency) + 1))
+        guard[:, -1] = peak
+        jobs = []
+        for index, (core_start, core_end) in enumerate(self.chunks):
+            start, end = get_chunk_range(core_start, core_end, self.sound.duration, self.chunk_overlap)
+            first = int(np.floor(start * sampling_frequency))
+            last = min(values.shape[1], int(np.ceil(end * sampling_frequency)))
+            samples, start_time = values[:, first:last], xmin + first / sampling_frequency
+            if index == len(self.chunks) - 1: # 마지막 청크는 앞쪽 여유 구간 앞에 붙인다.
+                samples, start_time = np.hstack([guard[:, ::-1], samples]), start_time - guard.shape[1] / sampling_frequency
+            else:
+                samples = np.hstack([samples, guard])
+            # 청크의 시작 시간을 원본 샘플 위치에 맞춰서 프레임 시간이 원본 기준 시간이 되도록 한다.
+            jobs.append((samples, sampling_frequency, start_time,
+                         xmin + core_start, xmin + core_end, index == len(self.chunks) - 1,
+                         self.pitch_time_range, with_formants, self.profile, tracing.get_tracer() is not None))
 
-        return valid_times, valid_f1, valid_f2, valid_f3
+        with ProcessPoolExecutor(max_workers=self.chunk_workers) as executor:
+            outputs = executor.map(_analyze_chunk_job, jobs)
+            # 워커가 청크를 분석하는 동안 전체 음성이 필요한 발화속도를 계산한다.
+            if 'speech_rate' in self.features:
+                self.get_feature('speech_rate')
+            outputs = list(outputs)
 
-    def calculate_speech_rate(self):
+        tracer = tracing.get_tracer()
+        for _, _, records in outputs: # 워커에서 기록한 청크별 span
+            if tracer is not None and records:
+                tracer.add_records(records)
+        pitch_times, pitch_values = stitch_series([pitch for pitch, _, _ in outputs])
+        results = {"pitch": (list(pitch_times), list(pitch_values))}
+        if with_formants:
+            valid_times, valid_f1, valid_f2, valid_f3 = stitch_series([formants for _, formants, _ in outputs])
+            results["formants"] = (valid_times, valid_f1, valid_f2, valid_f3)
+        return results
+
+    @staticmethod
+    def calculate_window_means(times, values, centers, half_width):
+        """
+        정렬된 times 위에서 각 center ± half_width 구간의 평균을 누적합으로 구한다.
+        :param times: 오름차순으로 정렬된 시간 배열 (n,)
+        :param values: 시간별 값 배열 (k, n), NaN은 평균에서 제외된다
+        :param centers: 구간 중심 시간 배열 (m,)
+        :param half_width: 구간 반폭(초)
+        :return: means (k, m), counts (k, m)
+        """
+        times = np.asarray(times, dtype=float)
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        centers = np.asarray(centers, dtype=float)
+
+        # 구간 경계는 양 끝을 포함합니다. (start <= time <= end)
+        lo = np.searchsorted(times, centers - half_width, side='left')
+        hi = np.searchsorted(times, centers + half_width, side='right')
+
+        finite = ~np.isnan(values)
+        zeros = np.zeros((values.shape[0], 1))
+        value_sums = np.concatenate([zeros, np.cumsum(np.where(finite, values, 0.0), axis=1)], axis=1)
+        value_counts = np.concatenate([zeros, np.cumsum(finite, axis=1)], axis=1)
+
+        sums = value_sums[:, hi] - value_sums[:, lo]
+        counts = value_counts[:, hi] - value_counts[:, lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        return means, counts
+
+    def calculate_speech_rate(self, method='numpy'):
         """
         발화속도(초당 음절수)를 구한다.
-        :param sound: parselmouth로 생성한 sound 객체
+        :param method: 'numpy'는 intensity 배열에서 음절핵을 바로 찾고,
+                       'praat'은 피크마다 Praat을 호출하는 기존(참조) 경로를 사용한다.
         :return: speech_rate
         """
-        threshold, threshold2, threshold3 = self.get_threshold(self.intensity, silence_db=-25)
-        textgrid = self.get_textgrid(self.intensity, threshold3=threshold3, min_pause=0.3)
-        num_peaks, time, sound_from_intensity_matrix = self.get_num_peaks(self.intensity)
-        time_peaks, peak_count, intensities = self.get_time_peaks(num_peaks, time, sound_from_intensity_matrix, threshold)
-        valid_peak_count, current_time, current_int, valid_time = self.get_valid_peak_count(time_peaks, peak_count, self.intensity, intensities, min_dip = 2)
+        threshold, threshold2, threshold3 = self.graph.threshold(silence_db=self.silence_db)
+        if method == 'numpy':
+            valid_peak_count, valid_time = self.get_syllable_nuclei(self.intensity, threshold, min_dip=self.min_dip)
+        elif method == 'praat':
+            num_peaks, time, sound_from_intensity_matrix = self.get_num_peaks(self.intensity)
+            time_peaks, peak_count, intensities = self.get_time_peaks(num_peaks, time, sound_from_intensity_matrix, threshold)
+            valid_peak_count, current_time, current_int, valid_time = self.get_valid_peak_count(time_peaks, peak_count, self.intensity, intensities, min_dip=self.min_dip)
+        else:
+            raise ValueError(f'Unknown speech rate method: {method}')
 
         speech_rate = valid_peak_count / self.sound.end_time
         return speech_rate
 
     def plot_spectrogram(self):
-        plt.figure(figsize=(10, 4))
-        self.draw_spectrogram(self.sound.to_spectrogram())
-        plt.title('Spectrogram')
-        plt.tight_layout()
-        self.save_figure(suffix='_spectrogram')
+        import matplotlib.pyplot as plt # 그림을 그릴 때만 불러온다. (피쳐 추출만 할 때의 시작 시간 단축)
+        with tracing.span('plot', audio_seconds=self.sound.duration, kind='spectrogram'):
+            plt.figure(figsize=(10, 4))
+            self.draw_spectrogram(self.graph.spectrogram())
+            plt.title('Spectrogram')
+            plt.tight_layout()
+            self.save_figure(suffix='_spectrogram')
 
     def plot_formants(self):
-        plt.figure(figsize=(10, 4))
         # self.formants를 이용하여 포먼트 그래프를 그립니다.
+        import matplotlib.pyplot as plt
         times, f1, f2, f3 = self.formants
-        plt.scatter(times, f1, color='r', label='F1', s=8)
-        plt.scatter(times, f2, color='g', label='F2', s=8)
-        plt.scatter(times, f3, color='b', label='F3', s=8)
-        plt.legend(loc='upper right')
-        plt.xlabel("Time [s]")
-        plt.ylabel("Frequency [Hz]")
-        plt.title('Formants')
-        plt.tight_layout()
-        self.save_figure(suffix='_formants')
+        with tracing.span('plot', audio_seconds=self.sound.duration, kind='formants'):
+            plt.figure(figsize=(10, 4))
+            plt.scatter(times, f1, color='r', label='F1', s=8)
+            plt.scatter(times, f2, color='g', label='F2', s=8)
+            plt.scatter(times, f3, color='b', label='F3', s=8)
+            plt.legend(loc='upper right')
+            plt.xlabel("Time [s]")
+            plt.ylabel("Frequency [Hz]")
+            plt.title('Formants')
+            plt.tight_layout()
+            self.save_figure(suffix='_formants')
 
     def plot_pitch(self):
-        plt.figure(figsize=(10, 4))
         # self.pitch를 이용하여 피치 그래프를 그립니다.
+        import matplotlib.pyplot as plt
         pitch_times, pitch_values = self.pitch
-        plt.scatter(pitch_times, pitch_values, s=8)
-        plt.xlabel("Time [s]")
-        plt.ylabel("Pitch [Hz]")
-        plt.title("Pitch Curve")
-        plt.ylim(0, self.sound.to_pitch().ceiling)
-        plt.tight_layout()
-        self.save_figure(suffix='_pitch')
+        with tracing.span('plot', audio_seconds=self.sound.duration, kind='pitch'):
+            plt.figure(figsize=(10, 4))
+            plt.scatter(pitch_times, pitch_values, s=8)
+            plt.xlabel("Time [s]")
+            plt.ylabel("Pitch [Hz]")
+            plt.title("Pitch Curve")
+            plt.ylim(0, self.graph.pitch().ceiling)
+            plt.tight_layout()
+            self.save_figure(suffix='_pitch')
 
     def draw_spectrogram(self, spectrogram):
+        import matplotlib.pyplot as plt
         x, y = spectrogram.x_grid(), spectrogram.y_grid()
         sg_db = 10 * np.log10(spectrogram.values)
         plt.pcolormesh(x, y, sg_db, shading='auto')
@@ -126,6 +341,7 @@ class SpeechAnalysis(Praat):
         plt.ylabel("Frequency [Hz]")
 
     def save_figure(self, suffix):
+        import matplotlib.pyplot as plt
         sub_dir = os.path.join(self.jpg_dir, self.base_name)
         if not os.path.exists(sub_dir):
             os.makedirs(sub_dir)
@@ -139,65 +355,161 @@ class SpeechAnalysis(Praat):
             os.makedirs(json_dir)
 
         # 데이터를 JSON 형식으로 준비합니다.
-        data = {
-            "pitch": list(zip(*self.pitch)),
-            "formants": list(zip(*self.formants)),
-            "speech_rate": self.speech_rate
-        }
+        data = self.get_feature_dict()
 
         # JSON 파일로 저장합니다.
         json_path = os.path.join(json_dir, f"{self.base_name}.json")
-        with open(json_path, 'w', encoding='utf-8') as f:
+        with tracing.span('write', audio_seconds=self.sound.duration, format='json'), \
+             open(json_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=4)
 
+    def get_feature_dict(self):
+        """
+        선택된 피쳐를 JSON으로 저장할 모양(프레임별 튜플 리스트)으로 만든다. 사용한 분석 프로필도 함께 기록한다.
+        """
+        data = {"profile": self.profile.to_dict()}
+        if 'pitch' in self.features:
+            data["pitch"] = list(zip(*self.pitch))
+        if 'formants' in self.features:
+            data["formants"] = list(zip(*self.formants))
+        if 'speech_rate' in self.features:
+            data["speech_rate"] = self.speech_rate
+        return data
+
+    def save_features_to_store(self, store):
+        """
+        피쳐를 컬럼형 저장소(FeatureStore)에 추가한다. 선택되지 않은 피쳐는 빈 값으로 남긴다.
+        사용한 분석 프로필은 저장소 인덱스에 함께 기록한다.
+        :param store: FeatureStore
+        """
+        pitch = self.pitch if 'pitch' in self.features else ([], [])
+        formants = self.formants if 'formants' in self.features else ([], [], [], [])
+        speech_rate = self.speech_rate if 'speech_rate' in self.features else None
+        with tracing.span('write', audio_seconds=self.sound.duration, format='store'):
+            store.append(self.base_name, pitch, formants, speech_rate, profile=self.profile.to_dict())
+
+def _analyze_chunk_job(job):
+    """
+    프로세스 풀 워커에서 실행되는 청크 단위 피치, 포먼트 분석 함수
+    :param job: (samples, sampling_frequency, start_time, core_start, core_end, is_last, pitch_time_range, with_formants,
+                 profile, trace)
+    :return: (core 구간의 (pitch_times, pitch_values), core 구간의 (times, f1, f2, f3) 또는 None,
+              trace가 True이면 워커에서 기록한 span 리스트, 아니면 None)
+    """
+    (samples, sampling_frequency, start_time, core_start, core_end, is_last, pitch_time_range, with_formants, profile,
+     trace) = job
+    if trace:
+        tracing.start_worker()
+    graph = AnalysisGraph(parselmouth.Sound(samples, sampling_frequency=sampling_frequency, start_time=start_time),
+                          profile)
+    pitch_times, pitch_values = (np.asarray(series, dtype=float) for series in SpeechAnalysis.get_voiced_pitch(graph.pitch()))
+    core = select_core(pitch_times, core_start, core_end, is_last)
+    pitch = (pitch_times[core], pitch_values[core])
+    formants = None
+    if with_formants:
+        formants = SpeechAnalysis.get_formants_at_pitch(graph.formant(), pitch[0], pitch_time_range)
+    return pitch, formants, tracing.get_tracer().pop_records() if trace else None
+
+def calculate_average_features_from_store(store):
+    """
+    컬럼형 저장소의 memmap 컬럼을 그대로 훑어서 평균을 구한다.
+    :param store: FeatureStore
+    :return: avg_pitch, avg_f1, avg_f2, avg_f3
+    """
+    averages = []
+    for column in ('pitch_values', 'f1', 'f2', 'f3'):
+        values = store.scan(column)
+        averages.append(float(np.mean(values, dtype=np.float64)) if len(values) else None)
+    return tuple(averages)
+
 def calculate_average_features(json_dir='out/json/features'):
-    pitch_values = []
-    f1_values = []
-    f2_values = []
-    f3_values = []
+    """
+    피쳐 JSON 파일들을 하나씩 읽으면서 평균을 누적한다. (프레임 값을 리스트에 모으지 않는다)
+    :return: avg_pitch, avg_f1, avg_f2, avg_f3
+    """
+    stats = [RunningStats() for _ in range(4)]
 
     # JSON 파일들을 읽습니다.
     json_files = glob.glob(os.path.join(json_dir, "*.json"))
     for file in json_files:
         with open(file, 'r', encoding='utf-8') as f:
             data = json.load(f)
-            # 피치 값들을 추가합니다.
-            for time, pitch in data["pitch"]:
-                if pitch is not None:
-                    pitch_values.append(pitch)
+        # 피치 값들을 추가합니다.
+        pitch = np.array([pitch for _, pitch in data.get("pitch", []) if pitch is not None], dtype=float)
+        stats[0].update(pitch)
 
-            # 포먼트 값들을 추가합니다.
-            for formants in data["formants"]:
-                f1_values.append(formants[1])
-                f2_values.append(formants[2])
-                f3_values.append(formants[3])
+        # 포먼트 값들을 추가합니다.
+        formants = np.asarray(data.get("formants", []), dtype=float).reshape(-1, 4)
+        for feature_stats, values in zip(stats[1:], formants[:, 1:].T):
+            feature_stats.update(values)
 
     # 평균값을 계산합니다.
-    avg_pitch = np.mean(pitch_values) if pitch_values else None
-    avg_f1 = np.mean(f1_values) if f1_values else None
-    avg_f2 = np.mean(f2_values) if f2_values else None
-    avg_f3 = np.mean(f3_values) if f3_values else None
+    avg_pitch, avg_f1, avg_f2, avg_f3 = (feature_stats.mean if feature_stats.count else None for feature_stats in stats)
 
     return avg_pitch, avg_f1, avg_f2, avg_f3
     
     
 if __name__ == '__main__':
-    wave_files = glob.glob('out/split-wav/**/*.wav', recursive=True)  # 필요시 WAV 파일의 경로를 수정합니다.
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cache-dir', default='out/cache/features', help='피쳐 캐시 디렉토리')
+    parser.add_argument('--cache-size-mb', type=int, default=1024, help='피쳐 캐시 최대 크기(MB)')
+    parser.add_argument('--no-cache', action='store_true', help='피쳐 캐시를 사용하지 않습니다.')
+    parser.add_argument('--output', choices=['store', 'json', 'both'], default='store', help='피쳐 저장 형식')
+    parser.add_argument('--store-dir', default='out/store/features', help='컬럼형 피쳐 저장소 디렉토리')
+    parser.add_argument('--features', nargs='+', default=list(SpeechAnalysis.FEATURES), choices=SpeechAnalysis.FEATURES,
+                        help='계산할 피쳐')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=list(PROFILES),
+                        help='분석 프로필 (fast: 20ms 간격, standard: parselmouth 기본값, precise: 5ms 간격)')
+    parser.add_argument('--manifest', default=None,
+                        help='구간 목록(segments.csv), 주어지면 split-wav 파일 대신 원본에서 구간을 꺼내 분석합니다.')
+    parser.add_argument('--plot-workers', type=int, default=None, help='그림 저장 프로세스 수, 0이면 현재 프로세스에서 그립니다.')
+    parser.add_argument('--fast-spectrogram', action='store_true',
+                        help='스펙트로그램을 matplotlib 없이 (축, 제목 없는) 이미지로 바로 저장합니다.')
+    parser.add_argument('--no-plots', action='store_true', help='그림을 저장하지 않습니다.')
+    parser.add_argument('--trace', default=None, help='단계별 span을 기록할 JSONL 경로 (예: out/trace/analysis.jsonl)')
+    parser.add_argument('--metrics', default=None, help='단계별 합계를 저장할 Prometheus 텍스트 파일 경로')
+    args = parser.parse_args()
+    if args.trace or args.metrics:
+        tracing.enable(args.trace, args.metrics)
+    cache = None if args.no_cache else FeatureCache(args.cache_dir, max_bytes=args.cache_size_mb * 1024 * 1024)
+    store = FeatureStore(args.store_dir) if args.output in ('store', 'both') else None
+
+    if args.manifest:
+        wave_files = SegmentManifest(args.manifest).read()
+    else:
+        wave_files = glob.glob('out/split-wav/**/*.wav', recursive=True)  # 필요시 WAV 파일의 경로를 수정합니다.
+    renderer = None
+    if not args.no_plots:
+        renderer = BatchPlotRenderer(workers=args.plot_workers, fast_spectrogram=args.fast_spectrogram)
+    plot_kinds = [kind for kind in BatchPlotRenderer.KINDS if kind == 'spectrogram' or kind in args.features]
     print("음성 분석 시작")
     for wave_file in tqdm(wave_files, desc='Total Wavs'):
         try:
-            analyzer = SpeechAnalysis(wave_file)
-            analyzer.plot_spectrogram()
-            analyzer.plot_formants()
-            analyzer.plot_pitch()
-            analyzer.save_features_to_json()
+            analyzer = SpeechAnalysis(wave_file, cache=cache, features=args.features, profile=args.profile)
+            if renderer is not None: # 그림은 워커 프로세스에서 저장하고 다음 파일을 분석한다.
+                renderer.submit(analyzer, plot_kinds)
+            if store is not None:
+                analyzer.save_features_to_store(store)
+            if args.output in ('json', 'both'):
+                analyzer.save_features_to_json()
             print(f"음성 분석 완료: {wave_file}")
         except Exception as e:
             print(f'Error SpeechAnalysis for {wave_file}: {e}')
-            
+    if renderer is not None:
+        renderer.close()
+
+    if cache is not None:
+        print(f"피쳐 캐시: {cache.stats()}")
+    tracer = tracing.disable()
+    if tracer is not None:
+        tracer.print_summary()
+
     # 함수 호출 예시
     print("전체 음성에 대한 통계 산출")
-    average_pitch, average_f1, average_f2, average_f3 = calculate_average_features(json_dir='out/json/features')
+    if store is not None:
+        average_pitch, average_f1, average_f2, average_f3 = calculate_average_features_from_store(store)
+    else:
+        average_pitch, average_f1, average_f2, average_f3 = calculate_average_features(json_dir='out/json/features')
     print("Average Pitch:", average_pitch)
     print("Average F1:", average_f1)
     print("Average F2:", average_f2)
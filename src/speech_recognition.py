@@ -2,31 +2,44 @@ import os
 import csv
 import glob
 import json
+import time
+import argparse
+import contextlib
 
-import torch
-# import whisper
-import whisper_timestamped as whisper
 from tqdm import tqdm
-from pydub import AudioSegment
-from pyannote.audio import Pipeline
+
+import tracing
+from audio_io import load_waveform, open_pcm_wav
+from pipeline import Stage, StagedPipeline
+from job_journal import JobJournal
+from segment_manifest import SegmentManifest
+from transcript_store import ColumnarTranscriptWriter
+from recognition_backends import PyannoteDiarization, WhisperTranscription, SilenceGatedTranscription
 
 class SpeechRecognition:
     """
     화자 분리 및 STT 음성 인식을 수행합니다.
     """
-    def __init__(self, access_token='Your_Huggingface_Access_Token'):
+    DEFAULT_CONCURRENCY = {'decode': 1, 'diarization': 1, 'split': 2, 'transcription': 1, 'writer': 1}
+
+    def __init__(self, access_token='Your_Huggingface_Access_Token', diarization_backend=None, transcription_backend=None):
+        """
+        :param access_token: Huggingface access token (pyannote)
+        :param diarization_backend: DiarizationBackend, 없으면 pyannote 파이프라인을 불러온다.
+        :param transcription_backend: TranscriptionBackend, 없으면 Whisper "base" 모델을 불러온다.
+        """
         # Pyannote 화자 분리 파이프라인 초기화
-        self.diarization_pipeline = Pipeline.from_pretrained(
-            "pyannote/speaker-diarization-3.1",
-            use_auth_token=access_token)
-        self.diarization_pipeline.to(torch.device("cuda"))
+        self.diarization_backend = diarization_backend or PyannoteDiarization(access_token)
         # Whisper 모델 로드
-        self.whisper_model = whisper.load_model("base")
+        self.transcription_backend = transcription_backend or WhisperTranscription("base")
 
-    def separate_speakers(self, audio_path):
-        # 화자 분리 수행
-        diarization = self.diarization_pipeline(audio_path)
-        return diarization
+    def separate_speakers(self, audio_path, waveform=None):
+        """
+        화자 분리 수행
+        :param waveform: 미리 디코딩한 audio_io.Waveform, 없으면 audio_path에서 읽는다.
+        :return speakers_dict: {화자 ID: [[시작, 종료], ...]}
+        """
+        return self.diarization_backend.diarize(audio_path, waveform=waveform)
 
     def save_sep_dict(self, diarization):
         """
@@ -34,44 +47,42 @@ class SpeechRecognition:
         :param diarization: pyannote.audio의 화자 분리 객체
         :return speakers_dict: 화자 분리 정보가 들어있는 사전
         """
-        speakers_dict = {}
-        for turn, _, speaker in diarization.itertracks(yield_label=True):
-            if speaker not in speakers_dict:
-                speakers_dict[speaker] = []
-            speakers_dict[speaker].append([turn.start, turn.end])
-
-        return speakers_dict
+        return PyannoteDiarization.to_speakers_dict(diarization)
 
-    def transcribe_speech(self, audio_path):
-        # Whisper를 사용한 음성 인식
-        result = whisper.transcribe(self.whisper_model, audio_path, language='ko')
+    def transcribe_speech(self, audio_path, waveform=None, speakers_dict=None):
+        # Whisper를 사용한 음성 인식 (speakers_dict는 발화 구간만 인식하는 백엔드가 사용한다)
+        result = self.transcription_backend.transcribe(audio_path, waveform=waveform, speakers_dict=speakers_dict)
         return result
 
-    def split_and_save_speakers(self, audio_path, speakers_dict, output_dir='out/split-wav'):
+    def split_and_save_speakers(self, audio_path, speakers_dict, output_dir='out/split-wav', audio=None):
         """
         화자별로 오디오 파일을 분리하고 저장합니다.
         :param audio_path: 원본 오디오 파일 경로
         :param speakers_dict: 화자별 타임스탬프가 저장된 사전
         :param output_dir: 분리된 파일을 저장할 디렉토리
+        :param audio: 미리 디코딩한 audio_io.Waveform, 없으면 audio_path에서 읽는다.
+        PCM wav 파일은 디코딩한 버퍼 대신 원본을 메모리 맵으로 열어 샘플 바이트를 그대로 잘라 쓴다.
         """
         if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+            os.makedirs(output_dir, exist_ok=True)
+
+        source = open_pcm_wav(audio_path)
+        if source is not None:
+            with source:
+                self.save_speaker_segments(source, audio_path, speakers_dict, output_dir)
+            return
+        if audio is None:
+            audio = load_waveform(audio_path)
+        self.save_speaker_segments(audio, audio_path, speakers_dict, output_dir)
 
-        audio = AudioSegment.from_file(audio_path)
-        basename = os.path.basename(audio_path).split('.')[0]
-        for speaker in speakers_dict:
-            for i, (start, end) in enumerate(speakers_dict[speaker]):
-                segment_length = end - start  # 단위: 초
-                if segment_length < 0.13:
-                    continue  # 세그먼트 길이가 0.13초보다 짧으면 저장을 건너뜁니다.
-
-                # 시간 정보를 초 단위로 반올림합니다.
-                start_s = round(start, 1)
-                end_s = round(end, 1)
-                i_num = str(i).zfill(3)
-                filename = f"{basename}_{speaker}_segment_{i_num}_{start_s}_{end_s}.wav"
-                speaker_segment = audio[start_s*1000:end_s*1000]
-                speaker_segment.export(f"{output_dir}/{filename}", format="wav")
+    @staticmethod
+    def save_speaker_segments(audio, audio_path, speakers_dict, output_dir):
+        """
+        0.13초 이상인 화자 구간을 {파일명}_{화자}_segment_{번호}_{시작}_{종료}.wav로 저장한다.
+        :param audio: save_wav(path, start, end)를 가진 audio_io.Waveform 또는 PcmWavFile
+        """
+        for segment in SegmentManifest.make_segments(audio_path, speakers_dict):
+            audio.save_wav(f"{output_dir}/{segment.segment_id}.wav", segment.start, segment.end)
 
     def save_speaker_diarization_to_csv(self, speaker_dict, audio_filename, diarization_csv_writer):
         """
@@ -102,69 +113,347 @@ class SpeechRecognition:
                 word_id = f"{seg_index}-{word_index}"  # 어절 ID를 "문장번호-어절번호" 형식으로 변경
                 global_csv_writer.writerow([audio_path, audio_filename, seg_index, text, word_id, word_text, word_start, word_end, confidence])
 
-    def process_files(self, audio_files, output_dir='out/csv'):
+    def process_files(self, audio_files, output_dir='out/csv', concurrency=None, queue_size=2, save_wav=True,
+                      output_format='csv', part='part-0', resume=False, journal_path=None, split_dir='out/split-wav'):
+        """
+        여러 오디오 파일을 단계별 파이프라인으로 처리합니다.
+        디코딩 -> 화자 분리 -> 화자별 wav 저장 -> STT -> CSV 기록 단계가 서로 겹쳐서 실행되며,
+        단계 사이 큐의 크기(queue_size)만큼만 앞서 나갑니다.
+        파일마다 한 번만 디코딩한 16kHz 모노 버퍼를 모든 단계가 공유합니다.
+        단계가 끝날 때마다 작업 일지(JobJournal)에 기록하므로, resume=True로 다시 실행하면 끝난 파일은 건너뛰고
+        중간에 멈춘 파일은 남은 단계만 처리하며 CSV는 마지막으로 완료된 기록 뒤에 이어 씁니다.
+        :param audio_files: 오디오 파일 경로 리스트
+        :param output_dir: CSV 저장 디렉토리
+        :param concurrency: 단계별 워커 수 (DEFAULT_CONCURRENCY를 덮어쓴다)
+        :param queue_size: 단계 사이 큐의 최대 크기
+        :param save_wav: False이면 화자별 wav를 저장하지 않고 구간 목록(segments.csv)만 남긴다.
+                         SpeechAnalysis는 목록의 구간을 원본에서 바로 꺼내 분석한다.
+        :param output_format: 'csv', 또는 컬럼형 'parquet', 'arrow' (pyarrow 필요, output_dir 아래
+                              speech_transcription/, speaker_diarization/ 디렉토리에 기록하고
+                              transcript_store.export_csv로 CSV를 내보낼 수 있다)
+                              컬럼형 part 파일은 이어 쓸 수 없으므로 다시 실행하면 일지의 결과로 part를 새로 쓴다.
+        :param part: 컬럼형 출력의 part 파일 이름, 여러 프로세스가 같은 output_dir에 기록할 때 서로 달라야 한다.
+        :param resume: True이면 작업 일지를 읽어 이전 실행을 이어서 처리한다. False이면 일지와 출력을 새로 시작한다.
+        :param journal_path: 작업 일지 경로, 기본값은 output_dir/journal.jsonl
+        :param split_dir: 화자별 wav 저장 디렉토리 (split_and_save_speakers의 output_dir)
+        :raises RuntimeError: 기록 단계(CSV/Parquet 기록, 일지 기록)에서 실패한 파일이 있으면 모든 파일을 처리한 뒤
+        """
         # output 폴더 생성
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
-            
+
         global_stt_csv_path = os.path.join(output_dir, 'speech_transcription.csv')
         diarization_csv_path = os.path.join(output_dir, 'speaker_diarization.csv')
+        manifest_path = os.path.join(output_dir, 'segments.csv')
+        stt_result_dir = os.path.join(output_dir, 'journal', 'transcription')
+        os.makedirs(stt_result_dir, exist_ok=True)
+        workers = dict(self.DEFAULT_CONCURRENCY, **(concurrency or {}))
+
+        with contextlib.ExitStack() as stack:
+            journal = stack.enter_context(JobJournal(journal_path or os.path.join(output_dir, 'journal.jsonl'),
+                                                     resume=resume))
+            # CSV 출력이 일지의 마지막 writer 기록과 맞으면 그 크기로 잘라 이어 쓰고, 아니면 일지의 결과로 새로 쓴다.
+            append = output_format == 'csv' and self.truncate_outputs(journal.last_outputs,
+                                                                      [global_stt_csv_path, diarization_csv_path, manifest_path])
+            manifest = stack.enter_context(SegmentManifest(manifest_path, append=append))
+            columnar = None
+            if output_format != 'csv':
+                columnar = stack.enter_context(ColumnarTranscriptWriter(output_dir, part=part, format=output_format))
+            else:
+                # csv 파일 생성
+                stt_csvfile = stack.enter_context(open(global_stt_csv_path, 'a' if append else 'w', newline='', encoding='utf-8'))
+                diar_csvfile = stack.enter_context(open(diarization_csv_path, 'a' if append else 'w', newline='', encoding='utf-8'))
+                global_csv_writer = csv.writer(stt_csvfile)
+                diarization_csv_writer = csv.writer(diar_csvfile)
+
+                stt_headers = ['위치', '파일명', '문장 번호', '문장', '어절 번호', '어절', '어절 시작', '어절 종료', '신뢰도']
+                diar_headers = ['위치', '파일명', '화자 ID', '시작 시간', '종료 시간']
+
+                if not append:
+                    global_csv_writer.writerow(stt_headers)
+                    diarization_csv_writer.writerow(diar_headers)
+
+            items = self.make_journal_items(audio_files, journal, save_wav, written_valid=append, split_dir=split_dir)
+            estimate = RemainingWork(items, journal.get_rates(), save_wav)
+            print(estimate.describe())
+            progress = tqdm(total=len(audio_files), desc='Total Wavs')
+
+            # 추적을 켜면 단계마다 처리한 음성 길이와 함께 span을 남긴다. (tracing.enable)
+            def decode(item):
+                if not self.needs_audio(item, save_wav):
+                    item['audio'] = None
+                    return
+                with tracing.span('decode', file_name=item['base_name']) as span:
+                    item['audio'] = load_waveform(item['audio_path'])
+                    item['duration'] = item['audio'].duration
+                    span.set(audio_seconds=item['duration'])
+
+            def diarize(item):
+                if 'diarization' in item['done']:
+                    return
+                start = time.perf_counter()
+                with tracing.span('diarization', audio_seconds=item['duration'], file_name=item['base_name']):
+                    item['speaker_dict'] = self.separate_speakers(item['audio_path'], waveform=item['audio'])
+                journal.record(item['audio_path'], item['file_id'], 'diarization', elapsed=time.perf_counter() - start,
+                               audio_seconds=item['duration'], speaker_dict=item['speaker_dict'])
+
+            def split(item):
+                if save_wav and 'split' not in item['done']:
+                    start = time.perf_counter()
+                    with tracing.span('split', audio_seconds=item['duration'], file_name=item['base_name']):
+                        self.split_and_save_speakers(item['audio_path'], item['speaker_dict'], output_dir=split_dir,
+                                                     audio=item['audio'])
+                    journal.record(item['audio_path'], item['file_id'], 'split', elapsed=time.perf_counter() - start,
+                                   audio_seconds=item['duration'], output_dir=split_dir)
+
+            def transcribe(item):
+                stt_path = os.path.join(stt_result_dir, f"{item['file_id'][0]}.json")
+                if 'transcription' in item['done']:
+                    item.pop('audio', None)
+                    with open(item['done']['transcription']['output'], 'r', encoding='utf-8') as f:
+                        item['stt_result'] = json.load(f)
+                    return
+                start = time.perf_counter()
+                with tracing.span('transcription', audio_seconds=item['duration'], file_name=item['base_name']):
+                    item['stt_result'] = self.transcribe_speech(item['audio_path'], waveform=item.pop('audio'),
+                                                                speakers_dict=item['speaker_dict'])
+                with open(f'{stt_path}.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(item['stt_result'], f, ensure_ascii=False)
+                os.replace(f'{stt_path}.tmp', stt_path)
+                journal.record(item['audio_path'], item['file_id'], 'transcription', elapsed=time.perf_counter() - start,
+                               audio_seconds=item['duration'], output=stt_path)
+
+            def write(item):
+                with tracing.span('write', audio_seconds=item.get('duration'), format=output_format):
+                    written = write_results(item)
+                if written is not None:
+                    journal.record(item['audio_path'], item['file_id'], 'writer', written=sorted(written),
+                                   outputs=self.sync_outputs(stt_csvfile, diar_csvfile, manifest.file) if columnar is None else None)
+                estimate.complete(item)
+                progress.set_postfix_str(estimate.describe_remaining())
+
+            def write_results(item):
+                """
+                :return: 이번에 기록을 마친 행 묶음을 포함한 전체 목록 (새로 기록한 것이 없으면 None)
+                """
+                audio_path, base_name = item['audio_path'], item['base_name']
+                stage_name, error = item['error'] or (None, None)
+                item.pop('audio', None)
+                progress.update(1)
+                # 디코딩이나 화자 분리에 실패하면 파일을 건너뛴다.
+                if stage_name == 'decode':
+                    print(f'Error in decoding for {audio_path}: {error}')
+                    return None
+                if stage_name == 'diarization':
+                    print(f'Error in diarization for {audio_path}: {error}')
+                    return None
+
+                # 이전 실행에서 이미 기록한 행은 다시 쓰지 않는다.
+                written = set(item['written'])
+                if 'diarization' not in written:
+                    if columnar is not None:
+                        columnar.write_diarization(audio_path, base_name, item['speaker_dict'])
+                    else:
+                        for speaker, segments in item['speaker_dict'].items():
+                            for segment in segments:
+                                start, end = segment
+                                diarization_csv_writer.writerow([audio_path, base_name, speaker, start, end])
+                    manifest.write(SegmentManifest.make_segments(audio_path, item['speaker_dict']))
+                    written.add('diarization')
+
+                if stage_name == 'split':
+                    print(f'Error in split save wavfile for {audio_path}: {error}')
+                elif stage_name == 'transcription':
+                    print(f'Error in transcription for {audio_path}: {error}')
+                elif 'transcription' not in written:
+                    if columnar is not None:
+                        columnar.write_transcription(item['stt_result'], audio_path, base_name)
+                    else:
+                        self.save_to_csv(item['stt_result'], audio_path, base_name, global_csv_writer)
+                    written.add('transcription')
+                    print(f'{audio_path}: 화자 분리 및 STT 처리 완료.')
+                return written if written != set(item['written']) else None
+
+            pipeline = StagedPipeline([
+                Stage('decode', decode, workers=workers['decode']),
+                Stage('diarization', diarize, workers=workers['diarization']),
+                Stage('split', split, workers=workers['split']),
+                Stage('transcription', transcribe, workers=workers['transcription']),
+                Stage('writer', write, skip_failed=False, ordered=True),
+            ], queue_size=queue_size)
+            failures = pipeline.run(items)
+            progress.close()
+
+            # 다른 단계의 오류는 write_results가 알리므로, 기록 단계 자체에서 난 오류(CSV/Parquet 기록, 일지 기록)만 알린다.
+            write_failures = [(index, error) for index, stage_name, error in failures if stage_name == 'writer']
+            for index, error in write_failures:
+                print(f"Error in writing results for {items[index]['audio_path']}: {error}")
+                print(items[index].get('traceback', ''))
+            if write_failures:
+                raise RuntimeError(f'Failed to write results for {len(write_failures)} file(s): '
+                                   + ', '.join(items[index]['audio_path'] for index, _ in write_failures))
+
+    @staticmethod
+    def make_journal_items(audio_files, journal, save_wav, written_valid=True, split_dir='out/split-wav'):
+        """
+        파일마다 일지에서 끝난 단계와 그 결과(화자 분리, 음성 길이, 기록한 행)를 채운 파이프라인 item을 만든다.
+        :param written_valid: False이면 출력 파일을 새로 쓰므로 이전에 기록한 행은 없는 것으로 본다.
+        :param split_dir: 화자별 wav 저장 디렉토리, 일지의 split 기록이 다른 디렉토리이면 다시 저장한다.
+        """
+        items = []
+        for audio_path in audio_files:
+            item = {'audio_path': audio_path, 'base_name': os.path.splitext(os.path.basename(audio_path))[0],
+                    'done': {}, 'written': [], 'file_id': None, 'duration': None}
+            try:
+                item['file_id'] = journal.get_hash(audio_path)
+            except OSError: # 읽을 수 없는 파일은 디코딩 단계에서 오류로 보고된다.
+                items.append(item)
+                continue
+            done = journal.get_stages(audio_path, item['file_id'][0])
+            if 'transcription' in done and not os.path.exists(done['transcription']['output']):
+                del done['transcription']
+            if 'split' in done and done['split'].get('output_dir') != split_dir:
+                del done['split']
+            if 'diarization' in done:
+                item['speaker_dict'] = done['diarization']['speaker_dict']
+                item['duration'] = done['diarization']['audio_seconds']
+            else: # 화자 분리 결과가 없으면 이후 단계도 다시 해야 한다.
+                done = {}
+            if written_valid and 'writer' in done:
+                item['written'] = done['writer']['written']
+            item['done'] = done
+            items.append(item)
+        return items
+
+    @staticmethod
+    def needs_audio(item, save_wav):
+        return any(stage not in item['done'] for stage in ('diarization', 'transcription')) or \
+            (save_wav and 'split' not in item['done'])
+
+    @staticmethod
+    def truncate_outputs(outputs, paths):
+        """
+        출력 파일을 일지에 기록된 크기(마지막으로 완료된 기록 끝)로 자른다.
+        :return: 모든 파일이 기록된 크기 이상으로 남아 있어서 이어 쓸 수 있으면 True,
+                 일지에 없는 파일(다른 경로 표기로 기록된 경우 포함)이 있으면 False
+        """
+        if not outputs or any(path not in outputs or not os.path.exists(path) or os.path.getsize(path) < outputs[path]
+                              for path in paths):
+            return False
+        for path in paths:
+            with open(path, 'r+b') as f:
+                f.truncate(outputs[path])
+        return True
+
+    @staticmethod
+    def sync_outputs(*files):
+        """
+        출력 파일을 디스크에 내려 쓰고 크기를 돌려준다. (일지의 writer 기록에 남긴다)
+        """
+        sizes = {}
+        for f in files:
+            f.flush()
+            os.fsync(f.fileno())
+            sizes[f.name] = os.fstat(f.fileno()).st_size
+        return sizes
+
+
+class RemainingWork:
+    """
+    남은 단계의 음성 길이와 이전 실행에서 잰 단계별 처리 속도로 남은 작업량을 추정합니다.
+    실행 중에는 지금까지 끝낸 작업량과 걸린 시간의 비율로 남은 시간을 보정합니다.
+    """
+    STAGES = ('diarization', 'split', 'transcription')
+
+    def __init__(self, items, rates, save_wav=True):
+        """
+        :param items: SpeechRecognition.make_journal_items가 만든 item 리스트
+        :param rates: JobJournal.get_rates의 단계별 처리 속도, 처음 실행이면 비어 있다.
+        """
+        self.rates = rates
+        self.stages = [stage for stage in self.STAGES if save_wav or stage != 'split']
+        known = [item['duration'] for item in items if item['duration']]
+        self.durations = {}
+        for item in items:
+            duration = item['duration']
+            if duration is None: # 처음 보는 파일은 wav 헤더로 길이를 구한다.
+                source = open_pcm_wav(item['audio_path'])
+                if source is not None:
+                    with source:
+                        duration = source.duration
+                else:
+                    duration = sum(known) / len(known) if known else 0.0
+            self.durations[item['audio_path']] = duration
+        self.items = {item['audio_path']: item for item in items}
+        self.total = sum(self.get_work(item) for item in items)
+        self.completed = 0.0
+        self.started = time.perf_counter()
+        self.counts = {"done": 0, "partial": 0, "new": 0}
+        for item in items:
+            missing = [stage for stage in self.stages if stage not in item['done']]
+            key = "new" if len(missing) == len(self.stages) else "partial" if missing or 'transcription' not in item['written'] else "done"
+            self.counts[key] += 1
+
+    def get_work(self, item):
+        """
+        파일 하나의 남은 작업량. 처리 속도를 모르는 단계는 음성 1초를 1로 센다.
+        """
+        duration = self.durations[item['audio_path']]
+        return sum(duration * self.rates.get(stage, 1.0) for stage in self.stages if stage not in item['done'])
+
+    def complete(self, item):
+        self.completed += self.get_work(item)
+
+    def get_remaining_seconds(self):
+        """
+        :return: 남은 시간(초) 추정값, 추정할 수 없으면 None
+        """
+        remaining = self.total - self.completed
+        if self.completed > 0:
+            return remaining * (time.perf_counter() - self.started) / self.completed
+        if all(stage in self.rates for stage in self.stages):
+            return remaining
+        return None
+
+    def describe_remaining(self):
+        seconds = self.get_remaining_seconds()
+        return f'remaining ~{seconds:.0f}s' if seconds is not None else 'remaining ?'
+
+    def describe(self):
+        remaining_audio = {stage: sum(self.durations[path] for path, item in self.items.items() if stage not in item['done'])
+                           for stage in self.stages}
+        audio = ', '.join(f'{stage} {seconds:.1f}s' for stage, seconds in remaining_audio.items())
+        return (f"작업 일지: 완료 {self.counts['done']}, 일부 완료 {self.counts['partial']}, 새 파일 {self.counts['new']} "
+                f"(남은 음성: {audio}; {self.describe_remaining()})")
 
-        # csv 파일 생성
-        with open(global_stt_csv_path, 'w', newline='', encoding='utf-8') as stt_csvfile, \
-             open(diarization_csv_path, 'w', newline='', encoding='utf-8') as diar_csvfile:
-            global_csv_writer = csv.writer(stt_csvfile)
-            diarization_csv_writer = csv.writer(diar_csvfile)
-
-            stt_headers = ['위치', '파일명', '문장 번호', '문장', '어절 번호', '어절', '어절 시작', '어절 종료', '신뢰도']
-            diar_headers = ['위치', '파일명', '화자 ID', '시작 시간', '종료 시간']
-
-            global_csv_writer.writerow(stt_headers)
-            diarization_csv_writer.writerow(diar_headers)
-
-            for audio_path in tqdm(audio_files, desc='Total Wavs'):
-                base_name = os.path.splitext(os.path.basename(audio_path))[0]
-
-                # 화자 분리 실행
-                try: # 예외 처리
-                    diarization_result = self.separate_speakers(audio_path)
-                except Exception as e:
-                    print(f'Error in diarization for {audio_path}: {e}')
-                    continue
-                speaker_dict = self.save_sep_dict(diarization_result)
-
-                for speaker, segments in speaker_dict.items():
-                    for segment in segments:
-                        start, end = segment
-                        diarization_csv_writer.writerow([audio_path, base_name, speaker, start, end])
-
-                split_output_dir = os.path.join(output_dir, 'split-wav', base_name)
-
-                # 화자분리된 wav파일 저장
-                try:
-                    self.split_and_save_speakers(audio_path, speaker_dict)
-                except Exception as e:
-                    print(f'Error in split save wavfile for {audio_path}: {e}')
-                    continue
-
-                # STT 처리
-                try:
-                    stt_result = self.transcribe_speech(audio_path)
-                    self.save_to_csv(stt_result, audio_path, base_name, global_csv_writer)
-                except Exception as e:
-                    print(f'Error in split save wavfile for {audio_path}: {e}')
-                    continue
-
-                print(f'{audio_path}: 화자 분리 및 STT 처리 완료.')
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output-format', choices=['csv', 'parquet', 'arrow'], default='csv',
+                        help='STT, 화자 분리 결과 저장 형식 (parquet, arrow는 pyarrow 필요)')
+    parser.add_argument('--gate-silence', choices=['none'] + list(SilenceGatedTranscription.REGION_SOURCES), default='none',
+                        help='무음을 건너뛰고 발화 구간만 인식합니다. (textgrid: 강도 기반 무음 검출, diarization: 화자 분리 구간)')
+    parser.add_argument('--resume', action='store_true', help='작업 일지를 읽어 중단된 실행을 이어서 처리합니다.')
+    parser.add_argument('--trace', default=None, help='단계별 span을 기록할 JSONL 경로 (예: out/trace/recognition.jsonl)')
+    parser.add_argument('--metrics', default=None, help='단계별 합계를 저장할 Prometheus 텍스트 파일 경로')
+    args = parser.parse_args()
+    if args.trace or args.metrics:
+        tracing.enable(args.trace, args.metrics)
+
     # config 파일 불러오기
     with open('config.json', 'r') as f:
         config = json.load(f)
 
     # 사용 예시
-    recognition = SpeechRecognition(access_token=config['hf_access_key'])
+    transcription_backend = WhisperTranscription("base")
+    if args.gate_silence != 'none':
+        transcription_backend = SilenceGatedTranscription(transcription_backend, region_source=args.gate_silence)
+    recognition = SpeechRecognition(access_token=config['hf_access_key'], transcription_backend=transcription_backend)
     audio_files = glob.glob("data/wav-files/**/*.wav", recursive=True)
     audio_files = sorted(audio_files)
     print(f'audio files: {audio_files[:10]}')
-    recognition.process_files(audio_files, output_dir='out/csv')
\ No newline at end of file
+    recognition.process_files(audio_files, output_dir='out/csv', output_format=args.output_format,
+                              resume=args.resume)
+    tracer = tracing.disable()
+    if tracer is not None:
+        tracer.print_summary()
\ No newline at end of file
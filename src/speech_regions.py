@@ -0,0 +1,103 @@
+from collections import namedtuple
+
+import numpy as np
+import parselmouth
+from parselmouth.praat import call
+
+from praat import Praat
+from analysis_graph import AnalysisGraph
+
+# 묶음(window) 안의 한 구간: 원본 시간 [start, end)가 묶음 오디오의 window_start초부터 놓인다.
+Piece = namedtuple('Piece', ['start', 'end', 'window_start'])
+
+
+def get_sounding_regions(sound: parselmouth.Sound, silence_db=-25, min_pause=0.3):
+    """
+    Praat.get_speaking_time과 같은 TextGrid(silences)에서 "sounding" 구간을 구한다.
+    :return: [(start, end), ...] 원본 시간(초)
+    """
+    textgrid = AnalysisGraph(sound).textgrid(silence_db=silence_db, min_pause=min_pause)
+    silence_table = Praat.get_silence_table(Praat.get_silence_tier(textgrid))
+    return [(call(silence_table, "Get value", row, 1), call(silence_table, "Get value", row, 2))
+            for row in range(1, Praat.get_n_pauses(silence_table) + 1)]
+
+
+def get_diarization_regions(speakers_dict):
+    """
+    화자 분리 결과(save_sep_dict 형식)의 모든 화자 구간.
+    :return: [(start, end), ...] 시작 시간 순서 (겹치는 구간은 merge_regions에서 합쳐진다)
+    """
+    return sorted((start, end) for segments in speakers_dict.values() for start, end in segments)
+
+
+def merge_regions(regions, duration, padding=0.2, min_gap=0.5):
+    """
+    구간 양쪽에 padding을 붙이고, 사이 간격이 min_gap보다 짧은 구간은 하나로 합친다.
+    :return: [(start, end), ...] 0~duration 안의 겹치지 않는 구간
+    """
+    merged = []
+    for start, end in sorted(regions):
+        start, end = max(0.0, start - padding), min(duration, end + padding)
+        if end <= start:
+            continue
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def pack_regions(regions, max_window=30.0, separator=0.3):
+    """
+    짧은 구간들을 separator초 무음을 사이에 두고 max_window초 이하의 묶음으로 모은다.
+    max_window보다 긴 구간은 max_window 단위로 자른다.
+    :return: [[Piece, ...], ...] 묶음 리스트
+    """
+    windows, pieces, length = [], [], 0.0
+    for start, end in regions:
+        while start < end:
+            if pieces and length + separator + min(end - start, max_window) > max_window:
+                windows.append(pieces)
+                pieces, length = [], 0.0
+            window_start = length + separator if pieces else 0.0
+            piece_end = min(end, start + max_window - window_start)
+            pieces.append(Piece(start, piece_end, window_start))
+            length = window_start + piece_end - start
+            start = piece_end
+    if pieces:
+        windows.append(pieces)
+    return windows
+
+
+def make_window_samples(samples, sample_rate, pieces, separator=0.3):
+    """
+    묶음의 구간 샘플을 separator초 무음을 사이에 두고 이어 붙인다.
+    """
+    gap = np.zeros(int(round(separator * sample_rate)), dtype=samples.dtype)
+    parts = []
+    for index, piece in enumerate(pieces):
+        if index:
+            parts.append(gap)
+        parts.append(samples[int(round(piece.start * sample_rate)):int(round(piece.end * sample_rate))])
+    return np.concatenate(parts)
+
+
+def map_time(time, pieces):
+    """
+    묶음 오디오 기준 시간을 원본 시간으로 되돌린다. 구간 사이 무음에 떨어진 시간은 앞 구간의 끝으로 붙인다.
+    """
+    index = max(0, int(np.searchsorted([piece.window_start for piece in pieces], time, side='right')) - 1)
+    piece = pieces[index]
+    return min(max(piece.start + time - piece.window_start, piece.start), piece.end)
+
+
+def map_result(result, pieces):
+    """
+    whisper_timestamped 형식 결과의 문장, 어절 시간을 원본 시간으로 바꾼다. (제자리에서 바꾸고 돌려준다)
+    """
+    for segment in result.get('segments', []):
+        for item in [segment] + list(segment.get('words', [])):
+            for key in ('start', 'end'):
+                if item.get(key) is not None:
+                    item[key] = map_time(item[key], pieces)
+    return result
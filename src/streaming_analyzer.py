@@ -0,0 +1,263 @@
+import wave
+import argparse
+from collections import deque
+
+import numpy as np
+import parselmouth
+
+from praat import Praat
+from analysis_graph import AnalysisGraph
+from feature_stats import QuantileSketch
+
+
+PCM_DTYPES = {1: np.uint8, 2: '<i2', 3: None, 4: '<i4'} # 24bit(3)는 unpack_pcm24로 int32로 바꾼다.
+
+
+def unpack_pcm24(data):
+    """
+    24bit little-endian PCM 바이트를 부호 있는 int32 배열로 바꾼다.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+    return (samples << 8) >> 8 # 부호 확장
+
+
+def iter_pcm_blocks(source, sample_width=2, channels=1, block_frames=1600):
+    """
+    PCM 입력을 모노 float32 블록으로 바꿔서 하나씩 돌려준다.
+    :param source: read(n)이 있는 파일 객체(raw little-endian PCM), wave.Wave_read,
+                   또는 bytes / numpy 배열 블록의 iterable
+    :param sample_width: raw PCM 샘플 바이트 수 (1, 2, 3, 4)
+    :param channels: raw PCM 채널 수, 여러 채널은 평균해서 모노로 만든다.
+    :param block_frames: 파일 객체에서 한 번에 읽을 프레임 수
+    """
+    if isinstance(source, wave.Wave_read):
+        sample_width, channels = source.getsampwidth(), source.getnchannels()
+        blocks = iter(lambda: source.readframes(block_frames), b'')
+    elif hasattr(source, 'read'):
+        blocks = iter(lambda: source.read(block_frames * sample_width * channels), b'')
+    else:
+        blocks = source
+    if sample_width not in PCM_DTYPES:
+        raise ValueError(f'Unsupported PCM sample width: {sample_width} bytes (supported: 1, 2, 3, 4)')
+    scale = float(2 ** (8 * sample_width - 1))
+    dtype = PCM_DTYPES[sample_width]
+    pending = b''
+    for block in blocks:
+        if not isinstance(block, (bytes, bytearray)):
+            samples = np.asarray(block, dtype=np.float32)
+            yield samples.mean(axis=1) if samples.ndim > 1 else samples
+            continue
+        data = pending + bytes(block)
+        usable = len(data) - len(data) % (sample_width * channels)
+        pending = data[usable:]
+        if sample_width == 3:
+            samples = unpack_pcm24(data[:usable]).astype(np.float32)
+        else:
+            samples = np.frombuffer(data[:usable], dtype=dtype).astype(np.float32)
+        if sample_width == 1: # 8bit PCM은 부호 없는 값이다.
+            samples -= 128
+        yield (samples / scale).reshape(-1, channels).mean(axis=1)
+
+
+class StreamingProsodyAnalyzer:
+    """
+    들어오는 PCM 블록에서 피치, 강도, 음절핵 수, 발화속도를 일정 간격(hop_length)마다 갱신합니다.
+    최근 window_length초만 버퍼에 두고 그 구간을 Praat으로 분석하므로, 갱신 한 번의 비용과 메모리는
+    입력 길이와 관계없이 일정합니다. 구간 끝의 margin초는 다음 갱신까지 내보내지 않습니다. (지연 시간)
+
+    임계값은 get_threshold와 같은 식(Praat.calculate_threshold)을 지금까지의 강도 최솟값, 최댓값,
+    99% 분위수(QuantileSketch)로 계산하고, 음절핵은 get_valid_peak_count와 같이 임계값을 넘는 이웃한
+    피크 사이의 최소 강도(dip)로 판정합니다. 임계값은 입력이 쌓이면서 바뀌므로 전체 파일 분석과 조금 다를 수 있습니다.
+    """
+    def __init__(self, sampling_frequency=16000, window_length=2.0, hop_length=0.5, margin=0.25, silence_db=-25,
+                 min_dip=2, rate_window=10.0, minimum_pitch=50):
+        """
+        :param sampling_frequency: 입력 샘플링 레이트
+        :param window_length: 분석 구간 길이(초)
+        :param hop_length: 갱신 간격(초)
+        :param margin: 분석 구간 끝에서 다음 갱신까지 미루는 길이(초), Praat 분석 창의 가장자리 효과를 피한다.
+        :param silence_db: 무음 감지를 위한 강도 기준
+        :param min_dip: 유효 피크를 위한 최소 강도 차이
+        :param rate_window: 최근 발화속도를 구할 구간(초)
+        :param minimum_pitch: intensity 계산의 최소 피치
+        """
+        if not margin < hop_length <= window_length - margin:
+            raise ValueError('need margin < hop_length <= window_length - margin')
+        self.sampling_frequency = sampling_frequency
+        self.window_size = int(round(window_length * sampling_frequency))
+        self.hop_size = int(round(hop_length * sampling_frequency))
+        self.margin_size = int(round(margin * sampling_frequency))
+        self.silence_db = silence_db
+        self.min_dip = min_dip
+        self.rate_window = rate_window
+        self.minimum_pitch = minimum_pitch
+
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_start = 0 # buffer[0]의 절대 샘플 위치
+        self.total_samples = 0
+        self.next_end = self.hop_size # 다음 분석 구간의 끝 (절대 샘플 위치)
+        self.emitted_until = 0.0 # 이 시간 이전의 프레임은 이미 내보냈다.
+        self.peak_amplitude = 0.0
+
+        # 누적 강도 통계 (get_threshold의 최솟값, 최댓값, 99% 분위수)
+        self.intensity_sketch = QuantileSketch(low=1.0, high=200.0)
+        self.min_intensity = np.inf
+        self.max_intensity = -np.inf
+        self.threshold = None
+
+        # 음절핵 판정 상태
+        self.last_peak = None # 임계값을 넘은 마지막 피크 (time, intensity), 다음 피크가 와야 판정된다.
+        self.dip = np.inf # 마지막 피크 이후 강도 최솟값
+        self.nucleus_count = 0
+        self.recent_nuclei = deque() # rate_window 안의 음절핵 시간
+
+    def push(self, samples):
+        """
+        모노 float 샘플 블록을 넣고, 분석할 수 있게 된 구간마다 갱신 결과를 돌려준다.
+        :return: 갱신 결과 사전 리스트 (update 참고)
+        """
+        self.buffer = np.concatenate([self.buffer, np.asarray(samples, dtype=np.float32)])
+        self.total_samples += len(samples)
+        updates = []
+        while self.total_samples >= self.next_end:
+            updates.append(self.update(self.next_end, self.next_end - self.margin_size))
+            self.next_end += self.hop_size
+            # 다음 분석 구간에 필요한 샘플만 남긴다.
+            keep_from = max(self.buffer_start, self.next_end - self.window_size)
+            self.buffer = self.buffer[keep_from - self.buffer_start:]
+            self.buffer_start = keep_from
+        return updates
+
+    def flush(self):
+        """
+        입력이 끝났을 때 남은 구간을 끝까지 분석한다.
+        """
+        if self.total_samples / self.sampling_frequency <= self.emitted_until:
+            return []
+        return [self.update(self.total_samples, self.total_samples)]
+
+    def process(self, source, **kwargs):
+        """
+        PCM 입력 전체를 흘려 보내면서 갱신 결과를 하나씩 돌려준다.
+        :param source: iter_pcm_blocks가 받는 입력
+        """
+        for samples in iter_pcm_blocks(source, **kwargs):
+            yield from self.push(samples)
+        yield from self.flush()
+
+    def update(self, window_end, emit_end):
+        """
+        [window_end - window_length, window_end) 구간을 분석하고 [emitted_until, emit_end) 구간의 프레임을 내보낸다.
+        :return: {"time", "pitch": (times, values), "intensity": (times, values), "nuclei", "nucleus_count",
+                  "threshold", "speech_rate", "recent_speech_rate"}
+        """
+        window_start = max(self.buffer_start, window_end - self.window_size)
+        samples = self.buffer[window_start - self.buffer_start:window_end - self.buffer_start].astype(np.float64)
+        emit_start, emit_end = self.emitted_until, emit_end / self.sampling_frequency
+        self.peak_amplitude = max(self.peak_amplitude, float(np.max(np.abs(samples), initial=0.0)))
+
+        # 피치의 유성음 판정 기준이 전체 입력의 최대 진폭이 되도록, 내보내지 않는 앞쪽에 최대 진폭 샘플을 붙인다.
+        guard = np.zeros(int(0.1 * self.sampling_frequency) + 1)
+        guard[0] = self.peak_amplitude
+        sound = parselmouth.Sound(np.concatenate([guard, samples]), sampling_frequency=self.sampling_frequency,
+                                  start_time=(window_start - len(guard)) / self.sampling_frequency)
+        graph = AnalysisGraph(sound)
+        pitch = self.get_pitch_frames(graph, emit_start, emit_end)
+        intensity, peaks = self.get_intensity_frames(graph, emit_start, emit_end)
+        nuclei = self.update_nuclei(intensity, peaks)
+        self.emitted_until = emit_end
+
+        elapsed = self.total_samples / self.sampling_frequency
+        while self.recent_nuclei and self.recent_nuclei[0] < emit_end - self.rate_window:
+            self.recent_nuclei.popleft()
+        return {
+            "time": emit_end,
+            "pitch": pitch,
+            "intensity": intensity,
+            "nuclei": nuclei,
+            "nucleus_count": self.nucleus_count,
+            "threshold": self.threshold,
+            "speech_rate": self.nucleus_count / elapsed if elapsed else 0.0,
+            "recent_speech_rate": len(self.recent_nuclei) / min(self.rate_window, emit_end) if emit_end else 0.0
+        }
+
+    @staticmethod
+    def select(times, start, end):
+        return (times >= start) & (times < end)
+
+    def get_pitch_frames(self, graph, start, end):
+        try:
+            pitch = graph.pitch()
+        except parselmouth.PraatError: # 분석 창보다 짧은 입력
+            return np.array([]), np.array([])
+        times, values = pitch.xs(), pitch.selected_array['frequency']
+        keep = self.select(times, start, end) & (values != 0)
+        return times[keep], values[keep]
+
+    def get_intensity_frames(self, graph, start, end):
+        """
+        :return: (내보낼 구간의 intensity (times, values), 그 구간의 피크 (times, values))
+        """
+        try:
+            intensity = graph.intensity(self.minimum_pitch)
+        except parselmouth.PraatError:
+            empty = (np.array([]), np.array([]))
+            return empty, empty
+        times, values = intensity.xs(), intensity.values[0]
+        keep = self.select(times, start, end)
+        peak_times, peak_values = Praat.get_peaks(intensity)
+        peak_keep = self.select(peak_times, start, end)
+        return (times[keep], values[keep]), (peak_times[peak_keep], peak_values[peak_keep])
+
+    def update_nuclei(self, intensity, peaks):
+        """
+        새 강도 프레임으로 임계값을 갱신하고, 임계값을 넘는 피크를 시간 순서대로 판정한다.
+        :return: 이번 갱신에서 유효하다고 판정된 음절핵 시간 리스트
+        """
+        times, values = intensity
+        if len(values):
+            self.intensity_sketch.update(values)
+            self.min_intensity = min(self.min_intensity, float(values.min()))
+            self.max_intensity = max(self.max_intensity, float(values.max()))
+            self.threshold, _, _ = Praat.calculate_threshold(self.min_intensity, self.max_intensity,
+                                                             self.intensity_sketch.quantile(0.99),
+                                                             silence_db=self.silence_db)
+        nuclei = []
+        if self.threshold is None:
+            return nuclei
+        position = 0
+        for peak_time, peak_value in zip(*peaks):
+            if peak_value <= self.threshold:
+                continue
+            # 이전 피크부터 이번 피크까지의 강도 최솟값(dip)
+            following = int(np.searchsorted(times, peak_time, side='right'))
+            if following > position:
+                self.dip = min(self.dip, float(values[position:following].min()))
+                position = following
+            if self.last_peak is not None and Praat.is_valid_dip(self.last_peak[1], self.dip, min_dip=self.min_dip):
+                nuclei.append(self.last_peak[0])
+            self.last_peak = (peak_time, peak_value)
+            self.dip = np.inf
+        if position < len(values):
+            self.dip = min(self.dip, float(values[position:].min()))
+        self.nucleus_count += len(nuclei)
+        self.recent_nuclei.extend(nuclei)
+        return nuclei
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('wav_path', help='스트리밍으로 흘려 보낼 wav 파일')
+    parser.add_argument('--window-length', type=float, default=2.0, help='분석 구간 길이(초)')
+    parser.add_argument('--hop-length', type=float, default=0.5, help='갱신 간격(초)')
+    args = parser.parse_args()
+
+    with wave.open(args.wav_path, 'rb') as wav:
+        analyzer = StreamingProsodyAnalyzer(wav.getframerate(), window_length=args.window_length,
+                                            hop_length=args.hop_length)
+        for result in analyzer.process(wav):
+            pitch_times, pitch_values = result['pitch']
+            mean_pitch = float(np.mean(pitch_values)) if len(pitch_values) else None
+            print(f"{result['time']:8.2f}s pitch={mean_pitch} nuclei={result['nucleus_count']} "
+                  f"rate={result['speech_rate']:.2f} recent={result['recent_speech_rate']:.2f}")
@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import threading
+
+_tracer = None # enable()을 호출하기 전에는 span()이 아무것도 기록하지 않는다.
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def get_rss():
+    """
+    현재 RSS(바이트), 읽을 수 없는 플랫폼에서는 None
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _NoopSpan:
+    """
+    추적을 끈 상태에서 span()이 돌려주는 객체. 아무것도 측정하지 않는다.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    단계 하나의 벽시계 시간, (스레드) CPU 시간, RSS 변화, 처리한 음성 길이를 측정합니다.
+    """
+    def __init__(self, tracer, name, audio_seconds=None, attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.audio_seconds = audio_seconds
+        self.attributes = attributes or {}
+
+    def set(self, **attributes):
+        """
+        측정 중에 알게 된 값(예: 디코딩한 음성 길이 audio_seconds)을 추가한다.
+        """
+        if 'audio_seconds' in attributes:
+            self.audio_seconds = attributes.pop('audio_seconds')
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start = time.time()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.thread_time()
+        self.start_rss = get_rss()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end_rss = get_rss()
+        record = {
+            "name": self.name,
+            "start": self.start,
+            "wall": time.perf_counter() - self.start_wall,
+            "cpu": time.thread_time() - self.start_cpu,
+            "rss_delta": end_rss - self.start_rss if end_rss is not None and self.start_rss is not None else None,
+            "audio_seconds": self.audio_seconds,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "error": exc_type.__name__ if exc_type is not None else None
+        }
+        if self.attributes:
+            record["attributes"] = self.attributes
+        self.tracer.record(record)
+        return False
+
+
+class Tracer:
+    """
+    span 기록을 JSONL 추적 파일에 쓰고, 단계별 합계(횟수, 시간, CPU, 음성 길이, 최대 RSS 변화)를 모읍니다.
+    요약의 실시간 배수(real-time factor)는 단계의 벽시계 시간 / 처리한 음성 길이입니다.
+    """
+    def __init__(self, trace_path=None, metrics_path=None, keep_records=False):
+        """
+        :param trace_path: span을 한 줄씩 기록할 JSONL 경로, None이면 파일에 쓰지 않는다.
+        :param metrics_path: close()할 때 Prometheus 텍스트 형식으로 합계를 저장할 경로
+        :param keep_records: True이면 기록을 메모리에 모은다. (프로세스 풀 워커에서 부모로 돌려보낼 때)
+        """
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.keep_records = keep_records
+        self.records = []
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.trace_file = None
+        if trace_path:
+            trace_dir = os.path.dirname(trace_path)
+            if trace_dir and not os.path.exists(trace_dir):
+                os.makedirs(trace_dir, exist_ok=True)
+            # 줄 단위로 내보내서, fork된 워커가 부모의 쓰지 않은 버퍼를 물려받지 않게 한다.
+            self.trace_file = open(trace_path, 'a', encoding='utf-8', buffering=1)
+        self.pid = os.getpid()
+
+    def span(self, name, audio_seconds=None, **attributes):
+        return Span(self, name, audio_seconds, attributes)
+
+    def record(self, record):
+        with self.lock:
+            if self.trace_file is not None:
+                self.trace_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            if self.keep_records:
+                self.records.append(record)
+            stage = self.stages.get(record['name'])
+            if stage is None:
+                stage = self.stages[record['name']] = {"calls": 0, "errors": 0, "wall": 0.0, "cpu": 0.0,
+                                                       "audio_seconds": 0.0, "max_rss_delta": None}
+            stage['calls'] += 1
+            stage['errors'] += record['error'] is not None
+            stage['wall'] += record['wall']
+            stage['cpu'] += record['cpu']
+            stage['audio_seconds'] += record['audio_seconds'] or 0.0
+            if record['rss_delta'] is not None:
+                stage['max_rss_delta'] = max(stage['max_rss_delta'] or 0, record['rss_delta'])
+
+    def add_records(self, records):
+        """
+        다른 프로세스에서 모은 span 기록을 더한다.
+        """
+        for record in records:
+            self.record(record)
+
+    def pop_records(self):
+        with self.lock:
+            records, self.records = self.records, []
+        return records
+
+    def summary(self):
+        """
+        :return: 단계 이름 순서의 [{"stage", "calls", "errors", "wall", "cpu", "audio_seconds", "real_time_factor",
+                 "max_rss_delta"}, ...]
+        """
+        with self.lock:
+            stages = {name: dict(stage) for name, stage in self.stages.items()}
+        return [{"stage": name, **stage,
+                 "real_time_factor": stage['wall'] / stage['audio_seconds'] if stage['audio_seconds'] else None}
+                for name, stage in sorted(stages.items())]
+
+    def print_summary(self):
+        print(f"{'stage':28s} {'calls':>6s} {'wall(s)':>9s} {'cpu(s)':>9s} {'audio(s)':>9s} {'RTF':>8s} {'max RSS+':>9s}")
+        for stage in self.summary():
+            rtf = f"{stage['real_time_factor']:8.4f}" if stage['real_time_factor'] is not None else '       -'
+            rss = f"{stage['max_rss_delta'] / 2 ** 20:7.1f}MB" if stage['max_rss_delta'] is not None else '        -'
+            print(f"{stage['stage']:28s} {stage['calls']:6d} {stage['wall']:9.3f} {stage['cpu']:9.3f} "
+                  f"{stage['audio_seconds']:9.1f} {rtf} {rss}")
+
+    def write_prometheus(self, metrics_path):
+        """
+        단계별 합계를 Prometheus 텍스트 형식(node_exporter textfile collector 등)으로 저장한다.
+        """
+        metrics = [
+            ('speech_stage_calls_total', 'counter', 'Number of completed spans per stage', 'calls'),
+            ('speech_stage_errors_total', 'counter', 'Number of spans that raised per stage', 'errors'),
+            ('speech_stage_wall_seconds_total', 'counter', 'Wall-clock seconds spent per stage', 'wall'),
+            ('speech_stage_cpu_seconds_total', 'counter', 'Thread CPU seconds spent per stage', 'cpu'),
+            ('speech_stage_audio_seconds_total', 'counter', 'Seconds of audio processed per stage', 'audio_seconds'),
+            ('speech_stage_real_time_factor', 'gauge', 'Wall seconds per audio second per stage', 'real_time_factor'),
+            ('speech_stage_max_rss_delta_bytes', 'gauge', 'Largest RSS increase during one span per stage', 'max_rss_delta'),
+        ]
+        summary = self.summary()
+        lines = []
+        for metric, metric_type, description, key in metrics:
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} {metric_type}')
+            for stage in summary:
+                if stage[key] is not None:
+                    lines.append(f'{metric}{{stage="{stage["stage"]}"}} {float(stage[key]):.6g}')
+        metrics_dir = os.path.dirname(metrics_path)
+        if metrics_dir and not os.path.exists(metrics_dir):
+            os.makedirs(metrics_dir, exist_ok=True)
+        tmp_path = f'{metrics_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, metrics_path)
+
+    def close(self):
+        if self.metrics_path:
+            self.write_prometheus(self.metrics_path)
+        if self.trace_file is not None:
+            self.trace_file.close()
+            self.trace_file = None
+
+
+def enable(trace_path=None, metrics_path=None, keep_records=False):
+    """
+    전역 추적을 켠다. 이미 켜져 있으면 그 Tracer를 닫고 새로 만든다.
+    :return: Tracer
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(trace_path, metrics_path, keep_records=keep_records)
+    return _tracer
+
+
+def disable():
+    """
+    전역 추적을 끄고, metrics_path가 있으면 Prometheus 파일을 쓴다.
+    :return: 끄기 전의 Tracer (없으면 None)
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+    return tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+def start_worker():
+    """
+    프로세스 풀 워커에서 기록을 메모리에 모으는 Tracer를 켠다. fork로 물려받은 부모의 Tracer는 닫지 않고 버린다.
+    (부모의 추적 파일이나 Prometheus 파일을 워커가 쓰지 않도록) 워커는 pop_records()로 기록을 부모에 돌려준다.
+    """
+    global _tracer
+    if _tracer is None or _tracer.pid != os.getpid():
+        _tracer = Tracer(keep_records=True)
+    return _tracer
+
+
+def span(name, audio_seconds=None, **attributes):
+    """
+    with tracing.span('pitch', audio_seconds=duration): ... 형태로 단계를 측정한다.
+    추적이 꺼져 있으면 아무 일도 하지 않는 공용 객체를 돌려준다.
+    """
+    if _tracer is None:
+        return _NOOP_SPAN
+    return _tracer.span(name, audio_seconds, **attributes)
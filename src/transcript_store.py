@@ -0,0 +1,156 @@
+import os
+import csv
+
+
+class ColumnarTranscriptWriter:
+    """
+    STT 어절과 화자 분리 구간을 Parquet 또는 Arrow IPC 파일로 기록합니다. (pyarrow 필요)
+    행마다 csv.writerow를 부르는 대신 컬럼 리스트에 모았다가 batch_rows 행마다 한 번에 기록하고,
+    반복되는 위치/파일명/화자 ID 컬럼은 사전(dictionary) 인코딩합니다.
+
+    테이블마다 디렉토리를 만들고 writer마다 part 파일 하나를 쓰므로, 여러 프로세스가 서로 다른 part 이름으로
+    동시에 기록할 수 있습니다. 읽을 때는 read_table로 디렉토리 전체에서 필요한 컬럼만 읽습니다.
+    컬럼 이름은 CSV 헤더와 같습니다.
+    """
+    TRANSCRIPTION = 'speech_transcription'
+    DIARIZATION = 'speaker_diarization'
+    DICTIONARY_COLUMNS = ('위치', '파일명', '화자 ID')
+    FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+    def __init__(self, output_dir='out/columnar', part='part-0', format='parquet', batch_rows=65536):
+        """
+        :param output_dir: 저장 디렉토리, 그 아래에 speech_transcription/, speaker_diarization/ 디렉토리를 만든다.
+        :param part: 이 writer가 쓸 part 파일 이름, 병렬로 기록하는 프로세스마다 달라야 한다. 같은 이름의 파일은 덮어쓴다.
+        :param format: 'parquet' 또는 'arrow' (Arrow IPC 파일)
+        :param batch_rows: 한 번에 기록할 행 수 (Parquet row group 크기)
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f'Unknown columnar format: {format}')
+        import pyarrow as pa
+
+        self.pa = pa
+        self.output_dir = output_dir
+        self.part = part
+        self.format = format
+        self.batch_rows = batch_rows
+        dictionary = pa.dictionary(pa.int32(), pa.string())
+        self.schemas = {
+            self.TRANSCRIPTION: pa.schema([
+                ('위치', dictionary), ('파일명', dictionary), ('문장 번호', pa.int32()), ('문장', pa.string()),
+                ('어절 번호', pa.string()), ('어절', pa.string()), ('어절 시작', pa.float64()),
+                ('어절 종료', pa.float64()), ('신뢰도', pa.float64())]),
+            self.DIARIZATION: pa.schema([
+                ('위치', dictionary), ('파일명', dictionary), ('화자 ID', dictionary),
+                ('시작 시간', pa.float64()), ('종료 시간', pa.float64())]),
+        }
+        self.buffers = {table: {name: [] for name in schema.names} for table, schema in self.schemas.items()}
+        self.writers = {}
+
+    def get_part_path(self, table):
+        table_dir = os.path.join(self.output_dir, table)
+        if not os.path.exists(table_dir):
+            os.makedirs(table_dir, exist_ok=True)
+        return os.path.join(table_dir, f'{self.part}{self.FORMATS[self.format]}')
+
+    def write_diarization(self, audio_path, audio_filename, speaker_dict):
+        """
+        save_speaker_diarization_to_csv와 같은 행을 기록한다.
+        """
+        buffer = self.buffers[self.DIARIZATION]
+        for speaker, segments in speaker_dict.items():
+            for start, end in segments:
+                buffer['위치'].append(audio_path)
+                buffer['파일명'].append(audio_filename)
+                buffer['화자 ID'].append(speaker)
+                buffer['시작 시간'].append(start)
+                buffer['종료 시간'].append(end)
+        self.flush(self.DIARIZATION)
+
+    def write_transcription(self, stt_result, audio_path, audio_filename):
+        """
+        SpeechRecognition.save_to_csv와 같은 행을 기록한다.
+        """
+        buffer = self.buffers[self.TRANSCRIPTION]
+        for seg_index, seg in enumerate(stt_result['segments'], start=1):
+            text = seg['text'].strip()
+            for word_index, word in enumerate(seg['words'], start=1):
+                buffer['위치'].append(audio_path)
+                buffer['파일명'].append(audio_filename)
+                buffer['문장 번호'].append(seg_index)
+                buffer['문장'].append(text)
+                buffer['어절 번호'].append(f"{seg_index}-{word_index}")
+                buffer['어절'].append(word['text'].strip())
+                buffer['어절 시작'].append(word['start'])
+                buffer['어절 종료'].append(word['end'])
+                buffer['신뢰도'].append(word['confidence'])
+        self.flush(self.TRANSCRIPTION)
+
+    def flush(self, table, force=False):
+        """
+        모인 행이 batch_rows 이상이거나 force이면 RecordBatch 하나로 기록한다.
+        """
+        buffer = self.buffers[table]
+        rows = len(buffer['위치'])
+        if rows == 0 or (rows < self.batch_rows and not force):
+            return
+        schema = self.schemas[table]
+        batch = self.pa.record_batch([self.pa.array(buffer[name], type=schema.field(name).type) for name in schema.names],
+                                     schema=schema)
+        self.get_writer(table).write_batch(batch)
+        for values in buffer.values():
+            values.clear()
+
+    def get_writer(self, table):
+        if table not in self.writers:
+            path, schema = self.get_part_path(table), self.schemas[table]
+            if self.format == 'parquet':
+                import pyarrow.parquet as pq
+                self.writers[table] = pq.ParquetWriter(path, schema)
+            else:
+                self.writers[table] = self.pa.ipc.new_file(path, schema)
+        return self.writers[table]
+
+    def close(self):
+        """
+        남은 행을 기록하고 파일을 닫는다. 행이 없는 테이블도 빈 part 파일을 만든다.
+        """
+        for table in self.schemas:
+            self.flush(table, force=True)
+            self.get_writer(table).close()
+        self.writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_table(output_dir, table, columns=None, format='parquet', filter=None):
+    """
+    테이블 디렉토리의 모든 part 파일을 하나의 pyarrow.Table로 읽는다.
+    :param table: ColumnarTranscriptWriter.TRANSCRIPTION 또는 DIARIZATION
+    :param columns: 읽을 컬럼 이름 리스트, None이면 전체
+    :param filter: pyarrow.dataset 조건식 (예: pyarrow.dataset.field('파일명') == 'sample_sound2')
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(os.path.join(output_dir, table), format='ipc' if format == 'arrow' else format)
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def export_csv(output_dir, table, csv_path, format='parquet'):
+    """
+    컬럼형 테이블을 process_files의 CSV와 같은 형식(헤더 포함)으로 내보낸다.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(os.path.join(output_dir, table), format='ipc' if format == 'arrow' else format)
+    csv_dir = os.path.dirname(csv_path)
+    if csv_dir and not os.path.exists(csv_dir):
+        os.makedirs(csv_dir, exist_ok=True)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(dataset.schema.names)
+        for batch in dataset.to_batches():
+            writer.writerows(zip(*(column.to_pylist() for column in batch.columns)))
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from feature_stats import GroupedFeatureStats
+
+
+def test_speech_rate_below_one():
+    stats = GroupedFeatureStats()
+    rates = np.linspace(0.2, 0.9, 50)
+    for rate in rates:
+        stats.add({'gender': 'f', 'age': 70}, None, None, rate)
+
+    summary = stats.summary()[0]['features']['speech_rate']
+    assert summary['count'] == len(rates)
+    for key, q in (('q05', 0.05), ('q50', 0.5), ('q95', 0.95)):
+        assert abs(summary[key] - np.quantile(rates, q)) / np.quantile(rates, q) < 0.05
+
+    # 상태로 저장했다가 다시 만들어도 같은 범위의 스케치로 합쳐진다.
+    restored = GroupedFeatureStats.from_state(stats.get_state())
+    restored.merge(stats)
+    assert restored.summary()[0]['features']['speech_rate']['q50'] == summary['q50']
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from feature_store import FeatureStore
+
+
+def append(store, base_name, length):
+    values = np.arange(length, dtype=float)
+    store.append(base_name, (values, values), (values, values, values, values), 1.0)
+
+
+def column_sizes(store):
+    return [store.get_column_size(column) for column in FeatureStore.PITCH_COLUMNS + FeatureStore.FORMANT_COLUMNS]
+
+
+def interrupt_append(store_dir):
+    # 컬럼 일부만 쓰고 인덱스를 기록하기 전에 멈춘 상태
+    with open(os.path.join(store_dir, 'pitch_times.f32'), 'ab') as f:
+        f.write(b'\0' * 14)
+    with open(os.path.join(store_dir, 'index.jsonl'), 'a', encoding='utf-8') as f:
+        f.write('{"base_name": "c", "pit')
+
+
+def test_writer_truncates_interrupted_append(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    append(store, 'a', 5)
+    interrupt_append(str(tmp_path))
+
+    store = FeatureStore(str(tmp_path))
+    assert column_sizes(store) == [5] * 6
+    append(store, 'b', 3)
+    assert list(FeatureStore(str(tmp_path)).get('b')['pitch'][1]) == [0, 1, 2]
+
+
+def test_reader_does_not_truncate(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    append(store, 'a', 5)
+    interrupt_append(str(tmp_path))
+    pitch_size = os.path.getsize(tmp_path / 'pitch_times.f32')
+    index_size = os.path.getsize(tmp_path / 'index.jsonl')
+
+    reader = FeatureStore(str(tmp_path), mode='r')
+    assert reader.names() == ['a']
+    assert list(reader.get('a')['pitch'][0]) == [0, 1, 2, 3, 4]
+    assert list(reader.scan('pitch_times')) == [0, 1, 2, 3, 4]
+    assert os.path.getsize(tmp_path / 'pitch_times.f32') == pitch_size
+    assert os.path.getsize(tmp_path / 'index.jsonl') == index_size
+    with pytest.raises(ValueError):
+        append(reader, 'b', 3)
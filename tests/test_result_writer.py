@@ -0,0 +1,53 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from result_writer import JsonlResultWriter
+
+
+def write_records(out_path, names):
+    with JsonlResultWriter(str(out_path)) as writer:
+        for name in names:
+            if not writer.is_completed(name):
+                writer.write({"file_name": name, "pitch": [[0.1, 100.0]]}, name)
+
+
+def read_names(out_path):
+    with open(out_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line)['file_name'] for line in f]
+
+
+def test_resume_drops_partial_line(tmp_path):
+    out_path = tmp_path / 'result.jsonl'
+    write_records(out_path, ['a', 'b'])
+    with open(out_path, 'a', encoding='utf-8') as f:
+        f.write('{"file_name":"c","pit')
+
+    write_records(out_path, ['a', 'b', 'c'])
+    assert read_names(out_path) == ['a', 'b', 'c']
+
+
+def test_missing_jsonl_is_rewritten(tmp_path):
+    out_path = tmp_path / 'result.jsonl'
+    write_records(out_path, ['a', 'b'])
+    os.remove(out_path)
+
+    # 체크포인트만 남아 있어도 NUL로 채우지 않고 모든 파일을 다시 기록한다.
+    write_records(out_path, ['a', 'b'])
+    assert b'\0' not in out_path.read_bytes()
+    assert read_names(out_path) == ['a', 'b']
+
+
+def test_shorter_jsonl_keeps_remaining_records(tmp_path):
+    out_path = tmp_path / 'result.jsonl'
+    write_records(out_path, ['a', 'b', 'c'])
+    with open(out_path, 'rb') as f:
+        first_line = f.readline()
+    os.truncate(out_path, len(first_line) + 5)
+
+    write_records(out_path, ['a', 'b', 'c'])
+    assert read_names(out_path) == ['a', 'b', 'c']
+    with open(f'{os.path.splitext(out_path)[0]}.checkpoint', 'r', encoding='utf-8') as f:
+        assert [line.split('\t')[0] for line in f] == ['a', 'b', 'c']
@@ -0,0 +1,40 @@
+import io
+import os
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from streaming_analyzer import iter_pcm_blocks
+
+
+def make_wav(samples, sample_width, channels=1):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(sample_width)
+        f.setframerate(16000)
+        f.writeframes(b''.join(int(value).to_bytes(sample_width, 'little', signed=True) for value in samples))
+    buffer.seek(0)
+    return wave.open(buffer, 'rb')
+
+
+def test_24bit_pcm():
+    samples = [0, 1, -1, 2 ** 23 - 1, -2 ** 23, 123456, -654321]
+    values = np.concatenate(list(iter_pcm_blocks(make_wav(samples, 3), block_frames=3)))
+    np.testing.assert_allclose(values, np.array(samples) / 2 ** 23, rtol=1e-6)
+
+
+def test_24bit_raw_stereo():
+    frames = [(100000, -100000), (-2 ** 23, 2 ** 23 - 1)]
+    data = b''.join(int(value).to_bytes(3, 'little', signed=True) for frame in frames for value in frame)
+    values = np.concatenate(list(iter_pcm_blocks(io.BytesIO(data), sample_width=3, channels=2, block_frames=1)))
+    np.testing.assert_allclose(values, [0.0, -0.5 / 2 ** 23], atol=1e-9)
+
+
+def test_unsupported_sample_width():
+    with pytest.raises(ValueError, match='sample width: 5'):
+        list(iter_pcm_blocks(io.BytesIO(b'\0' * 10), sample_width=5))
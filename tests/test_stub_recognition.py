@@ -0,0 +1,138 @@
+import csv
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from speech_recognition import SpeechRecognition
+from recognition_backends import StubDiarization, StubTranscription
+from segment_manifest import SegmentManifest
+
+WAV_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'wav-files')
+OUTPUTS = ('speech_transcription.csv', 'speaker_diarization.csv', 'segments.csv')
+
+
+class CountingDiarization(StubDiarization):
+    """
+    diarize 호출 횟수를 세는 테스트용 화자 분리 모델
+    """
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def diarize(self, audio_path, waveform=None):
+        self.calls += 1
+        return super().diarize(audio_path, waveform)
+
+
+@pytest.fixture
+def audio_files():
+    files = sorted(glob.glob(os.path.join(WAV_DIR, '*.wav')))
+    if not files:
+        pytest.skip('data/wav-files가 없습니다.')
+    return files
+
+
+def run(audio_files, output_dir, **kwargs):
+    diarization = CountingDiarization()
+    recognition = SpeechRecognition(diarization_backend=diarization, transcription_backend=StubTranscription())
+    recognition.process_files(audio_files, output_dir=str(output_dir), save_wav=False, **kwargs)
+    return diarization
+
+
+def read_outputs(output_dir):
+    outputs = {}
+    for name in OUTPUTS:
+        with open(os.path.join(output_dir, name), 'rb') as f:
+            outputs[name] = f.read()
+    return outputs
+
+
+def test_segments_csv(audio_files, tmp_path):
+    run(audio_files, tmp_path)
+
+    with open(tmp_path / 'segments.csv', 'r', newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == SegmentManifest.HEADERS
+
+    expected = []
+    for audio_path in audio_files:
+        speakers_dict = StubDiarization().diarize(audio_path)
+        expected.extend(SegmentManifest.make_segments(audio_path, speakers_dict))
+    assert SegmentManifest(str(tmp_path / 'segments.csv')).read() == expected
+    assert {segment.source_path for segment in expected} == set(audio_files)
+
+
+def test_resume_is_idempotent(audio_files, tmp_path):
+    run(audio_files, tmp_path)
+    first = read_outputs(tmp_path)
+
+    # 모두 끝난 일지로 다시 실행하면 아무 단계도 다시 하지 않고 출력도 그대로다.
+    diarization = run(audio_files, tmp_path, resume=True)
+    assert diarization.calls == 0
+    assert read_outputs(tmp_path) == first
+
+
+def test_resume_after_interruption(audio_files, tmp_path):
+    expected_dir = tmp_path / 'expected'
+    run(audio_files, expected_dir)
+
+    # 첫 파일만 처리하고 멈춘 뒤, 기록되다 만 행이 남은 상태를 만든다.
+    output_dir = tmp_path / 'resumed'
+    run(audio_files[:1], output_dir)
+    for name in OUTPUTS:
+        with open(output_dir / name, 'a', encoding='utf-8') as f:
+            f.write('partial,row')
+
+    diarization = run(audio_files, output_dir, resume=True)
+    assert diarization.calls == len(audio_files) - 1
+    assert read_outputs(output_dir) == read_outputs(expected_dir)
+
+
+def test_resume_after_partial_journal_line(audio_files, tmp_path):
+    expected_dir = tmp_path / 'expected'
+    run(audio_files, expected_dir)
+
+    # 일지의 마지막 줄이 기록되다 만 상태에서 두 번 이어서 실행해도 일지를 읽을 수 있다.
+    output_dir = tmp_path / 'resumed'
+    run(audio_files[:1], output_dir)
+    journal_path = output_dir / 'journal.jsonl'
+    os.truncate(journal_path, os.path.getsize(journal_path) - 10)
+
+    run(audio_files, output_dir, resume=True)
+    diarization = run(audio_files, output_dir, resume=True)
+    assert diarization.calls == 0
+    assert read_outputs(output_dir) == read_outputs(expected_dir)
+
+
+def test_resume_with_other_output_dir_spelling(audio_files, tmp_path):
+    run(audio_files, tmp_path)
+    first = read_outputs(tmp_path)
+
+    # 일지에 다른 경로 표기로 기록된 출력은 이어 쓰지 않고 일지의 결과로 새로 쓴다.
+    diarization = run(audio_files, os.path.join(str(tmp_path), '.', ''), resume=True)
+    assert diarization.calls == 0
+    assert read_outputs(tmp_path) == first
+
+
+class WordlessTranscription(StubTranscription):
+    """
+    어절 정보가 없는 결과를 돌려주는 음성 인식 모델, CSV 기록 단계에서 실패한다.
+    """
+    def transcribe(self, audio_path, waveform=None, speakers_dict=None):
+        result = super().transcribe(audio_path, waveform, speakers_dict)
+        for segment in result['segments']:
+            del segment['words']
+        return result
+
+
+def test_writer_failure_is_reported(audio_files, tmp_path, capsys):
+    recognition = SpeechRecognition(diarization_backend=StubDiarization(), transcription_backend=WordlessTranscription())
+    with pytest.raises(RuntimeError, match='Failed to write results'):
+        recognition.process_files(audio_files, output_dir=str(tmp_path), save_wav=False)
+    output = capsys.readouterr().out
+    assert output.count('Error in writing results') == len(audio_files)
+    assert "KeyError: 'words'" in output